@@ -0,0 +1,90 @@
+"""
+Seleção das linhas do apêndice de dados brutos do relatório.
+
+O apêndice pode trazer o arquivo inteiro, uma amostra (uma linha a cada N
+linhas ou a cada N minutos), só as excursões (linhas fora de LI/LS de algum
+canal, com algumas linhas de contexto) ou nenhuma linha, com os dados indo
+num arquivo CSV/XLSX à parte. O modo é descrito por uma tupla
+(modo, parâmetro), como as demais configurações do relatório.
+"""
+from io import BytesIO
+import os
+
+import numpy as np
+import pandas as pd
+
+COMPLETO = "completo"
+A_CADA_N_LINHAS = "linhas"
+A_CADA_N_MINUTOS = "minutos"
+EXCURSOES = "excursoes"
+ANEXO = "anexo"
+
+# Acima disso o modo sugerido deixa de ser o apêndice completo
+MAX_PAGINAS_APENDICE = int(os.environ.get("ROUTE_MAX_PAGINAS_APENDICE", "200"))
+CONTEXTO_EXCURSOES_PADRAO = 2
+
+
+def mascara_excursoes(df, canais, contexto=CONTEXTO_EXCURSOES_PADRAO):
+    """Linhas fora de LI/LS de algum canal, mais `contexto` linhas antes e depois de cada uma."""
+    fora = np.zeros(len(df), dtype=bool)
+    for canal in canais:
+        if canal.li is None or canal.ls is None:
+            continue
+        valores = df[canal.coluna].to_numpy(dtype=float)
+        fora |= (valores < canal.li) | (valores > canal.ls)
+
+    if contexto <= 0 or not fora.any():
+        return fora
+    # Dilatação: a linha entra se alguma excursão está a até `contexto` linhas
+    return np.convolve(fora, np.ones(2 * contexto + 1, dtype=int), mode="same") > 0
+
+
+def mascara_por_minutos(tempos, minutos):
+    """Primeira linha de cada janela de `minutos` a partir do início do arquivo."""
+    tempos = pd.to_datetime(pd.Series(tempos)).reset_index(drop=True)
+    if tempos.empty:
+        return np.zeros(0, dtype=bool)
+    janelas = ((tempos - tempos.iloc[0]) // pd.Timedelta(minutes=minutos)).to_numpy()
+    return ~pd.Series(janelas).duplicated().to_numpy()
+
+
+def selecionar_linhas(df, canais, apendice):
+    """
+    Linhas do DataFrame que entram no apêndice, conforme `apendice`
+    (modo, parâmetro). No modo ANEXO não entra nenhuma linha.
+    """
+    modo, parametro = apendice
+    if modo == COMPLETO:
+        return df
+    if modo == A_CADA_N_LINHAS:
+        return df.iloc[::max(int(parametro), 1)]
+    if modo == A_CADA_N_MINUTOS:
+        return df[mascara_por_minutos(df["Date Time"], parametro)]
+    if modo == EXCURSOES:
+        return df[mascara_excursoes(df, canais, int(parametro))]
+    if modo == ANEXO:
+        return df.iloc[:0]
+    raise ValueError(f"Modo de apêndice desconhecido: {modo}")
+
+
+def descrever_apendice(apendice, linhas, total):
+    """Texto curto que abre o apêndice no PDF."""
+    modo, parametro = apendice
+    if modo == A_CADA_N_LINHAS:
+        return f"Dados brutos: uma linha a cada {int(parametro)} ({linhas} de {total} linhas)"
+    if modo == A_CADA_N_MINUTOS:
+        return f"Dados brutos: uma linha a cada {parametro:g} minutos ({linhas} de {total} linhas)"
+    if modo == EXCURSOES:
+        return (f"Dados brutos: somente excursões fora da especificação, com {int(parametro)} "
+                f"linhas de contexto ({linhas} de {total} linhas)")
+    return ""
+
+
+def arquivo_dados_brutos(df, formato="csv"):
+    """Dados brutos em CSV ou XLSX. Retorna (bytes, nome do arquivo, tipo MIME)."""
+    if formato == "xlsx":
+        buffer = BytesIO()
+        df.to_excel(buffer, index=False)
+        return (buffer.getvalue(), "dados_brutos.xlsx",
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    return df.to_csv(index=False).encode("utf-8"), "dados_brutos.csv", "text/csv"
@@ -1,839 +1,277 @@
+import threading
+from collections import OrderedDict
+
 import streamlit as st
 import pandas as pd
-import folium
-from folium.plugins import AntPath
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from fpdf import FPDF
-import base64
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import time
-import os
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-import io
-import PyPDF2
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.lib.pagesizes import landscape, A4
-from io import BytesIO
-
-# NOVA IMPORTAÇÃO PARA GEOCODIFICAÇÃO
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import requests
-
-def detectar_e_converter_coordenadas(df):
-    """
-    Detecta se as coordenadas estão em microdegrees e converte para graus decimais.
-    """
-    if 'latitude' in df.columns and 'longitude' in df.columns:
-        # Verifica se os valores são muito grandes (indicando microdegrees)
-        lat_sample = df['latitude'].iloc[0] if len(df) > 0 else 0
-        lon_sample = df['longitude'].iloc[0] if len(df) > 0 else 0
-        
-        # Se os valores absolutos são maiores que 180, provavelmente estão em microdegrees
-        if abs(lat_sample) > 180 or abs(lon_sample) > 180:
-            st.warning("⚠️ Coordenadas detectadas em formato microdegrees. Convertendo automaticamente para graus decimais...")
-            df['latitude'] = df['latitude'] / 1000000
-            df['longitude'] = df['longitude'] / 1000000
-            st.success("✅ Coordenadas convertidas com sucesso!")
-            
-            # Mostra exemplo da conversão
-            st.info(f"Exemplo de conversão:\n"
-                   f"Latitude: {lat_sample} → {lat_sample/1000000:.6f}\n"
-                   f"Longitude: {lon_sample} → {lon_sample/1000000:.6f}")
-    
-    return df
-
-def obter_endereco_por_coordenadas(latitude, longitude, timeout=10):
-    """
-    Converte coordenadas de latitude e longitude em endereço usando geocodificação reversa.
-    """
-    try:
-        # Inicializa o geocodificador Nominatim (OpenStreetMap)
-        geolocator = Nominatim(user_agent="temperatura_umidade_app")
-        
-        # Faz a geocodificação reversa
-        location = geolocator.reverse(f"{latitude}, {longitude}", timeout=timeout, language='pt')
-        
-        if location:
-            # Extrai informações do endereço
-            address = location.address
-            
-            # Tenta extrair informações mais específicas
-            raw_data = location.raw.get('address', {})
-            
-            # Constrói um endereço mais limpo
-            endereco_parts = []
-            
-            # Adiciona rua/avenida
-            if 'road' in raw_data:
-                endereco_parts.append(raw_data['road'])
-            elif 'pedestrian' in raw_data:
-                endereco_parts.append(raw_data['pedestrian'])
-            
-            # Adiciona número se disponível
-            if 'house_number' in raw_data:
-                endereco_parts[-1] += f", {raw_data['house_number']}"
-            
-            # Adiciona bairro
-            if 'suburb' in raw_data:
-                endereco_parts.append(raw_data['suburb'])
-            elif 'neighbourhood' in raw_data:
-                endereco_parts.append(raw_data['neighbourhood'])
-            
-            # Adiciona cidade
-            if 'city' in raw_data:
-                endereco_parts.append(raw_data['city'])
-            elif 'town' in raw_data:
-                endereco_parts.append(raw_data['town'])
-            elif 'village' in raw_data:
-                endereco_parts.append(raw_data['village'])
-            
-            # Adiciona estado
-            if 'state' in raw_data:
-                endereco_parts.append(raw_data['state'])
-            
-            # Adiciona país
-            if 'country' in raw_data:
-                endereco_parts.append(raw_data['country'])
-            
-            if endereco_parts:
-                return " - ".join(endereco_parts)
-            else:
-                return address
-        else:
-            return "Endereço não encontrado"
-            
-    except GeocoderTimedOut:
-        return "Timeout na busca do endereço"
-    except GeocoderServiceError:
-        return "Erro no serviço de geocodificação"
-    except Exception as e:
-        return f"Erro: {str(e)}"
 
-def adicionar_enderecos_ao_dataframe(df, progress_bar=None):
-    """
-    Adiciona uma coluna de endereços ao DataFrame baseada nas coordenadas.
-    """
-    if 'latitude' not in df.columns or 'longitude' not in df.columns:
-        st.error("Colunas de latitude e longitude não encontradas!")
-        return df
-    
-    enderecos = []
-    total_rows = len(df)
-    
-    # Cache para evitar consultas repetidas
-    cache_enderecos = {}
-    
-    for i, row in df.iterrows():
-        lat = row['latitude']
-        lon = row['longitude']
-        
-        # Cria uma chave para o cache (arredonda para 6 casas decimais)
-        cache_key = f"{lat:.6f},{lon:.6f}"
-        
-        if cache_key in cache_enderecos:
-            endereco = cache_enderecos[cache_key]
-        else:
-            endereco = obter_endereco_por_coordenadas(lat, lon)
-            cache_enderecos[cache_key] = endereco
-            
-            # Pequena pausa para não sobrecarregar o serviço
-            time.sleep(0.1)
-        
-        enderecos.append(endereco)
-        
-        # Atualiza barra de progresso se fornecida
-        if progress_bar:
-            progress_bar.progress((i + 1) / total_rows)
-    
-    # Adiciona a coluna de endereços
-    df['endereco'] = enderecos
-    return df
-
-def carregar_dados(uploaded_file):
-    """Carrega e processa os dados do arquivo Excel."""
-    try:
-        df = pd.read_excel(uploaded_file, sheet_name="Sheet1")
-        df = df.dropna(axis=1, how='all')
-        df["Date Time"] = pd.to_datetime(df["Date Time"], errors='coerce')
-        if "Temperatura (°C)" not in df.columns:
-            st.error("Erro: A coluna 'Temperatura (°C)' não foi encontrada no arquivo Excel.")
-            return None
-        df = df.dropna(subset=["Date Time", "latitude", "longitude", "Temperatura (°C)", "Hora"])
-        
-        # NOVA FUNCIONALIDADE: Detecta e converte coordenadas automaticamente
-        df = detectar_e_converter_coordenadas(df)
-        
-        df["longitude"] = df["longitude"].astype(float)
-        df["latitude"] = df["latitude"].astype(float)
-        return df
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
-        return None
-
-from folium import Map, Marker, Icon, FitBounds
-
-def criar_mapa_com_enderecos(df):
-    """
-    Cria um mapa com marcadores que incluem endereços nos popups.
-    """
-    lat_col = next((col for col in df.columns if 'lat' in col.lower()), None)
-    lon_col = next((col for col in df.columns if 'lon' in col.lower() or 'lng' in col.lower()), None)
-
-    if not lat_col or not lon_col:
-        raise KeyError("Colunas de latitude e longitude não foram encontradas no DataFrame.")
-
-    lat_lon = list(zip(df[lat_col], df[lon_col]))
-
-    m = folium.Map(location=lat_lon[0] if lat_lon else [0, 0], zoom_start=10, tiles="OpenStreetMap")
-    if lat_lon:
-        folium.FitBounds(lat_lon).add_to(m)
-        folium.PolyLine(lat_lon, color="blue", weight=2.5, opacity=1).add_to(m)
-
-    marker_locations = []
-
-    for i, (lat, lon) in enumerate(lat_lon):
-        # Obtém o endereço se disponível
-        endereco = df.iloc[i].get('endereco', 'Endereço não disponível')
-        
-        # Cria popup com informações detalhadas
-        popup_text = f"""
-        <b>Ponto {i + 1}</b><br>
-        <b>Coordenadas:</b> {lat:.6f}, {lon:.6f}<br>
-        <b>Endereço:</b> {endereco}<br>
-        <b>Data/Hora:</b> {df.iloc[i]['Date Time']}<br>
-        <b>Temperatura:</b> {df.iloc[i]['Temperatura (°C)']}°C<br>
-        <b>Umidade:</b> {df.iloc[i]['Umidade (%UR)']}%
-        """
-        
-        folium.Marker(
-            location=(lat, lon),
-            popup=folium.Popup(popup_text, max_width=300),
-            icon=folium.DivIcon(html=f'<div style="font-size: 10pt; color: white; background-color: blue; border-radius: 50%; width: 20px; height: 20px; text-align: center; line-height: 20px;">{i + 1}</div>')
-        ).add_to(m)
-        
-        marker_locations.append([str(i + 1), f"{lat:.6f}, {lon:.6f}", endereco])
-
-    map_file = "mapa.html"
-    m.save(map_file)
-    return map_file, marker_locations
-
-def criar_mapa(df):
-    """Função original para criar mapa sem endereços."""
-    lat_col = next((col for col in df.columns if 'lat' in col.lower()), None)
-    lon_col = next((col for col in df.columns if 'lon' in col.lower() or 'lng' in col.lower()), None)
-
-    if not lat_col or not lon_col:
-        raise KeyError("Colunas de latitude e longitude não foram encontradas no DataFrame.")
-
-    lat_lon = list(zip(df[lat_col], df[lon_col]))
-
-    m = folium.Map(location=lat_lon[0] if lat_lon else [0, 0], zoom_start=10, tiles="OpenStreetMap")
-    if lat_lon:
-        folium.FitBounds(lat_lon).add_to(m)
-        folium.PolyLine(lat_lon, color="blue", weight=2.5, opacity=1).add_to(m)
-
-    marker_locations = []
-
-    for i, (lat, lon) in enumerate(lat_lon):
-        folium.Marker(
-            location=(lat, lon),
-            icon=folium.DivIcon(html=f'<div style="font-size: 10pt">{i + 1}</div>')
-        ).add_to(m)
-        marker_locations.append([str(i + 1), f"{lat}, {lon}"])
-
-    map_file = "mapa.html"
-    m.save(map_file)
-    return map_file, marker_locations
-
-def calcular_resumo_temperatura(df, li_temp, ls_temp):
-    """Calcula o resumo de temperatura por hora."""
-    resumo_temp = df.groupby("Hora").agg(Temperatura_Mínima=("Temperatura (°C)", "min"), Temperatura_Média=("Temperatura (°C)", "mean"), Temperatura_Máxima=("Temperatura (°C)", "max")).reset_index()
-    def calcular_percentuais_temp(grupo):
-        total = len(grupo)
-        abaixo = (grupo["Temperatura (°C)"] < li_temp).sum() / total * 100 if total > 0 else 0
-        dentro = ((grupo["Temperatura (°C)"] >= li_temp) & (grupo["Temperatura (°C)"] <= ls_temp)).sum() / total * 100 if total > 0 else 0
-        acima = (grupo["Temperatura (°C)"] > ls_temp).sum() / total * 100 if total > 0 else 0
-        return pd.Series({"% Abaixo da especificação": abaixo, "% Dentro da especificação": dentro, "% Acima da especificação": acima})
-    percentuais_temp = df.groupby("Hora").apply(calcular_percentuais_temp).reset_index()
-    resumo_temp = resumo_temp.merge(percentuais_temp, on="Hora", how="left").drop(columns=["Hora"])
-    resumo_temp.insert(0, "Intervalo", [f"{i+1}ª Hora" for i in range(len(resumo_temp))])
-    resumo_temp.fillna(0, inplace=True)
-    resumo_temp_display = resumo_temp.copy()
-    for coluna in resumo_temp_display.columns:
-        if resumo_temp_display[coluna].dtype == 'float64' or resumo_temp_display[coluna].dtype == 'int64':
-            resumo_temp_display[coluna] = resumo_temp_display[coluna].map('{:.2f}'.format)
-    resumo_temp_pdf = resumo_temp.copy()
-    resumo_temp_numeric = resumo_temp.copy()
-    for coluna in resumo_temp_pdf.columns:
-        if resumo_temp_pdf[coluna].dtype == 'float64' or resumo_temp_pdf[coluna].dtype == 'int64':
-            resumo_temp_pdf[coluna] = resumo_temp_pdf[coluna].map('{:.2f}'.format)
-    return resumo_temp_display, resumo_temp_pdf, resumo_temp_numeric
-
-def calcular_resumo_umidade(df, li_umid, ls_umid):
-    """Calcula o resumo de umidade por hora."""
-    resumo_umid = df.groupby("Hora").agg(Umidade_Mínima=("Umidade (%UR)", "min"), Umidade_Média=("Umidade (%UR)", "mean"), Umidade_Máxima=("Umidade (%UR)", "max")).reset_index()
-    def calcular_percentuais_umid(grupo):
-        total = len(grupo)
-        abaixo = (grupo["Umidade (%UR)"] < li_umid).sum() / total * 100 if total > 0 else 0
-        dentro = ((grupo["Umidade (%UR)"] >= li_umid) & (grupo["Umidade (%UR)"] <= ls_umid)).sum() / total * 100 if total > 0 else 0
-        acima = (grupo["Umidade (%UR)"] > ls_umid).sum() / total * 100 if total > 0 else 0
-        return pd.Series({"% Abaixo da especificação": abaixo, "% Dentro da especificação": dentro, "% Acima da especificação": acima})
-    percentuais_umid = df.groupby("Hora").apply(calcular_percentuais_umid).reset_index()
-    resumo_umid = resumo_umid.merge(percentuais_umid, on="Hora", how="left").drop(columns=["Hora"])
-    resumo_umid.insert(0, "Intervalo", [f"{i+1}ª Hora" for i in range(len(resumo_umid))])
-    resumo_umid.fillna(0, inplace=True)
-    resumo_umid_display = resumo_umid.copy()
-    for coluna in resumo_umid_display.columns:
-        if resumo_umid_display[coluna].dtype == 'float64' or resumo_umid_display[coluna].dtype == 'int64':
-            resumo_umid_display[coluna] = resumo_umid_display[coluna].map('{:.2f}'.format)
-    resumo_umid_pdf = resumo_umid.copy()
-    resumo_umid_numeric = resumo_umid.copy()
-    for coluna in resumo_umid_pdf.columns:
-        if resumo_umid_pdf[coluna].dtype == 'float64' or resumo_umid_pdf[coluna].dtype == 'int64':
-            resumo_umid_pdf[coluna] = resumo_umid_pdf[coluna].map('{:.2f}'.format)
-    return resumo_umid_display, resumo_umid_pdf, resumo_umid_numeric
-
-def criar_graficos(df, resumo_temp, resumo_umid, li_temp, ls_temp, li_umid, ls_umid):
-    """Cria gráficos de temperatura e umidade ao longo do tempo."""
-    
-    # Gráfico de Temperaturas por Hora
-    fig_temp, ax_temp = plt.subplots(figsize=(12, 6))
-    
-    # Converte os dados de temperatura para numérico (se necessário)
-    resumo_temp["Temperatura_Mínima"] = pd.to_numeric(resumo_temp["Temperatura_Mínima"], errors='coerce')
-    resumo_temp["Temperatura_Média"] = pd.to_numeric(resumo_temp["Temperatura_Média"], errors='coerce')
-    resumo_temp["Temperatura_Máxima"] = pd.to_numeric(resumo_temp["Temperatura_Máxima"], errors='coerce')
-
-    # Define a escala do eixo Y para temperatura com base nos dados numéricos
-    min_temp = min(resumo_temp["Temperatura_Mínima"].min(), li_temp) - 1
-    max_temp = max(resumo_temp["Temperatura_Máxima"].max(), ls_temp) + 1
-    ax_temp.set_yticks(range(int(min_temp), int(max_temp) + 1, 2))  # Ajuste o intervalo conforme necessário
-
-    # Plota o gráfico de temperatura
-    ax_temp.plot(resumo_temp["Intervalo"], resumo_temp["Temperatura_Mínima"], marker="o", label="Temp. Mínima", color="blue")
-    ax_temp.plot(resumo_temp["Intervalo"], resumo_temp["Temperatura_Média"], marker="o", label="Temp. Média", color="orange")
-    ax_temp.plot(resumo_temp["Intervalo"], resumo_temp["Temperatura_Máxima"], marker="o", label="Temp. Máxima", color="green")
-    ax_temp.axhline(y=li_temp, color="red", linestyle="--", label=f"LI - Especificação ({li_temp:.2f}°C)")
-    ax_temp.axhline(y=ls_temp, color="green", linestyle="--", label=f"LS - Especificação ({ls_temp:.2f}°C)")
-    ax_temp.tick_params(axis='x', labelrotation=45, labelsize=7)  
-    if len(resumo_temp) > 20:
-        plt.xticks(range(0, len(resumo_temp), 2))
-    
-    # REMOVIDO: Rótulos de dados para temperatura (conforme solicitado)
-    
-    ax_temp.set_xlabel("Intervalo")
-    ax_temp.set_ylabel("Temperatura (°C)")
-    ax_temp.legend()
-    ax_temp.grid(True)
-    plt.tight_layout()
-    
-    # Gráfico de Umidade Relativa por Hora
-    fig_umid, ax_umid = plt.subplots(figsize=(12, 6))
-    
-    # Converte os dados de umidade para numérico (se necessário)
-    resumo_umid["Umidade_Mínima"] = pd.to_numeric(resumo_umid["Umidade_Mínima"], errors='coerce')
-    resumo_umid["Umidade_Média"] = pd.to_numeric(resumo_umid["Umidade_Média"], errors='coerce')
-    resumo_umid["Umidade_Máxima"] = pd.to_numeric(resumo_umid["Umidade_Máxima"], errors='coerce')
-
-    # Define a escala do eixo Y para umidade com base nos dados numéricos
-    min_umid = min(resumo_umid["Umidade_Mínima"].min(), li_umid) - 1
-    max_umid = max(resumo_umid["Umidade_Máxima"].max(), ls_umid) + 1
-    ax_umid.set_yticks(range(0, 101, 10))  # Escala de 0 a 100 com espaçamento de 10
-
-    # Plota o gráfico de umidade
-    ax_umid.plot(resumo_umid["Intervalo"], resumo_umid["Umidade_Mínima"], marker="o", label="Umid. Mínima", color="blue")
-    ax_umid.plot(resumo_umid["Intervalo"], resumo_umid["Umidade_Média"], marker="o", label="Umid. Média", color="orange")
-    ax_umid.plot(resumo_umid["Intervalo"], resumo_umid["Umidade_Máxima"], marker="o", label="Umid. Máxima", color="green")
-    ax_umid.axhline(y=li_umid, color="red", linestyle="--", label=f"LI - Especificação ({li_umid:.2f}%)")
-    ax_umid.axhline(y=ls_umid, color="green", linestyle="--", label=f"LS - Especificação ({ls_umid:.2f}%)")
-    ax_umid.tick_params(axis='x', labelrotation=45, labelsize=7)  
-    if len(resumo_umid) > 20:
-        plt.xticks(range(0, len(resumo_umid), 2))
-    
-    # REMOVIDO: Rótulos de dados para umidade (conforme solicitado)
-    
-    ax_umid.set_xlabel("Intervalo")
-    ax_umid.set_ylabel("Umidade Relativa (%)")
-    ax_umid.legend()
-    ax_umid.grid(True)
-    plt.tight_layout()
-    
-    # Gráfico de Temperatura e Luz ao longo do tempo
-    fig_temp_luz, ax1 = plt.subplots(figsize=(12, 6))
-    ax1.plot(df["Date Time"], df["Temperatura (°C)"], marker="o", label="Temperatura (°C)", color="blue")
-    ax1.set_xlabel("Data e Hora")
-    ax1.set_ylabel("Temperatura (°C)", color="blue")
-    ax1.tick_params(axis="y", labelcolor="blue")
-    ax1.axhline(y=li_temp, color="red", linestyle="--", label=f"LI - Especificação ({li_temp:.2f}°C)")
-    ax1.axhline(y=ls_temp, color="green", linestyle="--", label=f"LS - Especificação ({ls_temp:.2f}°C)")
-    ax2 = ax1.twinx()
-    ax2.plot(df["Date Time"], df["Luz (lx)"], marker="s", label="Luz (lx)", color="orange")
-    ax2.set_ylabel("Luz (lx)", color="orange")
-    ax2.tick_params(axis="y", labelcolor="orange")
-    ax2.tick_params(axis='x', labelrotation=45, labelsize=7)
-    lines1, labels1 = ax1.get_legend_handles_labels()
-    lines2, labels2 = ax2.get_legend_handles_labels()
-    ax1.legend(lines1 + lines2, labels1 + labels2, loc="upper left")
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter("%d-%m %H:%M"))
-    ax1.xaxis.set_major_locator(mdates.HourLocator(interval=2))
-    ax1.tick_params(axis='x', labelrotation=45, labelsize=7)
-    plt.xticks(rotation=45, fontsize=8)
-    plt.tight_layout()
-    
-    return fig_temp, fig_umid, fig_temp_luz
-
-def mostrar_tabela_resumo_temperatura(df, li_temp, ls_temp):
-    col_temp = "Temperatura (°C)"
-    total = df[col_temp].count()
-
-    resumo_data = {
-        "ºC Mínima": [df[col_temp].min()],
-        "ºC Média": [df[col_temp].mean()],
-        "ºC Máxima": [df[col_temp].max()],
-        "%Abaixo da especificação": [((df[col_temp] < li_temp).sum() / total) * 100],
-        "%Dentro da especificação": [(((df[col_temp] >= li_temp) & (df[col_temp] <= ls_temp)).sum() / total) * 100],
-        "%Acima da especificação": [((df[col_temp] > ls_temp).sum() / total) * 100]
-    }
-
-    st.subheader("Tabela de resumo de dados de temperatura")
-    resumo_df = pd.DataFrame(resumo_data)
+from geocodificacao import obter_cache_enderecos, RAIO_PADRAO_METROS
+from mapa_interativo import MAX_MARCADORES_PADRAO, TOLERANCIA_LINHA_PADRAO
+from captura_mapa import obter_pool_navegadores, aquecer_em_segundo_plano
+from canais import detectar_canais, COLUNA_LUZ
+from ingestao import resumir_em_blocos, TAMANHO_BLOCO_PADRAO
+from cache_dados import chave_arquivo
+from instrumentacao import obter_registro, obter_servidor_metricas, estatisticas_caches, texto_prometheus
+import apendice as apendice_pdf
+from relatorio import (
+    carregar_dados, adicionar_enderecos_ao_dataframe, adicionar_enderecos_por_waypoints,
+    criar_mapa, criar_mapa_com_enderecos, calcular_resumo_por_hora, calcular_resumos_gerais,
+    separar_resumos_por_canal, calcular_excursoes, desenhar_bases_graficos, renderizar_graficos,
+    obter_pool_graficos, capturar_mapa, capturar_mapa_estatico
+)
+from excursoes import formatar_duracao
+
+def mostrar_relatorio_coordenadas(relatorio):
+    """Exibe o relatório da normalização das coordenadas, se algo foi alterado."""
+    if not relatorio:
+        return
+    if relatorio["microdegrees"]:
+        st.warning(f"⚠️ {relatorio['microdegrees']} de {relatorio['total']} linhas tinham coordenadas "
+                   "em formato microdegrees e foram convertidas para graus decimais.")
+        lat_original, lon_original, lat, lon = relatorio["exemplos_microdegrees"][0]
+        st.info(f"Exemplo de conversão:\n"
+                f"Latitude: {lat_original:.0f} → {lat:.6f}\n"
+                f"Longitude: {lon_original:.0f} → {lon:.6f}")
+    if relatorio["invertidas"]:
+        st.warning(f"⚠️ {relatorio['invertidas']} linhas tinham latitude e longitude trocadas e foram corrigidas.")
+    if relatorio["fora_de_faixa"]:
+        posicoes = ", ".join(str(i + 1) for i in relatorio["linhas_fora_de_faixa"])
+        distantes = (f", {relatorio['distantes_da_rota']} delas muito longe do restante da rota"
+                     if relatorio["distantes_da_rota"] else "")
+        st.warning(f"⚠️ {relatorio['fora_de_faixa']} linhas com coordenadas fora da faixa válida{distantes} "
+                   f"ficaram sem coordenadas (primeiras: {posicoes}). As leituras continuam nos resumos "
+                   "e gráficos, mas não entram no mapa nem na geocodificação.")
+
+def estilo_numerico(df, formato="{:.2f}"):
+    """Styler que formata as colunas numéricas só na exibição, mantendo os valores."""
+    return df.style.format(formato, subset=df.select_dtypes("number").columns)
+
+def mostrar_tabela_resumo(canal, resumo_df):
+    """Exibe a tabela de resumo geral de um canal."""
+    st.subheader(f"Tabela de resumo de dados de {canal.titulo}")
     st.dataframe(
         resumo_df.style
             .format("{:.2f}")
             .set_properties(**{"text-align": "center"})
             .set_table_styles([{"selector": "th", "props": [("text-align", "center")]}])
     )
-    return resumo_df
-
-def criar_grafico_umidade_luz(df, li_umid, ls_umid):
-    """Cria um gráfico de umidade e luz ao longo do tempo."""
-    fig_umid_luz, ax1 = plt.subplots(figsize=(12, 6))
-    ax1.plot(df["Date Time"], df["Umidade (%UR)"], marker="o", label="Umidade (%UR)", color="blue")
-    ax1.set_xlabel("Data e Hora")
-    ax1.set_ylabel("Umidade (%UR)", color="blue")
-    ax1.tick_params(axis="y", labelcolor="blue")
-    ax1.axhline(y=li_umid, color="red", linestyle="--", label=f"LI - Especificação ({li_umid:.2f}%)")
-    ax1.axhline(y=ls_umid, color="green", linestyle="--", label=f"LS - Especificação ({ls_umid:.2f}%)")
-    ax2 = ax1.twinx()
-    ax2.plot(df["Date Time"], df["Luz (lx)"], marker="s", label="Luz (lx)", color="orange")
-    ax2.set_ylabel("Luz (lx)", color="orange")
-    ax2.tick_params(axis="y", labelcolor="orange")
-    lines1, labels1 = ax1.get_legend_handles_labels()
-    lines2, labels2 = ax2.get_legend_handles_labels()
-    ax1.legend(lines1 + lines2, labels1 + labels2, loc="upper left")
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter("%d-%m %H:%M"))
-    ax1.xaxis.set_major_locator(mdates.HourLocator(interval=2))
-    ax1.tick_params(axis='x', labelrotation=45, labelsize=7)
-    plt.xticks(rotation=45, fontsize=8)
-    plt.tight_layout()
-    return fig_umid_luz
-
-def mostrar_tabela_resumo_umidade(df, li_umid, ls_umid):
-    col_umid = "Umidade (%UR)"
-    total = df[col_umid].count()
-
-    resumo_data = {
-        "%UR Mínima": [df[col_umid].min()],
-        "%UR Média": [df[col_umid].mean()],
-        "%UR Máxima": [df[col_umid].max()],
-        "%Abaixo da especificação": [((df[col_umid] < li_umid).sum() / total) * 100],
-        "%Dentro da especificação": [(((df[col_umid] >= li_umid) & (df[col_umid] <= ls_umid)).sum() / total) * 100],
-        "%Acima da especificação": [((df[col_umid] > ls_umid).sum() / total) * 100]
-    }
 
-    st.subheader("Tabela de resumo de dados de Umidade Relativa")
-    resumo_df = pd.DataFrame(resumo_data)
-    st.dataframe(
-        resumo_df.style
-            .format("{:.2f}")
-            .set_properties(**{"text-align": "center"})
-            .set_table_styles([{"selector": "th", "props": [("text-align", "center")]}])
-    )
-    return resumo_df
-
-def capturar_mapa(map_file):
-    """Captura o mapa Folium como imagem."""
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1200x800")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    driver.get(f"file:///{os.path.abspath(map_file)}")
-    time.sleep(5)
-    map_image = "mapa_interativo.png"
-    driver.save_screenshot(map_image)
-    driver.quit()
-    return map_image
-
-def adicionar_resumo_temp_pdf(pdf, resumo_df, max_page_width):
-    col_widths = [260 / len(resumo_df.columns)] * len(resumo_df.columns)
-    pdf.set_font("Arial", "B", 10)
-    pdf.ln(5)
-    pdf.cell(0, 10, "Tabela de resumo de dados de temperatura", ln=True, align="C")
-
-    pdf.set_font("Arial", "B", 8)
-    for i, col in enumerate(resumo_df.columns):
-        pdf.cell(col_widths[i], 8, col, border=1, align="C")
-    pdf.ln()
-
-    pdf.set_font("Arial", "", 8)
-    for i, val in enumerate(resumo_df.iloc[0]):
-        val_str = f"{val:.2f}" if isinstance(val, (float, int)) else str(val)
-        pdf.cell(col_widths[i], 8, val_str, border=1, align="C")
-    pdf.ln(10)
-
-def adicionar_resumo_umid_pdf(pdf, resumo_df, max_page_width):
-    col_widths = [260 / len(resumo_df.columns)] * len(resumo_df.columns)
-    pdf.set_font("Arial", "B", 10)
-    pdf.ln(5)
-    pdf.cell(0, 10, "Tabela de resumo de dados de Umidade Relativa", ln=True, align="C")
-
-    pdf.set_font("Arial", "B", 8)
-    for i, col in enumerate(resumo_df.columns):
-        pdf.cell(col_widths[i], 8, col, border=1, align="C")
-    pdf.ln()
-
-    pdf.set_font("Arial", "", 8)
-    for i, val in enumerate(resumo_df.iloc[0]):
-        val_str = f"{val:.2f}" if isinstance(val, (float, int)) else str(val)
-        pdf.cell(col_widths[i], 8, val_str, border=1, align="C")
-    pdf.ln(10)
-
-def criar_pdf(df, resumo_temp_pdf, resumo_temp_numeric, resumo_umid_pdf, resumo_umid_numeric,
-              marker_locations, map_image, fig_temp, fig_umid, fig_temp_luz, fig_umid_luz,
-              observacoes, li_temp, ls_temp, li_umid, ls_umid, resumo_temp_tabela, resumo_umid_tabela):
-    from fpdf import FPDF
-    import matplotlib.pyplot as plt
-    pdf = FPDF(orientation='L', unit='mm', format='A4')
-    pdf.set_margins(left=10, top=10, right=10)  # 1cm = 10mm
-    pdf.set_auto_page_break(auto=True, margin=10)
-    max_page_width = 277  # 297mm (A4 horizontal) - 2x10mm margem
-
-    # Página 1 – Capa
-    pdf.add_page(orientation='L')
-    pdf.set_font("Arial", "B", 28)
-    pdf.set_xy(10, (pdf.h - 20) / 2 - 20)
-    pdf.multi_cell(0, 20, "Dados brutos do teste de Distribuição térmica em Rota", align="C")
-
-    if observacoes:
-        pdf.ln(10)
-        pdf.set_font("Arial", "", 12)
-        pdf.multi_cell(0, 10, "Observações: " + observacoes, align="C")
-
-    # Página 2 – Mapa
-    pdf.add_page(orientation='L')
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Mapa do trajeto da rota", ln=True, align="C")
-    pdf.image(map_image, x=10, y=20, w=260)
-
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Gráfico de Temperaturas por Hora", ln=True, align="C")
-    fig_temp.savefig("temp_graph.png")
-    pdf.image("temp_graph.png", x=10, y=20, w=260)
-
-    pdf.add_page()
-    draw_table(pdf, resumo_temp_pdf.columns.tolist(), resumo_temp_pdf.values.tolist(),
-               "Resumo de Temperaturas por Hora", max_page_width,
-               li_temp=li_temp, ls_temp=ls_temp,
-               row_height=8, allow_header_break=True,
-               is_summary_table=True, numeric_data=resumo_temp_numeric.values.tolist())
-
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Gráfico de Umidade Relativa por Hora", ln=True, align="C")
-    fig_umid.savefig("umid_graph.png")
-    pdf.image("umid_graph.png", x=10, y=20, w=260)
-
-    pdf.add_page()
-    draw_table(pdf, resumo_umid_pdf.columns.tolist(), resumo_umid_pdf.values.tolist(),
-               "Resumo de Umidade Relativa por Hora", max_page_width,
-               li_umid=li_umid, ls_umid=ls_umid,
-               row_height=8, allow_header_break=True,
-               is_summary_table=True, numeric_data=resumo_umid_numeric.values.tolist())
-
-    pdf.add_page(orientation='L')
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Gráfico de Temperatura e Luz ao Longo do Tempo", ln=True, align="C")
-
-    # Salvar gráfico reduzido
-    temp_luz_path = "grafico_temp_luz.png"
-    fig_temp_luz.set_size_inches(10, 3.5)  # reduzir tamanho físico do gráfico
-    fig_temp_luz.tight_layout()
-    fig_temp_luz.savefig(temp_luz_path, bbox_inches='tight')
-
-    # Inserir imagem e deixar espaço
-    pdf.image(temp_luz_path, x=10, y=20, w=260, h=90)
-
-    # Espaço depois do gráfico
-    pdf.set_y(120)
-
-    # Inserir tabela na mesma página
-    adicionar_resumo_temp_pdf(pdf, resumo_temp_tabela, max_page_width)
-
-    pdf.add_page(orientation='L')
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Gráfico de Umidade relativa e Luz ao Longo do Tempo", ln=True, align="C")
-
-    umid_luz_path = "grafico_umid_luz.png"
-    fig_umid_luz.set_size_inches(10, 3.5)
-    fig_umid_luz.tight_layout()
-    fig_umid_luz.savefig(umid_luz_path, bbox_inches='tight')
-
-    pdf.image(umid_luz_path, x=10, y=20, w=260, h=90)
-    pdf.set_y(120)
-    adicionar_resumo_umid_pdf(pdf, resumo_umid_tabela, max_page_width)
-
-    pdf.add_page()
-    df_pdf = df.drop(columns=["Hora"])
-    draw_table(pdf, df_pdf.columns.tolist(), df_pdf.values.tolist(), "",
-               max_page_width, li_temp=li_temp, ls_temp=ls_temp,
-               li_umid=li_umid, ls_umid=ls_umid, row_height=8)
-
-    pdf.output("relatorio_temp.pdf")
-    return pdf.page_no()
-
-def add_page_numbers(input_pdf, output_pdf):
-    existing_pdf = PdfReader(input_pdf)
-    output = PdfWriter()
-
-    for i, page in enumerate(existing_pdf.pages):
-        packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=landscape(A4))
-
-        # Centralizar horizontalmente com base na largura da página
-        page_width = landscape(A4)[0]
-        text = f"{i + 1} de {len(existing_pdf.pages)}"
-        text_width = can.stringWidth(text, "Helvetica", 10)
-        x = (page_width - text_width) / 2  # Centralizado
-        y = 15  # Distância do rodapé
-
-        can.setFont("Helvetica", 10)
-        can.drawString(x, y, text)
-        can.save()
-        packet.seek(0)
-
-        overlay = PdfReader(packet)
-        page.merge_page(overlay.pages[0])
-        output.add_page(page)
-
-    with open(output_pdf, "wb") as f:
-        output.write(f)
-
-def formatar_numero_pdf(valor):
+def mostrar_excursoes(resumo, excursoes):
+    """Exibe os indicadores ponderados pelo tempo e a lista de excursões fora de LI/LS."""
+    st.subheader("⏱️ Excursões fora da especificação")
+    if resumo.empty:
+        st.info("Nenhum canal com limites de especificação.")
+        return
+    resumo = resumo.copy()
+    for coluna in ("Tempo fora", "Maior excursão"):
+        resumo[coluna] = resumo[coluna].map(formatar_duracao)
+    st.dataframe(resumo.style.format("{:.2f}", subset=resumo.select_dtypes("float").columns, na_rep="-"),
+                 use_container_width=True, hide_index=True)
+    st.caption("Percentuais ponderados pelo tempo de cada leitura (até a leitura seguinte). "
+               "TCM: temperatura cinética média.")
+    if len(excursoes) == 0:
+        st.success("✅ Nenhuma excursão fora da especificação.")
+        return
+    with st.expander(f"Lista das {len(excursoes)} excursões (início, fim, duração, pico e local)"):
+        tabela = excursoes.copy()
+        tabela["Duração"] = tabela["Duração"].map(formatar_duracao)
+        formatos = {"Pico": "{:.2f}", "latitude": "{:.6f}", "longitude": "{:.6f}"}
+        st.dataframe(tabela.style.format({c: f for c, f in formatos.items() if c in tabela.columns}),
+                     use_container_width=True, hide_index=True)
+
+# Etapas do processamento, memorizadas entre os reruns do Streamlit:
+# carga → endereços → resumos → gráficos → mapa → PDF. Cada etapa é indexada
+# pela chave do arquivo (hash do conteúdo) e só pelos parâmetros de que
+# depende; DataFrames e figuras entram em argumentos com "_", que o Streamlit
+# não hasheia. Mudar um limite refaz só os percentuais e os gráficos (em
+# paralelo); mudar as observações refaz só a montagem do PDF.
+
+def chave_do_upload(uploaded_file):
+    """Chave do arquivo enviado, calculada uma vez por upload e guardada na sessão."""
+    chaves = st.session_state.setdefault("chaves_arquivos", {})
+    identificador = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None))
+    if identificador not in chaves:
+        chaves[identificador] = chave_arquivo(uploaded_file, planilha="Sheet1")
+    return chaves[identificador]
+
+MAX_ENDERECOS_MEMORIZADOS = 8
+
+@st.cache_resource
+def enderecos_memorizados():
+    """Colunas de endereço já calculadas, das mais antigas às mais recentes, e o lock que as protege."""
+    return OrderedDict(), threading.Lock()
+
+def etapa_enderecos(chave, metodo, parametro, raio_metros, df, progress_bar=None):
     """
-    Formata números para exibição no PDF com exatamente 2 casas decimais.
+    Endereços de todos os pontos (`metodo` None) ou só dos waypoints. Fica
+    fora do st.cache_data porque atualiza a barra de progresso da página;
+    só as colunas novas são memorizadas, e a barra não é tocada quando já
+    estão prontas.
     """
-    try:
-        if isinstance(valor, (int, float)):
-            return f"{float(valor):.2f}"
+    memoria, lock = enderecos_memorizados()
+    chave_enderecos = (chave, metodo, parametro, raio_metros)
+    with lock:
+        colunas = memoria.get(chave_enderecos)
+        if colunas is not None:
+            memoria.move_to_end(chave_enderecos)
+    if colunas is None:
+        if metodo:
+            resultado = adicionar_enderecos_por_waypoints(df.copy(), metodo, parametro, progress_bar,
+                                                          raio_metros=raio_metros)
         else:
-            # Tenta converter string para float
-            num = float(str(valor).replace(",", "."))
-            return f"{num:.2f}"
-    except (ValueError, TypeError):
-        return str(valor)
+            resultado = adicionar_enderecos_ao_dataframe(df.copy(), progress_bar, raio_metros=raio_metros)
+        colunas = {c: resultado[c].to_numpy() for c in resultado.columns if c not in df.columns}
+        with lock:
+            memoria[chave_enderecos] = colunas
+            while len(memoria) > MAX_ENDERECOS_MEMORIZADOS:
+                memoria.popitem(last=False)
+    return df.assign(**colunas)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def etapa_mapa(chave, config_enderecos, max_marcadores, tolerancia_metros, _df):
+    """HTML do mapa e tabela de localizações; `config_enderecos` é None sem endereços."""
+    if config_enderecos is None:
+        return criar_mapa(_df, max_marcadores, tolerancia_metros)
+    return criar_mapa_com_enderecos(_df, max_marcadores, tolerancia_metros)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def etapa_estatisticas(chave, canais_sem_limites, _df):
+    """Mínima/média/máxima por hora e gerais; não dependem dos limites."""
+    tuplas = [(c.coluna, c.nome, None, None) for c in canais_sem_limites]
+    return (calcular_resumo_por_hora(_df, tuplas, percentuais=False),
+            calcular_resumos_gerais(_df, canais_sem_limites, percentuais=False))
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def etapa_percentuais(chave, canais, _df):
+    """Percentuais abaixo/dentro/acima da especificação, por hora e gerais."""
+    tuplas = [(c.coluna, c.nome, c.li, c.ls) for c in canais]
+    return (calcular_resumo_por_hora(_df, tuplas, estatisticas=False),
+            calcular_resumos_gerais(_df, canais, estatisticas=False))
+
+def etapa_resumos(chave, canais, df):
+    """Junta as estatísticas e os percentuais nos resumos por hora e gerais de cada canal."""
+    sem_limites = [c.com_limites(None, None) for c in canais]
+    estatisticas_hora, estatisticas_gerais = etapa_estatisticas(chave, sem_limites, df)
+    percentuais_hora, percentuais_gerais = etapa_percentuais(chave, canais, df)
+
+    combinado = pd.concat([estatisticas_hora, percentuais_hora.drop(columns="Intervalo")], axis=1)
+    resumos = separar_resumos_por_canal(combinado, canais)
+    resumos_gerais = {
+        canal.nome: pd.concat([estatisticas_gerais[canal.nome], percentuais_gerais[canal.nome]], axis=1)
+        for canal in canais
+    }
+    return resumos, resumos_gerais
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def etapa_excursoes(chave, config_enderecos, canais, _df):
+    """Excursões e indicadores ponderados pelo tempo; o local das excursões depende dos endereços."""
+    return calcular_excursoes(_df, canais)
 
-def calculate_column_widths_with_address(pdf, data, headers):
+@st.cache_data(show_spinner=False, max_entries=8)
+def etapa_bases_graficos(chave, canais_sem_limites, _df, _resumos):
+    """Gráficos sem as linhas LI/LS, serializados; não dependem dos limites."""
+    return desenhar_bases_graficos(_df, _resumos, canais_sem_limites, obter_pool_graficos())
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def etapa_graficos(chave, canais, _df, _resumos):
     """
-    Calcula a largura das colunas considerando endereços longos.
+    PNGs dos gráficos na tela e no PDF, uma tarefa por figura no pool de
+    processos. Só os bytes voltam; nenhuma figura fica no processo do app.
+    Mudar um limite só aplica as linhas LI/LS às bases já desenhadas.
     """
-    col_widths = []
-    max_page_width = 277  # Largura máxima da página
-    
-    for col_idx in range(len(headers)):
-        header_name = headers[col_idx].strip().lower()
-        
-        if header_name == "endereco":
-            # Coluna de endereço recebe 40% da largura da página
-            col_widths.append(max_page_width * 0.40)
-        else:
-            # Outras colunas recebem largura baseada no conteúdo
-            col_content = [str(headers[col_idx])] + [str(row[col_idx]) for row in data if len(row) > col_idx]
-            max_width = max(pdf.get_string_width(str(item)) for item in col_content)
-            col_widths.append(max_width + 8)
-    
-    # Ajusta proporcionalmente se necessário
-    total_width = sum(col_widths)
-    if total_width > max_page_width:
-        ratio = max_page_width / total_width
-        col_widths = [w * ratio for w in col_widths]
-    
-    return [round(w, 2) for w in col_widths]
+    sem_limites = [c.com_limites(None, None) for c in canais]
+    bases = etapa_bases_graficos(chave, sem_limites, _df, _resumos)
+    return renderizar_graficos(_df, _resumos, canais, obter_pool_graficos(), bases=bases)
 
-def check_if_text_fits_in_width(pdf, text, width):
+@st.cache_data(show_spinner=False, max_entries=8)
+def etapa_imagem_mapa(chave, config_enderecos, max_marcadores, tolerancia_metros, estatico, usar_tiles,
+                      _df, _map_html):
     """
-    Verifica se o texto cabe na largura especificada.
+    Imagem do mapa para o PDF, estática ou capturada do mapa interativo; as
+    opções do mapa entram na chave porque mudam o HTML capturado.
     """
-    text_width = pdf.get_string_width(str(text))
-    return text_width <= width
-
-def draw_table(pdf, headers, data, title, max_page_width,
-               li_temp=None, ls_temp=None, li_umid=None, ls_umid=None,
-               row_height=8, allow_header_break=True,
-               is_summary_table=False, numeric_data=None):
-    
-    # Calcula larguras das colunas
-    col_widths = calculate_column_widths_with_address(pdf, data, headers)
-
-    if title:
-        pdf.set_font("Arial", "B", 14)
-        pdf.cell(0, 10, title, ln=True, align="C")
-        pdf.ln(1)
-
-    # Cabeçalho
-    pdf.set_font("Arial", "B", 8)
-    pdf.set_fill_color(200, 220, 255)
-    for i, header in enumerate(headers):
-        pdf.cell(col_widths[i], row_height, str(header), border=1, fill=True, align="C")
-    pdf.ln()
-    pdf.set_font("Arial", "", 8)
-
-    # Dados
-    for row_idx, row in enumerate(data):
-        # CORREÇÃO: Verifica se algum endereço na linha precisa quebrar
-        needs_line_break = False
-        for col_idx, cell in enumerate(row):
-            header_name = headers[col_idx].strip().lower()
-            if header_name == "endereco":
-                cell_value = str(cell)
-                # Codificação segura para latin-1
-                try:
-                    cell_value.encode('latin-1')
-                except UnicodeEncodeError:
-                    cell_value = cell_value.encode('latin-1', 'replace').decode('latin-1')
-                
-                # Verifica se o texto não cabe na largura da coluna
-                if not check_if_text_fits_in_width(pdf, cell_value, col_widths[col_idx]):
-                    needs_line_break = True
-                    break
-        
-        # CORREÇÃO: Define altura baseada na necessidade de quebra - ALTURA REDUZIDA
-        current_row_height = row_height * 1.8 if needs_line_break else row_height
-        
-        # Verifica se precisa de nova página
-        if pdf.get_y() + current_row_height > pdf.h - pdf.b_margin - 15:
-            if allow_header_break:
-                pdf.add_page()
-                pdf.set_font("Arial", "B", 8)
-                pdf.set_fill_color(200, 220, 255)
-                for i, header in enumerate(headers):
-                    pdf.cell(col_widths[i], row_height, str(header), border=1, fill=True, align="C")
-                pdf.ln()
-                pdf.set_font("Arial", "", 8)
-
-        # Salva posição inicial da linha
-        start_y = pdf.get_y()
-        
-        # Processa cada célula da linha
-        for col_idx, cell in enumerate(row):
-            align = "C" if is_numeric(cell) else "L"
-            header_name = headers[col_idx].strip().lower()
-
-            # Configuração de cores para temperatura e umidade
-            if header_name in ["temperatura (°c)", "umidade (%ur)"] or (
-                is_summary_table and header_name in [
-                    "temperatura_mínima", "temperatura_média", "temperatura_máxima",
-                    "umidade_mínima", "umidade_média", "umidade_máxima"
-                ]
-            ):
-                try:
-                    if is_summary_table and numeric_data is not None:
-                        value = float(numeric_data[row_idx][col_idx])
-                    else:
-                        value = float(cell) if isinstance(cell, (int, float)) else float(str(cell).replace(",", "."))
-
-                    if header_name.startswith("temperatura"):
-                        li = li_temp
-                        ls = ls_temp
-                    elif header_name.startswith("umidade"):
-                        li = li_umid
-                        ls = ls_umid
-                    else:
-                        li = ls = None
-
-                    if li is not None and ls is not None:
-                        if value > ls:
-                            pdf.set_text_color(255, 0, 0)
-                        elif value < li:
-                            pdf.set_text_color(0, 0, 255)
-                        else:
-                            pdf.set_text_color(0, 0, 0)
-                    else:
-                        pdf.set_text_color(0, 0, 0)
-                except (ValueError, TypeError):
-                    pdf.set_text_color(0, 0, 0)
-            else:
-                pdf.set_text_color(0, 0, 0)
-
-            # Formatação do conteúdo
-            if is_numeric(cell):
-                cell_value = formatar_numero_pdf(cell)
-            else:
-                cell_value = str(cell)
-                
-            # Codificação segura para latin-1
-            try:
-                cell_value.encode('latin-1')
-            except UnicodeEncodeError:
-                cell_value = cell_value.encode('latin-1', 'replace').decode('latin-1')
-
-            # CORREÇÃO: Tratamento especial para endereços
-            if header_name == "endereco":
-                x = pdf.get_x()
-                y = pdf.get_y()
-                
-                # CORREÇÃO: Só usa multi_cell se o texto não couber
-                if not check_if_text_fits_in_width(pdf, cell_value, col_widths[col_idx]):
-                    # CORREÇÃO: Usa altura menor para multi_cell (4px ao invés de 5px)
-                    pdf.multi_cell(col_widths[col_idx], 4, cell_value, border=1, align="L")
-                else:
-                    # Usa cell normal para textos que cabem
-                    pdf.cell(col_widths[col_idx], current_row_height, cell_value, border=1, align="L")
-                
-                # Reposiciona para a próxima coluna
-                pdf.set_xy(x + col_widths[col_idx], y)
-            else:
-                # CORREÇÃO: Todas as outras células usam a altura calculada
-                pdf.cell(col_widths[col_idx], current_row_height, cell_value, border=1, align=align)
-
-        # CORREÇÃO: Move para a próxima linha usando a altura calculada
-        pdf.set_y(start_y + current_row_height)
-        
-    pdf.set_text_color(0, 0, 0)
-
-def calculate_column_widths(pdf, data, headers):
-    """Calcula a largura das colunas com base no conteúdo."""
-    col_widths = []
-    for col_idx in range(len(headers)):
-        col_content = [str(headers[col_idx])] + [str(row[col_idx]) for row in data if len(row) > col_idx]
-        max_width = max(pdf.get_string_width(str(item)) for item in col_content)
-        col_widths.append(max_width + 8)  # Margem extra para não cortar texto
-    return col_widths
-
-def adjust_column_widths(col_widths, max_page_width):
-    """Ajusta as larguras das colunas proporcionalmente para caber na largura da página."""
-    total_width = sum(col_widths)
-    if total_width > max_page_width:
-        ratio = max_page_width / total_width
-        col_widths = [min(w * ratio, 50) for w in col_widths]  # de 65 para 50
-    return [round(w, 2) for w in col_widths]
-
-def is_numeric(value):
-    """Verifica se um valor pode ser interpretado como numérico (float)."""
-    try:
-        float(str(value).replace(",", "."))
-        return True
-    except (ValueError, TypeError):
-        return False
+    if estatico:
+        return capturar_mapa_estatico(_df, usar_tiles=usar_tiles)
+    return capturar_mapa(_map_html)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def etapa_estimativa_apendice(chave, config_enderecos, canais, apendice, _df):
+    """Páginas e bytes previstos para o apêndice de dados brutos."""
+    from relatorio_pdf import estimar_apendice
+
+    return estimar_apendice(_df, canais, apendice)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def etapa_arquivo_bruto(chave, config_enderecos, formato, _df):
+    """Dados brutos em CSV/XLSX, para o modo anexo e para download."""
+    return apendice_pdf.arquivo_dados_brutos(_df.drop(columns=["Hora"]), formato)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def etapa_pdf(chave, config_enderecos, max_marcadores, tolerancia_metros, canais, observacoes, estatico,
+              usar_tiles, apendice, _df, _resumos, _resumos_gerais, _imagens_figuras, _marker_locations, _map_image,
+              _arquivo_anexo=None, _excursoes=None):
+    """Relatório PDF; só a montagem é refeita quando apenas as observações mudam."""
+    from relatorio_pdf import criar_pdf
+
+    return criar_pdf(_df, canais, _resumos, _resumos_gerais, None, _marker_locations, _map_image,
+                     observacoes, imagens_figuras=_imagens_figuras, apendice=apendice,
+                     arquivo_anexo=_arquivo_anexo, excursoes=_excursoes)
+
+def formatar_bytes(tamanho):
+    """Tamanho legível, em KB ou MB."""
+    if tamanho < 1024 * 1024:
+        return f"{tamanho / 1024:.0f} KB"
+    return f"{tamanho / 1024 / 1024:.1f} MB"
+
+def mostrar_painel_diagnostico(registro):
+    """Tempo, pico de memória e linhas de cada etapa desde o início do processo, e os caches."""
+    st.subheader("🩺 Diagnóstico")
+    st.caption("Medições de todas as sessões desde o início do servidor. Etapas reaproveitadas "
+               "do cache do Streamlit não são executadas e não aparecem de novo.")
+    etapas = registro.resumo()
+    if etapas:
+        tabela = pd.DataFrame([
+            {"Etapa": etapa, "Chamadas": t["chamadas"], "Erros": t["erros"],
+             "Total (s)": t["segundos"], "Última (s)": t["ultimo_segundos"], "Máx (s)": t["max_segundos"],
+             "Pico de memória (MB)": None if t["pico_bytes"] is None else t["pico_bytes"] / 1024 / 1024,
+             "Linhas": t["linhas"]}
+            for etapa, t in etapas.items()
+        ]).sort_values("Total (s)", ascending=False)
+        st.dataframe(estilo_numerico(tabela, "{:.3f}"), use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhuma etapa foi executada ainda.")
+
+    caches = estatisticas_caches()
+    colunas = st.columns(len(caches))
+    for coluna, (nome, valores) in zip(colunas, caches.items()):
+        coluna.metric(f"Cache de {'endereços' if nome == 'enderecos' else nome}", f"{valores['taxa_acerto']:.0%}",
+                      help=f"{valores['acertos']} acertos, {valores['faltas']} faltas")
+
+    col_diag1, col_diag2 = st.columns(2)
+    col_diag1.download_button("📥 Métricas (formato Prometheus)", data=texto_prometheus(registro, caches),
+                              file_name="metricas.txt", mime="text/plain")
+    if col_diag2.button("Limpar medições"):
+        registro.limpar()
+        st.rerun()
+
+@st.cache_resource
+def iniciar_servidor_metricas():
+    """Endpoint /metrics, iniciado uma vez e só no processo principal do Streamlit."""
+    return obter_servidor_metricas()
 
 # Interface Streamlit
 st.set_page_config(page_title="Gerador de Mapas e Análises com Geocodificação", layout="wide")
+
+# Diagnóstico opcional: o endpoint /metrics só sobe com ROUTE_METRICAS_PORTA definida
+iniciar_servidor_metricas()
+registro_instrumentacao = obter_registro()
+diagnostico = st.sidebar.checkbox("🩺 Painel de diagnóstico", value=False)
+if diagnostico:
+    medir_memoria = st.sidebar.checkbox(
+        "Medir pico de memória", value=registro_instrumentacao.medir_memoria,
+        help="Usa o tracemalloc, que deixa as etapas bem mais lentas enquanto estiver ligado."
+    )
+    if medir_memoria != registro_instrumentacao.medir_memoria:
+        registro_instrumentacao.ativar_memoria(medir_memoria)
 st.title("🗺️ Gerador de Mapas e Análises com Geocodificação")
 
 st.markdown("""
@@ -870,33 +308,91 @@ if analysis_type == "Temperatura e Umidade":
 observacoes = st.text_area("📝 Observações", placeholder="Insira observações sobre a análise...")
 
 # Upload do arquivo Excel
-uploaded_file = st.file_uploader("📁 Arraste e solte o arquivo Excel aqui", type=["xlsx"])
-
-if uploaded_file is not None:
-    df = carregar_dados(uploaded_file)
+uploaded_file = st.file_uploader("📁 Arraste e solte o arquivo Excel (ou CSV) aqui", type=["xlsx", "csv"])
+memoria_limitada = st.checkbox(
+    "Modo de memória limitada (somente resumos)", value=False,
+    help="Lê o arquivo em blocos e calcula os resumos sem manter as linhas na memória. "
+         "Indicado para arquivos de várias semanas; mapa, gráficos e PDF não são gerados."
+)
+
+if uploaded_file is not None and memoria_limitada:
+    try:
+        limites = {"temperatura": (li_temp, ls_temp), "umidade": (li_umid, ls_umid)}
+        with st.spinner("Lendo o arquivo em blocos..."):
+            canais, resumos, resumos_gerais, total_linhas = resumir_em_blocos(uploaded_file, limites)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados: {e}")
+    else:
+        st.success(f"✅ {total_linhas} linhas processadas em blocos de {TAMANHO_BLOCO_PADRAO}.")
+        for canal in canais:
+            icone = "🌡️" if canal.tipo == "temperatura" else "💧"
+            st.subheader(f"{icone} Resumo de {canal.titulo_plural} por Hora")
+            st.dataframe(estilo_numerico(resumos[canal.nome]))
+            mostrar_tabela_resumo(canal, resumos_gerais[canal.nome])
+
+elif uploaded_file is not None:
+    chave = chave_do_upload(uploaded_file)
+    try:
+        df = carregar_dados(uploaded_file, chave=chave)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados: {e}")
+        df = None
     if df is not None:
+        mostrar_relatorio_coordenadas(df.attrs.get("relatorio_coordenadas"))
+
         # Opção para adicionar geocodificação
         st.subheader("🌍 Geocodificação")
         add_geocoding = st.checkbox("Adicionar endereços baseados nas coordenadas", value=True)
+        modos_geocodificacao = {
+            "Todos os pontos": None,
+            "Somente waypoints (simplificação Douglas-Peucker)": ("douglas_peucker", "Tolerância (m)", 50.0),
+            "Somente waypoints (a cada X metros)": ("distancia", "Espaçamento (m)", 500.0),
+            "Somente waypoints (a cada X minutos)": ("tempo", "Intervalo (min)", 10.0),
+            "Somente waypoints (paradas detectadas)": ("paradas", "Duração mínima da parada (min)", 5.0),
+        }
+        modo_geocodificacao = st.selectbox("Modo de geocodificação", list(modos_geocodificacao.keys()))
+        config_waypoints = modos_geocodificacao[modo_geocodificacao]
+        if config_waypoints:
+            parametro_waypoints = st.number_input(config_waypoints[1], value=config_waypoints[2],
+                                                  min_value=0.1, step=1.0)
+        raio_agrupamento = st.number_input(
+            "Raio de reaproveitamento de endereços (m)", value=RAIO_PADRAO_METROS, min_value=0.0, step=5.0,
+            help="Pontos a menos dessa distância de um ponto já consultado usam o mesmo endereço."
+        )
         
+        config_enderecos = None
         if add_geocoding:
+            metodo_waypoints = config_waypoints[0] if config_waypoints else None
+            config_enderecos = (metodo_waypoints, parametro_waypoints if config_waypoints else None,
+                                raio_agrupamento)
             if 'endereco' not in df.columns:
                 st.info("🔍 Buscando endereços para as coordenadas...")
                 progress_bar = st.progress(0)
-                df = adicionar_enderecos_ao_dataframe(df, progress_bar)
+                df = etapa_enderecos(chave, *config_enderecos, df, progress_bar)
                 progress_bar.empty()
                 st.success("✅ Endereços adicionados com sucesso!")
+                estatisticas_cache = obter_cache_enderecos().estatisticas()
+                st.caption(
+                    f"Cache de endereços: {estatisticas_cache['acertos']} acertos, "
+                    f"{estatisticas_cache['faltas']} faltas "
+                    f"({estatisticas_cache['taxa_acerto']:.0%} de aproveitamento)"
+                )
             
-            # Cria mapa com endereços
-            map_file, marker_locations = criar_mapa_com_enderecos(df)
-        else:
-            # Usa função original sem endereços
-            map_file, marker_locations = criar_mapa(df)
+        # Cria o mapa (com endereços nos popups, se houver)
+        with st.expander("⚙️ Opções do mapa"):
+            col_mapa1, col_mapa2 = st.columns(2)
+            max_marcadores = col_mapa1.number_input(
+                "Máximo de marcadores no mapa", value=MAX_MARCADORES_PADRAO, min_value=2, step=100,
+                help="Em rotas com mais pontos, os marcadores ficam espaçados ao longo da rota e agrupados."
+            )
+            tolerancia_linha = col_mapa2.number_input(
+                "Simplificação da linha (m)", value=TOLERANCIA_LINHA_PADRAO, min_value=0.0, step=1.0,
+                help="Desvio máximo da linha desenhada em relação aos pontos; 0 desenha todos os pontos."
+            )
+        map_html, marker_locations = etapa_mapa(chave, config_enderecos, max_marcadores, tolerancia_linha, df)
 
         # Exibe o mapa
         st.subheader("🗺️ Mapa da Rota")
-        with open(map_file, 'r', encoding='utf-8') as f:
-            map_html = f.read()
         st.components.v1.html(map_html, height=600)
 
         # Mostra tabela de localizações
@@ -908,14 +404,13 @@ if uploaded_file is not None:
         st.dataframe(coords_df, use_container_width=True)
 
         # Cálculos e análises
-        resumo_temp_display, resumo_temp_pdf, resumo_temp_numeric = calcular_resumo_temperatura(df, li_temp, ls_temp)
-        resumo_umid_display, resumo_umid_pdf, resumo_umid_numeric = calcular_resumo_umidade(df, li_umid, ls_umid)
-
-        st.subheader("🌡️ Resumo de Temperaturas por Hora")
-        st.dataframe(resumo_temp_display)
+        canais = detectar_canais(df.columns, {"temperatura": (li_temp, ls_temp), "umidade": (li_umid, ls_umid)})
+        resumos, resumos_gerais = etapa_resumos(chave, canais, df)
 
-        st.subheader("💧 Resumo de Umidade Relativa por Hora")
-        st.dataframe(resumo_umid_display)
+        for canal in canais:
+            icone = "🌡️" if canal.tipo == "temperatura" else "💧"
+            st.subheader(f"{icone} Resumo de {canal.titulo_plural} por Hora")
+            st.dataframe(estilo_numerico(resumos[canal.nome]))
 
         # Mostra dados completos incluindo endereços se disponível
         df_display = df.drop(columns=["Hora"])
@@ -923,44 +418,104 @@ if uploaded_file is not None:
         st.dataframe(df_display)
 
         # Criar gráficos
-        fig_temp, fig_umid, fig_temp_luz = criar_graficos(df, resumo_temp_display, resumo_umid_display, li_temp, ls_temp, li_umid, ls_umid)
-        fig_umid_luz = criar_grafico_umidade_luz(df, li_umid, ls_umid)
-
-        st.subheader("📈 Gráfico de Temperaturas por Hora")
-        st.pyplot(fig_temp)
+        imagens_tela, imagens_pdf = etapa_graficos(chave, canais, df, resumos)
 
-        st.subheader("📈 Gráfico de Umidade Relativa por Hora")
-        st.pyplot(fig_umid)
+        for canal in canais:
+            st.subheader(f"📈 Gráfico de {canal.titulo_plural} por Hora")
+            st.image(imagens_tela[canal.nome][0], use_container_width=True)
 
-        st.subheader("📈 Gráfico de Temperatura e Luz ao Longo do Tempo")
-        st.pyplot(fig_temp_luz)
-        # Mostrar tabela de resumo de temperatura abaixo do gráfico
-        resumo_temp_tabela = mostrar_tabela_resumo_temperatura(df, li_temp, ls_temp)
+        titulo_luz = " e Luz" if COLUNA_LUZ in df.columns else ""
+        for canal in canais:
+            st.subheader(f"📈 Gráfico de {canal.titulo}{titulo_luz} ao Longo do Tempo")
+            st.image(imagens_tela[canal.nome][1], use_container_width=True)
+            # Mostrar tabela de resumo abaixo do gráfico
+            mostrar_tabela_resumo(canal, resumos_gerais[canal.nome])
 
-        st.subheader("📈 Gráfico de Umidade relativa e Luz ao Longo do Tempo")
-        st.pyplot(fig_umid_luz)
-        # Mostrar tabela de resumo de umidade relativa abaixo do gráfico
-        resumo_umid_tabela = mostrar_tabela_resumo_umidade(df, li_umid, ls_umid)
+        excursoes = etapa_excursoes(chave, config_enderecos, canais, df)
+        mostrar_excursoes(*excursoes)
 
         # Botão para gerar relatório PDF
+        modo_mapa_pdf = st.radio(
+            "Mapa no relatório PDF",
+            ["Estático (rápido, sem navegador)", "Captura do mapa interativo (navegador)"],
+            horizontal=True
+        )
+        usar_tiles_pdf = False
+        if modo_mapa_pdf.startswith("Estático"):
+            usar_tiles_pdf = st.checkbox("Usar fundo do OpenStreetMap (tiles em cache local)", value=False)
+        else:
+            # Abre o navegador enquanto o usuário ainda está olhando a página
+            aquecer_em_segundo_plano()
+
+        # Dados brutos no final do PDF: modo, parâmetro e previsão de tamanho
+        modos_apendice = {
+            "Completo": (apendice_pdf.COMPLETO, None, None, None),
+            "Uma linha a cada N linhas": (apendice_pdf.A_CADA_N_LINHAS, "N (linhas)", 10, 1),
+            "Uma linha a cada N minutos": (apendice_pdf.A_CADA_N_MINUTOS, "N (minutos)", 10.0, 0.1),
+            "Somente excursões (fora de LI/LS)": (apendice_pdf.EXCURSOES, "Linhas de contexto",
+                                                  apendice_pdf.CONTEXTO_EXCURSOES_PADRAO, 0),
+            "Arquivo CSV/XLSX anexado ao PDF": (apendice_pdf.ANEXO, None, None, None),
+        }
+        estimativa_completa = etapa_estimativa_apendice(chave, config_enderecos, canais,
+                                                        (apendice_pdf.COMPLETO, None), df)
+        # Viagens longas começam amostradas, para o relatório sair em tempo limitado
+        indice_padrao = 0 if estimativa_completa["paginas"] <= apendice_pdf.MAX_PAGINAS_APENDICE else 2
+        col_apendice1, col_apendice2 = st.columns(2)
+        modo_apendice = col_apendice1.selectbox(
+            "Dados brutos no relatório PDF", list(modos_apendice.keys()), index=indice_padrao,
+            help=f"O apêndice completo teria {estimativa_completa['paginas']} páginas."
+        )
+        modo, rotulo_parametro, valor_padrao, valor_minimo = modos_apendice[modo_apendice]
+        parametro_apendice = None
+        if modo == apendice_pdf.ANEXO:
+            parametro_apendice = col_apendice2.radio("Formato do anexo", ["csv", "xlsx"], horizontal=True)
+        elif rotulo_parametro:
+            parametro_apendice = col_apendice2.number_input(rotulo_parametro, value=valor_padrao,
+                                                            min_value=valor_minimo)
+        config_apendice = (modo, parametro_apendice)
+
+        estimativa = etapa_estimativa_apendice(chave, config_enderecos, canais, config_apendice, df)
+        if modo == apendice_pdf.ANEXO:
+            st.caption(f"Previsão: 1 página no PDF e anexo de ~{formatar_bytes(estimativa['bytes'])} "
+                       f"com {estimativa['linhas']} linhas.")
+        else:
+            st.caption(f"Previsão do apêndice: {estimativa['linhas']} linhas, ~{estimativa['paginas']} "
+                       f"páginas, ~{formatar_bytes(estimativa['bytes'])}.")
+
         if st.button("📄 Gerar Relatório PDF"):
             with st.spinner("Gerando relatório PDF..."):
-                map_image = capturar_mapa(map_file)
-                criar_pdf(
-                    df, resumo_temp_pdf, resumo_temp_numeric,
-                    resumo_umid_pdf, resumo_umid_numeric,
-                    marker_locations, map_image,
-                    fig_temp, fig_umid, fig_temp_luz, fig_umid_luz,
-                    observacoes, li_temp, ls_temp, li_umid, ls_umid,
-                    resumo_temp_tabela, resumo_umid_tabela
+                estatico = modo_mapa_pdf.startswith("Estático")
+                map_image = etapa_imagem_mapa(chave, config_enderecos, max_marcadores, tolerancia_linha, estatico,
+                                              usar_tiles_pdf, df, map_html)
+                if not estatico:
+                    metricas_captura = obter_pool_navegadores().metricas()
+                    ultima = metricas_captura["ultima_captura"]
+                    if ultima:
+                        st.caption(
+                            f"Captura do mapa: {ultima['tempo_captura']:.2f} s "
+                            f"(fila {ultima['tempo_fila']:.2f} s; média {metricas_captura['tempo_captura_medio']:.2f} s "
+                            f"em {metricas_captura['capturas']} capturas)"
+                            + ("" if ultima["pronto"] else " — mapa não sinalizou carregamento completo a tempo")
+                        )
+                arquivo_anexo = None
+                if modo == apendice_pdf.ANEXO:
+                    arquivo_anexo = etapa_arquivo_bruto(chave, config_enderecos, parametro_apendice, df)
+                pdf_bytes = etapa_pdf(
+                    chave, config_enderecos, max_marcadores, tolerancia_linha, canais, observacoes, estatico,
+                    usar_tiles_pdf, config_apendice, df, resumos, resumos_gerais, imagens_pdf, marker_locations, map_image, arquivo_anexo,
+                    excursoes
                 )
 
-                add_page_numbers("relatorio_temp.pdf", "relatorio.pdf")
-
-                with open("relatorio.pdf", "rb") as f:
-                    base64_pdf = base64.b64encode(f.read()).decode("utf-8")
-                href = f'<a href="data:file/pdf;base64,{base64_pdf}" download="relatorio.pdf">📥 Clique aqui para baixar o relatório PDF</a>'
-                st.markdown(href, unsafe_allow_html=True)
+                st.download_button(
+                    "📥 Clique aqui para baixar o relatório PDF",
+                    data=pdf_bytes,
+                    file_name="relatorio.pdf",
+                    mime="application/pdf"
+                )
+                if arquivo_anexo:
+                    dados_anexo, nome_anexo, tipo_anexo = arquivo_anexo
+                    st.download_button(f"📥 Baixar os dados brutos ({nome_anexo})", data=dados_anexo,
+                                       file_name=nome_anexo, mime=tipo_anexo)
                 st.success("✅ Relatório PDF gerado com sucesso!")
 
 else:
@@ -981,6 +536,7 @@ else:
        - `Umidade (%UR)`: Valores de umidade
        - `latitude` e `longitude`: Coordenadas geográficas
        - `Hora`: Identificador da hora de coleta
+       - *Sondas extras* (opcional): colunas como `Temperatura 2 (°C)` ou `Umidade 2 (%UR)` ganham resumos, gráficos e seções próprias no PDF
     
     ### 🎯 Melhorias Implementadas
     
@@ -992,8 +548,5 @@ else:
     - ✅ **Quebra inteligente** - só quebra quando endereço excede largura da coluna
     """)
 
-# Limpar arquivos temporários
-for file in ["mapa_interativo.html", "mapa.html", "grafico_temp_luz.png", "grafico_umid_luz.png", "mapa_interativo.png", "umid_graph.png", "umid_light_graph.png", "temp_graph.png", "temp_light_graph.png", "relatorio_temp.pdf", "relatorio.pdf"]:
-    if os.path.exists(file):
-        os.remove(file)
-
+if diagnostico:
+    mostrar_painel_diagnostico(registro_instrumentacao)
@@ -0,0 +1,242 @@
+"""
+Benchmark de ponta a ponta com arquivos sintéticos.
+
+Gera um arquivo de cada tamanho com `gerar_dados_sinteticos`, mede cada
+etapa do relatório em separado e grava os tempos em JSON, para comparar
+versões:
+
+    python benchmark.py --linhas 100 10000 100000 --saida bench.json
+    python benchmark.py --linhas 100 10000 100000 --comparar bench.json
+
+A geocodificação usa o servidor local (`nominatim_local`) e caches vazios em
+diretório temporário, então a medição não depende da rede nem de execuções
+anteriores. Os gráficos são desenhados no próprio processo.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import pandas as pd  # noqa: E402
+
+import apendice as apendice_pdf  # noqa: E402
+from cache_dados import CacheDados  # noqa: E402
+from canais import detectar_canais  # noqa: E402
+from coordenadas import normalizar_dataframe  # noqa: E402
+from gerar_dados_sinteticos import gerar_arquivo  # noqa: E402
+from gerar_relatorios import TIPOS_PARAMETRO_APENDICE, ler_apendice  # noqa: E402
+from geocodificacao import CacheEnderecos, MotorGeocodificacao  # noqa: E402
+from ingestao import ler_blocos_preparados  # noqa: E402
+from nominatim_local import ServidorNominatimLocal  # noqa: E402
+import relatorio  # noqa: E402
+
+ETAPAS = ("carga", "coordenadas", "carga_cache", "enderecos", "resumos", "graficos",
+          "mapa_html", "mapa_imagem", "pdf", "numeracao")
+LIMITES = {"temperatura": (15.0, 30.0), "umidade": (0.0, 100.0)}
+
+# Uma etapa só conta como regressão se ficar mais lenta na proporção e no absoluto
+TOLERANCIA_PADRAO = 1.25
+MINIMO_SEGUNDOS_REGRESSAO = 0.1
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def versao_codigo():
+    """Commit atual (com '+' se houver alterações), ou None fora de um repositório git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRETORIO,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=DIRETORIO,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+" if alterado else "")
+
+
+def executar(caminho, servidor, diretorio_cache, config_enderecos, apendice, taxa):
+    """Executa o relatório de um arquivo etapa por etapa; retorna (segundos por etapa, detalhes)."""
+    from relatorio_pdf import add_page_numbers, criar_pdf
+
+    tempos = {}
+    with relatorio.medir_etapa(tempos, "carga"):
+        df = pd.concat(list(ler_blocos_preparados(caminho)), ignore_index=True).dropna(axis=1, how="all")
+
+    with relatorio.medir_etapa(tempos, "coordenadas"):
+        df = normalizar_dataframe(df)
+        df["latitude"] = df["latitude"].astype(float)
+        df["longitude"] = df["longitude"].astype(float)
+
+    cache_dados = CacheDados(os.path.join(diretorio_cache, "uploads"))
+    cache_dados.guardar("benchmark", df)
+    with relatorio.medir_etapa(tempos, "carga_cache"):
+        df = cache_dados.obter("benchmark")
+
+    requisicoes = 0
+    if config_enderecos is not None:
+        metodo, parametro, raio_metros = config_enderecos
+        motor = MotorGeocodificacao(provedor="local", dominio=servidor.dominio, raio_metros=raio_metros,
+                                    requisicoes_por_segundo=taxa, cache=CacheEnderecos(diretorio_cache))
+        antes = servidor.requisicoes
+        with relatorio.medir_etapa(tempos, "enderecos"):
+            if metodo:
+                df = relatorio.adicionar_enderecos_por_waypoints(df, metodo, parametro, raio_metros=raio_metros,
+                                                                 motor=motor)
+            else:
+                df = relatorio.adicionar_enderecos_ao_dataframe(df, raio_metros=raio_metros, motor=motor)
+        requisicoes = servidor.requisicoes - antes
+
+    with relatorio.medir_etapa(tempos, "resumos"):
+        canais = detectar_canais(df.columns, LIMITES)
+        resumos = relatorio.calcular_resumos_por_hora(df, canais)
+        resumos_gerais = relatorio.calcular_resumos_gerais(df, canais)
+        excursoes = relatorio.calcular_excursoes(df, canais)
+
+    with relatorio.medir_etapa(tempos, "graficos"):
+        _, imagens_figuras = relatorio.renderizar_graficos(df, resumos, canais)
+
+    with relatorio.medir_etapa(tempos, "mapa_html"):
+        map_html, _ = relatorio.criar_mapa_com_enderecos(df)
+
+    with relatorio.medir_etapa(tempos, "mapa_imagem"):
+        map_image = relatorio.capturar_mapa_estatico(df)
+
+    with relatorio.medir_etapa(tempos, "pdf"):
+        pdf_bytes = criar_pdf(df, canais, resumos, resumos_gerais, None, None, map_image, "",
+                              imagens_figuras=imagens_figuras, apendice=apendice, excursoes=excursoes)
+
+    with relatorio.medir_etapa(tempos, "numeracao"):
+        add_page_numbers(pdf_bytes)
+
+    detalhes = {"linhas_validas": len(df), "requisicoes_geocodificacao": requisicoes,
+                "bytes_mapa_html": len(map_html), "bytes_pdf": len(pdf_bytes)}
+    return tempos, detalhes
+
+
+def medir_tamanho(linhas, args, diretorio, servidor, config_enderecos, apendice):
+    """Gera o arquivo e o executa `args.repeticoes` vezes; vale a mediana de cada etapa."""
+    caminho = os.path.join(diretorio, f"logger_{linhas}.{args.formato}")
+    inicio = time.perf_counter()
+    gerar_arquivo(caminho, linhas, microdegrees=args.microdegrees, semente=args.semente)
+    geracao = time.perf_counter() - inicio
+
+    execucoes = []
+    for repeticao in range(args.repeticoes):
+        # Caches novos a cada repetição: a geocodificação e a carga são sempre "a frio"
+        diretorio_cache = tempfile.mkdtemp(prefix=f"cache_{linhas}_{repeticao}_", dir=diretorio)
+        execucoes.append(executar(caminho, servidor, diretorio_cache, config_enderecos, apendice,
+                                   args.taxa))
+
+    etapas = {etapa: statistics.median(t[etapa] for t, _ in execucoes)
+              for etapa in ETAPAS if etapa in execucoes[0][0]}
+    return {
+        "linhas": linhas,
+        "formato": args.formato,
+        "bytes_arquivo": os.path.getsize(caminho),
+        "segundos_geracao": geracao,
+        "etapas": etapas,
+        "total": sum(etapas.values()),
+        **execucoes[-1][1],
+    }
+
+
+def imprimir_resultado(resultado):
+    etapas = "  ".join(f"{etapa} {segundos:.2f}" for etapa, segundos in resultado["etapas"].items())
+    print(f"{resultado['linhas']:>10,} linhas: {resultado['total']:.2f} s  ({etapas})")
+
+
+def comparar(resultados, anterior, tolerancia):
+    """Compara com um JSON anterior, por tamanho e etapa; retorna as regressões encontradas."""
+    anteriores = {(r["linhas"], r["formato"]): r for r in anterior["resultados"]}
+    regressoes = []
+    print()
+    print(f"Comparação com {anterior['metadados'].get('versao') or '?'} "
+          f"({anterior['metadados'].get('data', '?')}):")
+    print(f"{'Linhas':>10} {'Etapa':<12} {'Antes (s)':>10} {'Agora (s)':>10} {'Razão':>7}")
+    for resultado in resultados:
+        base = anteriores.get((resultado["linhas"], resultado["formato"]))
+        if base is None:
+            continue
+        for etapa, agora in resultado["etapas"].items():
+            antes = base["etapas"].get(etapa)
+            if antes is None:
+                continue
+            razao = agora / antes if antes else float("inf")
+            regrediu = razao > tolerancia and agora - antes > MINIMO_SEGUNDOS_REGRESSAO
+            marca = "  REGRESSÃO" if regrediu else ""
+            print(f"{resultado['linhas']:>10,} {etapa:<12} {antes:>10.3f} {agora:>10.3f} {razao:>6.2f}x{marca}")
+            if regrediu:
+                regressoes.append((resultado["linhas"], etapa, razao))
+    return regressoes
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mede as etapas do relatório com arquivos sintéticos.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--formato", choices=["xlsx", "csv"], default="csv")
+    parser.add_argument("--microdegrees", action="store_true", help="Coordenadas em microdegrees.")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--enderecos", choices=["nenhum", "todos", "douglas_peucker", "distancia", "tempo", "paradas"],
+                        default="douglas_peucker")
+    parser.add_argument("--parametro-enderecos", type=float, default=50.0)
+    parser.add_argument("--raio", type=float, default=25.0)
+    parser.add_argument("--taxa", type=float, default=1000.0,
+                        help="Requisições por segundo ao servidor de endereços; o padrão mede o código, não o limite.")
+    parser.add_argument("--atraso", type=float, default=0.0, help="Latência simulada do servidor de endereços (s).")
+    parser.add_argument("--apendice", choices=list(TIPOS_PARAMETRO_APENDICE), default=apendice_pdf.A_CADA_N_MINUTOS,
+                        help="O apêndice completo de milhões de linhas tem dezenas de milhares de páginas.")
+    parser.add_argument("--parametro-apendice", default="10")
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados.")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="Razão acima da qual uma etapa conta como regressão.")
+    args = parser.parse_args(argumentos)
+
+    config_enderecos = None
+    if args.enderecos != "nenhum":
+        metodo = None if args.enderecos == "todos" else args.enderecos
+        config_enderecos = (metodo, args.parametro_enderecos if metodo else None, args.raio)
+    apendice = ler_apendice(args.apendice, args.parametro_apendice)
+
+    metadados = {
+        "versao": versao_codigo(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "argumentos": sys.argv[1:] if argumentos is None else list(argumentos),
+    }
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as diretorio, \
+            ServidorNominatimLocal(atraso=args.atraso) as servidor:
+        for linhas in args.linhas:
+            resultado = medir_tamanho(linhas, args, diretorio, servidor, config_enderecos, apendice)
+            resultados.append(resultado)
+            imprimir_resultado(resultado)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"metadados": metadados, "resultados": resultados}, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        regressoes = comparar(resultados, anterior, args.tolerancia)
+        if regressoes:
+            print(f"{len(regressoes)} etapa(s) mais lenta(s) que {args.tolerancia:.2f}x a execução anterior")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
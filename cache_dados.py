@@ -0,0 +1,145 @@
+"""
+Cache em disco dos arquivos do logger já convertidos.
+
+A chave é o hash do conteúdo do arquivo somado às opções de leitura, então o
+mesmo arquivo enviado de novo (ou a mesma sessão após um rerun) reaproveita o
+DataFrame limpo. Os dados ficam em formato Arrow IPC sem compressão e são
+lidos por mapeamento de memória. O diretório tem limite de tamanho e as
+entradas menos usadas são removidas primeiro (LRU pela data de acesso).
+"""
+import hashlib
+import json
+import os
+import threading
+
+from geocodificacao import DIRETORIO_CACHE_PADRAO
+
+MAX_MB_PADRAO = float(os.environ.get("ROUTE_CACHE_UPLOADS_MAX_MB", "1024"))
+
+# Mude quando a conversão dos dados mudar, para invalidar as entradas antigas
+VERSAO_FORMATO = 4
+
+
+def _conteudo(arquivo):
+    """Bytes do arquivo: UploadedFile do Streamlit, objeto de arquivo ou caminho."""
+    if hasattr(arquivo, "getvalue"):
+        return arquivo.getvalue()
+    if hasattr(arquivo, "read"):
+        arquivo.seek(0)
+        dados = arquivo.read()
+        arquivo.seek(0)
+        return dados
+    with open(arquivo, "rb") as f:
+        return f.read()
+
+
+def chave_arquivo(arquivo, **opcoes):
+    """Hash do conteúdo do arquivo e das opções de leitura que alteram o resultado."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(_conteudo(arquivo))
+    h.update(json.dumps({"versao": VERSAO_FORMATO, **opcoes}, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class CacheDados:
+    """
+    Cache de DataFrames em arquivos Arrow, um por chave.
+
+    A gravação usa arquivo temporário e renomeação, para outros processos
+    nunca lerem um arquivo pela metade.
+    """
+
+    def __init__(self, diretorio=None, max_mb=MAX_MB_PADRAO):
+        self.diretorio = diretorio or os.path.join(DIRETORIO_CACHE_PADRAO, "uploads")
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.arrow")
+
+    def _contar(self, acerto):
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.faltas += 1
+
+    def obter(self, chave):
+        """Retorna o DataFrame guardado para a chave, ou None."""
+        import pyarrow as pa
+
+        caminho = self._caminho(chave)
+        try:
+            with pa.memory_map(caminho, "r") as origem:
+                tabela = pa.ipc.open_file(origem).read_all()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            self._contar(False)
+            return None
+
+        try:
+            os.utime(caminho)  # marca o acesso para o LRU
+        except OSError:
+            pass
+        self._contar(True)
+        return tabela.to_pandas()
+
+    def guardar(self, chave, df):
+        """Grava o DataFrame e remove as entradas excedentes."""
+        import pyarrow as pa
+
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temporario, "wb") as destino:
+            with pa.ipc.new_file(destino, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+        os.replace(temporario, caminho)
+        self.remover_excedentes()
+
+    def remover_excedentes(self):
+        """Apaga os arquivos acessados há mais tempo até o diretório caber no limite."""
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".arrow"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.diretorio, nome))
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, nome))
+
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, nome in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.diretorio, nome))
+            except OSError:
+                continue
+            total -= tamanho
+
+    def estatisticas(self):
+        """Retorna os contadores de acertos e faltas deste processo."""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": self.acertos / total if total else 0.0,
+            }
+
+
+_cache_padrao = None
+_cache_padrao_lock = threading.Lock()
+
+
+def obter_cache_dados():
+    """Retorna o cache de arquivos convertidos compartilhado pelo processo."""
+    global _cache_padrao
+    with _cache_padrao_lock:
+        if _cache_padrao is None:
+            _cache_padrao = CacheDados()
+        return _cache_padrao
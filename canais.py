@@ -0,0 +1,97 @@
+"""
+Registro dos canais de medição (sondas) do logger.
+
+Cada canal descreve a coluna do arquivo, os textos usados nas tabelas,
+gráficos e no PDF, os limites de especificação e a cor. Resumos, gráficos
+e seções do relatório são gerados percorrendo a lista de canais.
+"""
+import re
+from dataclasses import dataclass, replace
+
+# Cores usadas a partir da segunda sonda de cada tipo
+PALETA = ["tab:blue", "tab:purple", "tab:brown", "tab:pink", "tab:olive",
+          "tab:cyan", "tab:gray", "tab:red"]
+
+
+@dataclass(frozen=True)
+class Canal:
+    coluna: str                 # nome da coluna no arquivo, ex. "Temperatura (°C)"
+    nome: str                   # prefixo das colunas de resumo, ex. "Temperatura"
+    tipo: str                   # "temperatura" ou "umidade"; define os limites aplicados
+    titulo: str                 # usado nos títulos, ex. "Umidade Relativa"
+    titulo_plural: str          # usado nos títulos por hora, ex. "Temperaturas"
+    abreviacao: str             # legendas do gráfico por hora, ex. "Temp."
+    simbolo: str                # cabeçalho da tabela de resumo geral, ex. "ºC"
+    unidade: str                # unidade nos rótulos de limite, ex. "°C"
+    rotulo_eixo: str            # eixo Y do gráfico por hora
+    cor: str = "blue"
+    escala_fixa: tuple = None   # (início, fim, passo) do eixo Y, ou None para escalar pelos dados
+    li: float = None
+    ls: float = None
+
+    def com_limites(self, li, ls):
+        return replace(self, li=li, ls=ls)
+
+
+# Modelos por tipo de sonda; a chave é o sufixo de unidade da coluna
+MODELOS = {
+    "(°C)": Canal(
+        coluna="Temperatura (°C)", nome="Temperatura", tipo="temperatura",
+        titulo="Temperatura", titulo_plural="Temperaturas", abreviacao="Temp.",
+        simbolo="ºC", unidade="°C", rotulo_eixo="Temperatura (°C)",
+    ),
+    "(%UR)": Canal(
+        coluna="Umidade (%UR)", nome="Umidade", tipo="umidade",
+        titulo="Umidade Relativa", titulo_plural="Umidade Relativa", abreviacao="Umid.",
+        simbolo="%UR", unidade="%", rotulo_eixo="Umidade Relativa (%)",
+        escala_fixa=(0, 101, 10),
+    ),
+}
+
+COLUNA_LUZ = "Luz (lx)"
+
+_PADRAO_COLUNA = re.compile(r"^(?P<nome>.+?)\s*(?P<sufixo>\(°C\)|\(%UR\))\s*(?P<indice>\d*)$")
+
+
+def detectar_canais(colunas, limites):
+    """
+    Monta a lista de canais a partir das colunas do arquivo, na ordem em que
+    aparecem. Reconhece as colunas padrão e sondas extras como
+    "Temperatura 2 (°C)" ou "Umidade (%UR) 3".
+    `limites` mapeia o tipo ("temperatura"/"umidade") para (li, ls).
+    """
+    canais = []
+    usados_por_tipo = {}
+    for coluna in colunas:
+        encontrado = _PADRAO_COLUNA.match(str(coluna).strip())
+        if not encontrado:
+            continue
+
+        modelo = MODELOS[encontrado.group("sufixo")]
+        li, ls = limites.get(modelo.tipo, (None, None))
+        ordem = usados_por_tipo.get(modelo.tipo, 0)
+        usados_por_tipo[modelo.tipo] = ordem + 1
+
+        if coluna == modelo.coluna:
+            canais.append(modelo.com_limites(li, ls))
+            continue
+
+        nome = f"{encontrado.group('nome')} {encontrado.group('indice')}".strip()
+        canais.append(replace(
+            modelo, coluna=coluna, nome=nome, titulo=nome, titulo_plural=nome, abreviacao=nome,
+            cor=PALETA[ordem % len(PALETA)], li=li, ls=ls,
+        ))
+    return canais
+
+
+def canal_por_coluna(canais):
+    """
+    Mapeia o nome (minúsculo) de cada coluna colorida pelos limites para o
+    canal: a coluna original e as colunas de mínima/média/máxima do resumo.
+    """
+    mapa = {}
+    for canal in canais:
+        mapa[canal.coluna.strip().lower()] = canal
+        for estatistica in ("Mínima", "Média", "Máxima"):
+            mapa[f"{canal.nome}_{estatistica}".lower()] = canal
+    return mapa
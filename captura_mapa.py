@@ -0,0 +1,214 @@
+"""
+Captura do mapa Folium com um pool de navegadores headless de longa duração.
+
+O chromedriver é resolvido uma única vez por processo e os navegadores ficam
+abertos entre capturas. O selenium só é importado quando o primeiro navegador
+é criado. Em vez de esperar um tempo fixo, a captura acontece
+assim que o Leaflet informa que os tiles e os marcadores terminaram de carregar.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+TAMANHO_POOL_PADRAO = int(os.environ.get("ROUTE_NAVEGADORES", "1"))
+TIMEOUT_PRONTO_PADRAO = float(os.environ.get("ROUTE_TIMEOUT_MAPA", "15"))
+
+# Verdadeiro quando o documento terminou, nenhum tile está carregando e todas
+# as imagens de tiles e marcadores já foram decodificadas.
+JS_MAPA_PRONTO = """
+if (document.readyState !== 'complete') { return false; }
+if (!document.querySelector('.leaflet-container')) { return false; }
+if (document.querySelector('.leaflet-tile-container .leaflet-tile-loading')) { return false; }
+var imagens = document.querySelectorAll('img.leaflet-tile, img.leaflet-marker-icon');
+for (var i = 0; i < imagens.length; i++) {
+    if (!imagens[i].complete) { return false; }
+}
+return document.querySelectorAll('.leaflet-tile-loaded').length > 0 ||
+       document.querySelectorAll('.leaflet-tile').length === 0;
+"""
+
+_caminho_driver = None
+_caminho_driver_lock = threading.Lock()
+
+
+def resolver_chromedriver():
+    """Resolve o caminho do chromedriver uma vez por processo (ROUTE_CHROMEDRIVER evita o download)."""
+    global _caminho_driver
+    with _caminho_driver_lock:
+        if _caminho_driver is None:
+            _caminho_driver = os.environ.get("ROUTE_CHROMEDRIVER")
+            if not _caminho_driver:
+                from webdriver_manager.chrome import ChromeDriverManager
+                _caminho_driver = ChromeDriverManager().install()
+        return _caminho_driver
+
+
+class PoolNavegadores:
+    """
+    Pool de navegadores Chrome headless reutilizáveis.
+
+    Os navegadores são criados sob demanda até `tamanho`; quem chega com todos
+    ocupados espera na fila. O tempo de fila e o de captura ficam em `metricas()`.
+    """
+
+    def __init__(self, tamanho=TAMANHO_POOL_PADRAO, largura=1200, altura=800):
+        self.tamanho = tamanho
+        self.largura = largura
+        self.altura = altura
+        self._livres = queue.Queue()
+        self._criados = 0
+        self._esperando = 0
+        self._lock = threading.Lock()
+        self._metricas = {
+            "capturas": 0,
+            "timeouts_prontidao": 0,
+            "tempo_fila_total": 0.0,
+            "tempo_fila_max": 0.0,
+            "tempo_captura_total": 0.0,
+            "tempo_captura_max": 0.0,
+            "ultima_captura": None,
+        }
+
+    def _criar_navegador(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument(f"--window-size={self.largura},{self.altura}")
+        return webdriver.Chrome(service=Service(resolver_chromedriver()), options=options)
+
+    def _adquirir(self):
+        with self._lock:
+            if self._livres.empty() and self._criados < self.tamanho:
+                self._criados += 1
+                criar = True
+            else:
+                criar = False
+        if criar:
+            try:
+                return self._criar_navegador()
+            except Exception:
+                with self._lock:
+                    self._criados -= 1
+                raise
+        return self._livres.get()
+
+    def _devolver(self, driver):
+        self._livres.put(driver)
+
+    def _descartar(self, driver):
+        from selenium.common.exceptions import WebDriverException
+
+        with self._lock:
+            self._criados -= 1
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def aquecer(self):
+        """Resolve o driver e abre um navegador, para a primeira captura já encontrá-lo pronto."""
+        self._devolver(self._adquirir())
+
+    def capturar(self, url, timeout=TIMEOUT_PRONTO_PADRAO):
+        """Abre a URL, espera o mapa ficar pronto (ou o timeout) e retorna o PNG em bytes."""
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        inicio_fila = time.perf_counter()
+        with self._lock:
+            self._esperando += 1
+        try:
+            driver = self._adquirir()
+        finally:
+            with self._lock:
+                self._esperando -= 1
+        tempo_fila = time.perf_counter() - inicio_fila
+
+        inicio_captura = time.perf_counter()
+        pronto = True
+        try:
+            driver.get(url)
+            try:
+                WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+                    lambda d: d.execute_script(JS_MAPA_PRONTO)
+                )
+            except TimeoutException:
+                pronto = False
+            png = driver.get_screenshot_as_png()
+        except WebDriverException:
+            # Navegador travado ou encerrado: descarta e deixa o próximo ser criado de novo
+            self._descartar(driver)
+            raise
+        self._devolver(driver)
+        tempo_captura = time.perf_counter() - inicio_captura
+
+        with self._lock:
+            m = self._metricas
+            m["capturas"] += 1
+            m["timeouts_prontidao"] += 0 if pronto else 1
+            m["tempo_fila_total"] += tempo_fila
+            m["tempo_fila_max"] = max(m["tempo_fila_max"], tempo_fila)
+            m["tempo_captura_total"] += tempo_captura
+            m["tempo_captura_max"] = max(m["tempo_captura_max"], tempo_captura)
+            m["ultima_captura"] = {"tempo_fila": tempo_fila, "tempo_captura": tempo_captura, "pronto": pronto}
+        return png
+
+    def metricas(self):
+        """Retorna uma cópia das métricas de captura, com as médias."""
+        with self._lock:
+            m = dict(self._metricas)
+            m["navegadores_abertos"] = self._criados
+            m["navegadores_livres"] = self._livres.qsize()
+            m["aguardando_na_fila"] = self._esperando
+        if m["capturas"]:
+            m["tempo_fila_medio"] = m["tempo_fila_total"] / m["capturas"]
+            m["tempo_captura_medio"] = m["tempo_captura_total"] / m["capturas"]
+        return m
+
+    def encerrar(self):
+        """Fecha todos os navegadores livres."""
+        while True:
+            try:
+                driver = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(driver)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_aquecimento_iniciado = False
+
+
+def obter_pool_navegadores():
+    """Retorna o pool de navegadores do processo, criando-o na primeira chamada."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolNavegadores()
+            atexit.register(_pool.encerrar)
+        return _pool
+
+
+def aquecer_em_segundo_plano():
+    """Inicia o pool numa thread, sem bloquear quem chamou. Só age na primeira chamada."""
+    global _aquecimento_iniciado
+    with _pool_lock:
+        if _aquecimento_iniciado:
+            return
+        _aquecimento_iniciado = True
+
+    def _aquecer():
+        try:
+            obter_pool_navegadores().aquecer()
+        except Exception:
+            # A falha reaparece (com a mensagem) na primeira captura
+            pass
+    threading.Thread(target=_aquecer, daemon=True).start()
@@ -0,0 +1,99 @@
+"""
+Normalização vetorizada das coordenadas do logger.
+
+Cada linha é classificada isoladamente: graus decimais, microdegrees (valores
+multiplicados por 1.000.000) ou latitude e longitude trocadas. Só as linhas
+que precisam são convertidas, e as que continuam fora da faixa válida depois
+disso (ou muito longe do restante da rota) são marcadas: ficam sem
+coordenadas (NaN), e só o mapa e a geocodificação as pulam. Em vez de mensagens
+na interface, o resultado vem num relatório (dicionário simples) que quem
+chamou decide como exibir.
+"""
+import numpy as np
+
+from trajetoria import distancias_haversine
+
+FATOR_MICRODEGREES = 1_000_000
+# Pontos mais longe que isso da mediana da rota são tratados como leitura inválida
+DISTANCIA_MAXIMA_METROS = 2_000_000
+MAX_EXEMPLOS = 5
+
+
+def _relatorio_vazio(total):
+    return {"total": total, "graus_decimais": 0, "microdegrees": 0, "invertidas": 0,
+            "fora_de_faixa": 0, "distantes_da_rota": 0, "exemplos_microdegrees": [],
+            "linhas_fora_de_faixa": []}
+
+
+def normalizar_coordenadas(latitudes, longitudes, distancia_maxima_metros=DISTANCIA_MAXIMA_METROS):
+    """
+    Converte as coordenadas para graus decimais, linha a linha.
+    Retorna (latitudes, longitudes, válidas, relatório), em que `válidas` é a
+    máscara das linhas que terminaram dentro da faixa (|lat| ≤ 90, |lon| ≤ 180)
+    e a menos de `distancia_maxima_metros` da mediana da rota.
+    """
+    lat_original = np.asarray(latitudes, dtype=float)
+    lon_original = np.asarray(longitudes, dtype=float)
+    relatorio = _relatorio_vazio(len(lat_original))
+
+    # Microdegrees: qualquer componente com |valor| > 180 não pode estar em graus
+    micro_lat = np.abs(lat_original) > 180
+    micro_lon = np.abs(lon_original) > 180
+    microdegrees = micro_lat | micro_lon
+    lat = np.where(micro_lat, lat_original / FATOR_MICRODEGREES, lat_original)
+    lon = np.where(micro_lon, lon_original / FATOR_MICRODEGREES, lon_original)
+
+    # Latitude fora de ±90 com longitude que caberia como latitude: colunas trocadas
+    invertidas = (np.abs(lat) > 90) & (np.abs(lat) <= 180) & (np.abs(lon) <= 90)
+    lat, lon = np.where(invertidas, lon, lat), np.where(invertidas, lat, lon)
+
+    validas = (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    if validas.any():
+        distancias = distancias_haversine(lat, lon, np.median(lat[validas]), np.median(lon[validas]))
+        distantes = validas & (distancias > distancia_maxima_metros)
+        relatorio["distantes_da_rota"] = int(np.count_nonzero(distantes))
+        validas &= ~distantes
+
+    relatorio["microdegrees"] = int(np.count_nonzero(microdegrees & validas))
+    relatorio["invertidas"] = int(np.count_nonzero(invertidas & validas))
+    relatorio["fora_de_faixa"] = int(np.count_nonzero(~validas))
+    relatorio["graus_decimais"] = int(np.count_nonzero(validas & ~microdegrees & ~invertidas))
+    relatorio["exemplos_microdegrees"] = [
+        [float(lat_original[i]), float(lon_original[i]), float(lat[i]), float(lon[i])]
+        for i in np.flatnonzero(microdegrees & validas)[:MAX_EXEMPLOS]
+    ]
+    relatorio["linhas_fora_de_faixa"] = [int(i) for i in np.flatnonzero(~validas)[:MAX_EXEMPLOS]]
+    return lat, lon, validas, relatorio
+
+
+def normalizar_dataframe(df, coluna_lat="latitude", coluna_lon="longitude", descartar_invalidas=False):
+    """
+    Aplica `normalizar_coordenadas` às colunas do DataFrame. As linhas fora da
+    faixa continuam no DataFrame (as leituras dos sensores valem para os
+    resumos) com latitude e longitude NaN; com `descartar_invalidas` elas são
+    removidas. O relatório fica em `df.attrs["relatorio_coordenadas"]`.
+    """
+    if coluna_lat not in df.columns or coluna_lon not in df.columns:
+        return df
+
+    lat, lon, validas, relatorio = normalizar_coordenadas(df[coluna_lat], df[coluna_lon])
+    df = df.copy()
+    df[coluna_lat] = np.where(validas, lat, np.nan)
+    df[coluna_lon] = np.where(validas, lon, np.nan)
+    if descartar_invalidas and not validas.all():
+        df = df[validas].reset_index(drop=True)
+    df.attrs["relatorio_coordenadas"] = relatorio
+    return df
+
+
+def mascara_coordenadas(df, coluna_lat="latitude", coluna_lon="longitude"):
+    """Linhas com coordenadas, isto é, não marcadas como inválidas por `normalizar_dataframe`."""
+    return (df[coluna_lat].notna() & df[coluna_lon].notna()).to_numpy()
+
+
+def linhas_com_coordenadas(df, coluna_lat="latitude", coluna_lon="longitude"):
+    """Só as linhas com coordenadas, reindexadas; o próprio `df` se todas tiverem."""
+    validas = mascara_coordenadas(df, coluna_lat, coluna_lon)
+    if validas.all():
+        return df
+    return df[validas].reset_index(drop=True)
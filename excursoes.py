@@ -0,0 +1,171 @@
+"""
+Excursões fora da especificação e indicadores ponderados pelo tempo.
+
+Sobre a série ordenada por "Date Time", cada leitura vale o tempo até a
+leitura seguinte (limitado, para que uma lacuna do logger não conte como
+horas na mesma condição). Com esses pesos saem os percentuais do tempo
+abaixo/dentro/acima de LI/LS, a temperatura cinética média (TCM) e a
+duração de cada excursão: um trecho contínuo de leituras abaixo de LI ou
+acima de LS. Tudo é feito com operações vetorizadas do NumPy, sem laço
+pelas linhas.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# Energia de ativação da TCM (ΔH); 83,144 kJ/mol é o valor usual da USP <1160>
+ENERGIA_ATIVACAO_KJ_MOL = float(os.environ.get("ROUTE_ENERGIA_ATIVACAO_KJ_MOL", "83.144"))
+CONSTANTE_GASES_J_MOL_K = 8.3144598
+ZERO_CELSIUS_K = 273.15
+
+# Uma leitura vale no máximo esse múltiplo do intervalo mediano entre leituras
+FATOR_LACUNA_PADRAO = 5.0
+
+# Excursões listadas no PDF (as mais longas); a tela mostra todas
+MAX_EXCURSOES_PDF = int(os.environ.get("ROUTE_MAX_EXCURSOES_PDF", "200"))
+
+ABAIXO = "Abaixo de LI"
+ACIMA = "Acima de LS"
+
+
+def pesos_tempo(tempos, fator_lacuna=FATOR_LACUNA_PADRAO):
+    """
+    Segundos representados por cada leitura (tempos em ordem crescente): o
+    intervalo até a próxima, limitado a `fator_lacuna` vezes o intervalo
+    mediano. A última leitura vale o intervalo mediano.
+    """
+    t = np.asarray(tempos, dtype="datetime64[ns]").astype(np.int64) / 1e9
+    if len(t) < 2:
+        return np.ones(len(t))
+    intervalos = np.diff(t)
+    mediano = float(np.median(intervalos)) or 1.0
+    return np.minimum(np.append(intervalos, mediano), fator_lacuna * mediano)
+
+
+def intervalos_continuos(mascara):
+    """Início e fim (exclusivo) de cada trecho contínuo de True da máscara."""
+    bordas = np.diff(np.concatenate(([0], np.asarray(mascara, dtype=np.int8), [0])))
+    return np.flatnonzero(bordas == 1), np.flatnonzero(bordas == -1)
+
+
+def temperatura_cinetica_media(valores, pesos, energia_ativacao_kj_mol=ENERGIA_ATIVACAO_KJ_MOL):
+    """
+    Temperatura cinética média (°C), ponderada pelos pesos de tempo:
+    TCM = (ΔH/R) / -ln(Σ wᵢ·e^(-ΔH/(R·Tᵢ)) / Σ wᵢ), com T em kelvin.
+    Leituras NaN são ignoradas; retorna NaN se não sobrar nenhuma.
+    """
+    valores = np.asarray(valores, dtype=float)
+    validos = ~np.isnan(valores)
+    if not validos.any():
+        return float("nan")
+    razao = energia_ativacao_kj_mol * 1000 / CONSTANTE_GASES_J_MOL_K
+    expoentes = -razao / (valores[validos] + ZERO_CELSIUS_K)
+    w = np.asarray(pesos, dtype=float)[validos]
+    # log da média ponderada de e^expoente, sem underflow
+    maximo = expoentes.max()
+    log_media = maximo + np.log(np.sum(w * np.exp(expoentes - maximo)) / np.sum(w))
+    return float(-razao / log_media - ZERO_CELSIUS_K)
+
+
+def _excursoes_de_um_lado(valores, mascara, pesos_acumulados, maior):
+    """
+    Trechos contínuos da máscara: índices de início e fim (inclusivo), duração
+    em segundos e índice da leitura de pico (máxima se `maior`, senão mínima).
+    """
+    inicios, fins = intervalos_continuos(mascara)
+    if len(inicios) == 0:
+        vazio = np.zeros(0, dtype=np.int64)
+        return vazio, vazio, np.zeros(0), vazio
+
+    duracoes = pesos_acumulados[fins] - pesos_acumulados[inicios]
+    neutro = -np.inf if maior else np.inf
+    candidatos = np.where(mascara, valores, neutro)
+    picos = (np.maximum if maior else np.minimum).reduceat(candidatos, inicios)
+
+    # Trecho de cada leitura; a primeira leitura igual ao pico do seu trecho é o pico
+    marcas = np.zeros(len(valores), dtype=np.int64)
+    marcas[inicios] = 1
+    trecho = np.cumsum(marcas) - 1
+    dentro = np.flatnonzero(mascara)
+    no_pico = dentro[valores[dentro] == picos[trecho[dentro]]]
+    _, primeiros = np.unique(trecho[no_pico], return_index=True)
+    return inicios, fins - 1, duracoes, no_pico[primeiros]
+
+
+def analisar_excursoes(df, canais, fator_lacuna=FATOR_LACUNA_PADRAO):
+    """
+    Excursões e indicadores ponderados pelo tempo de cada canal com LI/LS.
+    Retorna (resumo, excursões): o resumo tem uma linha por canal com os
+    percentuais do tempo, o número de excursões, o tempo fora, a maior
+    excursão e a TCM (só temperatura); as excursões têm início, fim,
+    duração, pico e a posição (latitude, longitude e endereço, se houver)
+    da leitura de pico, em ordem de início.
+    """
+    if df["Date Time"].is_monotonic_increasing:
+        ordenado = df.reset_index(drop=True)
+    else:
+        ordenado = df.sort_values("Date Time", kind="stable").reset_index(drop=True)
+    tempos = ordenado["Date Time"].to_numpy()
+    pesos = pesos_tempo(tempos, fator_lacuna)
+    acumulados = np.concatenate(([0.0], np.cumsum(pesos)))
+    colunas_local = [c for c in ("latitude", "longitude", "endereco") if c in ordenado.columns]
+
+    linhas_resumo, partes = [], []
+    for canal in canais:
+        if canal.li is None or canal.ls is None:
+            continue
+        valores = ordenado[canal.coluna].to_numpy(dtype=float)
+        validos = ~np.isnan(valores)
+        total = pesos[validos].sum()
+        abaixo = valores < canal.li
+        acima = valores > canal.ls
+
+        lados = []
+        for tipo, mascara, maior in ((ABAIXO, abaixo, False), (ACIMA, acima, True)):
+            inicios, fins, duracoes, picos = _excursoes_de_um_lado(valores, mascara, acumulados, maior)
+            lados.append(duracoes)
+            parte = pd.DataFrame({
+                "Canal": canal.nome,
+                "Tipo": tipo,
+                "Início": tempos[inicios],
+                "Fim": tempos[fins],
+                "Duração": pd.to_timedelta(duracoes, unit="s"),
+                "Pico": valores[picos],
+                "Momento do pico": tempos[picos],
+            })
+            for coluna in colunas_local:
+                parte[coluna] = ordenado[coluna].to_numpy()[picos]
+            partes.append(parte)
+
+        duracoes = np.concatenate(lados)
+        linhas_resumo.append({
+            "Canal": canal.nome,
+            "% do tempo abaixo": pesos[abaixo].sum() / total * 100 if total else np.nan,
+            "% do tempo dentro": pesos[validos & ~abaixo & ~acima].sum() / total * 100 if total else np.nan,
+            "% do tempo acima": pesos[acima].sum() / total * 100 if total else np.nan,
+            "Excursões": len(duracoes),
+            "Tempo fora": pd.to_timedelta(duracoes.sum(), unit="s"),
+            "Maior excursão": pd.to_timedelta(duracoes.max() if len(duracoes) else 0, unit="s"),
+            "TCM (°C)": (temperatura_cinetica_media(valores, pesos) if canal.tipo == "temperatura"
+                         else np.nan),
+        })
+
+    resumo = pd.DataFrame(linhas_resumo)
+    if not partes:
+        return resumo, pd.DataFrame(columns=["Canal", "Tipo", "Início", "Fim", "Duração", "Pico",
+                                             "Momento do pico"] + colunas_local)
+    excursoes = pd.concat(partes, ignore_index=True)
+    return resumo, excursoes.sort_values(["Início", "Canal"], kind="stable").reset_index(drop=True)
+
+
+def formatar_duracao(duracao):
+    """Duração legível, ex. "2 h 05 min" ou "45 s"."""
+    segundos = int(round(pd.Timedelta(duracao).total_seconds()))
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    if horas:
+        return f"{horas} h {minutos:02d} min"
+    if minutos:
+        return f"{minutos} min {segundos:02d} s"
+    return f"{segundos} s"
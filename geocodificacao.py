@@ -0,0 +1,485 @@
+"""
+Geocodificação reversa em lote, com cache persistente.
+
+Os endereços ficam num banco SQLite em disco, compartilhado entre sessões e
+processos do Streamlit, indexado pelas coordenadas quantizadas. Pontos
+próximos a um ponto já resolvido (dentro de um raio) reaproveitam o endereço.
+As consultas que sobram vão para um pool de threads com limite de taxa por
+provedor e novas tentativas em caso de timeout. O geopy só é importado
+quando o primeiro cliente é criado.
+"""
+import functools
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Configuração via variáveis de ambiente
+DIRETORIO_CACHE_PADRAO = os.environ.get(
+    "ROUTE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "route")
+)
+TTL_PADRAO_SEGUNDOS = float(os.environ.get("ROUTE_CACHE_TTL_DIAS", "30")) * 24 * 3600
+MAX_ENTRADAS_PADRAO = int(os.environ.get("ROUTE_CACHE_MAX_ENTRADAS", "200000"))
+RAIO_PADRAO_METROS = float(os.environ.get("ROUTE_RAIO_AGRUPAMENTO_METROS", "25"))
+
+METROS_POR_GRAU = 111320.0
+RAIO_TERRA_METROS = 6371000.0
+
+USER_AGENT = "temperatura_umidade_app"
+
+# Provedores de geocodificação. A política de uso do Nominatim público
+# permite no máximo 1 requisição por segundo; instâncias próprias aceitam mais.
+PROVEDORES = {
+    "nominatim": {"dominio": "nominatim.openstreetmap.org", "scheme": "https",
+                  "requisicoes_por_segundo": 1.0, "workers": 2},
+    "local": {"dominio": "localhost:8080", "scheme": "http",
+              "requisicoes_por_segundo": 50.0, "workers": 8},
+}
+PROVEDOR_PADRAO = os.environ.get("ROUTE_GEOCODER_PROVEDOR", "nominatim")
+
+# Respostas que indicam falha temporária não devem ser guardadas
+PREFIXOS_NAO_CACHEAVEIS = ("Timeout", "Erro")
+
+
+def endereco_cacheavel(endereco):
+    """Indica se o resultado de uma consulta pode ser guardado no cache."""
+    return bool(endereco) and not endereco.startswith(PREFIXOS_NAO_CACHEAVEIS)
+
+
+def distancia_metros(lat1, lon1, lat2, lon2):
+    """
+    Distância em metros entre dois pontos pela fórmula de haversine. Para
+    arrays, `trajetoria.distancias_haversine`; esta fica com o `math`, bem
+    mais rápido que o NumPy ponto a ponto.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_METROS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _graus_longitude(metros, latitude):
+    """Converte uma distância em metros para graus de longitude na latitude dada."""
+    return metros / (METROS_POR_GRAU * max(math.cos(math.radians(latitude)), 0.01))
+
+
+class IndiceEspacial:
+    """
+    Índice em grade dos pontos já resolvidos, para reaproveitar o endereço
+    (ou qualquer outro valor associado) de pontos dentro de `raio_metros`.
+    """
+
+    def __init__(self, raio_metros=RAIO_PADRAO_METROS):
+        self.raio_metros = raio_metros
+        # Células com lado igual ao raio, em graus de latitude
+        self.tamanho_celula = max(raio_metros, 1.0) / METROS_POR_GRAU
+        self.celulas = {}
+
+    def _celula(self, latitude, longitude):
+        return (math.floor(latitude / self.tamanho_celula), math.floor(longitude / self.tamanho_celula))
+
+    def adicionar(self, latitude, longitude, valor):
+        chave = self._celula(latitude, longitude)
+        self.celulas.setdefault(chave, []).append((latitude, longitude, valor))
+
+    def buscar(self, latitude, longitude):
+        """Retorna o valor do ponto resolvido mais próximo dentro do raio, ou None."""
+        cel_lat, cel_lon = self._celula(latitude, longitude)
+        # Longe do equador a célula cobre menos metros em longitude
+        alcance_lon = math.ceil(_graus_longitude(self.raio_metros, latitude) / self.tamanho_celula)
+
+        melhor, melhor_dist = None, None
+        for dlat in (-1, 0, 1):
+            for dlon in range(-alcance_lon, alcance_lon + 1):
+                for lat, lon, valor in self.celulas.get((cel_lat + dlat, cel_lon + dlon), ()):
+                    dist = distancia_metros(latitude, longitude, lat, lon)
+                    if dist <= self.raio_metros and (melhor_dist is None or dist < melhor_dist):
+                        melhor, melhor_dist = valor, dist
+        return melhor
+
+
+class CacheEnderecos:
+    """
+    Cache de endereços em SQLite com expiração (TTL) e limite de entradas.
+
+    As coordenadas são quantizadas em `casas_decimais` casas (5 casas ≈ 1 m).
+    O banco usa WAL, então vários processos podem ler e gravar ao mesmo tempo.
+    """
+
+    def __init__(self, diretorio=None, ttl_segundos=TTL_PADRAO_SEGUNDOS,
+                 max_entradas=MAX_ENTRADAS_PADRAO, casas_decimais=5):
+        self.diretorio = diretorio or DIRETORIO_CACHE_PADRAO
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.caminho = os.path.join(self.diretorio, "enderecos.sqlite3")
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.fator = 10 ** casas_decimais
+        self.acertos = 0
+        self.faltas = 0
+        self._gravacoes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._criar_tabela()
+
+    def _conexao(self):
+        # sqlite3 não permite compartilhar conexões entre threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _criar_tabela(self):
+        with self._conexao() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS enderecos (
+                    lat_q INTEGER NOT NULL,
+                    lon_q INTEGER NOT NULL,
+                    endereco TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    PRIMARY KEY (lat_q, lon_q)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_acessado_em ON enderecos (acessado_em)")
+
+    def _chave(self, latitude, longitude):
+        return int(round(float(latitude) * self.fator)), int(round(float(longitude) * self.fator))
+
+    def _contar(self, acerto):
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.faltas += 1
+
+    def obter(self, latitude, longitude, raio_metros=0):
+        """
+        Retorna o endereço guardado para as coordenadas, ou None.
+        Com `raio_metros` > 0, aceita o ponto guardado mais próximo dentro do raio.
+        """
+        lat_q, lon_q = self._chave(latitude, longitude)
+        agora = time.time()
+        conn = self._conexao()
+
+        if raio_metros > 0:
+            # Caixa envolvente em unidades quantizadas; usa o índice da chave primária
+            dlat = math.ceil(raio_metros / METROS_POR_GRAU * self.fator)
+            dlon = math.ceil(_graus_longitude(raio_metros, latitude) * self.fator)
+            candidatos = conn.execute(
+                "SELECT lat_q, lon_q, endereco, criado_em FROM enderecos "
+                "WHERE lat_q BETWEEN ? AND ? AND lon_q BETWEEN ? AND ? AND criado_em >= ?",
+                (lat_q - dlat, lat_q + dlat, lon_q - dlon, lon_q + dlon, agora - self.ttl_segundos),
+            ).fetchall()
+            row, melhor_dist = None, None
+            for c_lat_q, c_lon_q, endereco, criado_em in candidatos:
+                dist = distancia_metros(latitude, longitude, c_lat_q / self.fator, c_lon_q / self.fator)
+                if dist <= raio_metros and (melhor_dist is None or dist < melhor_dist):
+                    row, melhor_dist = (c_lat_q, c_lon_q, endereco, criado_em), dist
+        else:
+            row = conn.execute(
+                "SELECT lat_q, lon_q, endereco, criado_em FROM enderecos WHERE lat_q = ? AND lon_q = ?",
+                (lat_q, lon_q),
+            ).fetchone()
+
+        if row is None or agora - row[3] > self.ttl_segundos:
+            self._contar(False)
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE enderecos SET acessado_em = ? WHERE lat_q = ? AND lon_q = ?",
+                (agora, row[0], row[1]),
+            )
+        self._contar(True)
+        return row[2]
+
+    def guardar(self, latitude, longitude, endereco):
+        """Guarda o endereço se ele não for um erro temporário."""
+        if not endereco_cacheavel(endereco):
+            return
+        lat_q, lon_q = self._chave(latitude, longitude)
+        agora = time.time()
+        with self._conexao() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO enderecos (lat_q, lon_q, endereco, criado_em, acessado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (lat_q, lon_q, endereco, agora, agora),
+            )
+
+        with self._lock:
+            self._gravacoes += 1
+            verificar = self._gravacoes % 100 == 0
+        if verificar:
+            self.remover_excedentes()
+
+    def remover_excedentes(self):
+        """Remove entradas expiradas e as menos usadas além do limite de tamanho."""
+        limite_validade = time.time() - self.ttl_segundos
+        with self._conexao() as conn:
+            conn.execute("DELETE FROM enderecos WHERE criado_em < ?", (limite_validade,))
+            total = conn.execute("SELECT COUNT(*) FROM enderecos").fetchone()[0]
+            excesso = total - self.max_entradas
+            if excesso > 0:
+                conn.execute(
+                    "DELETE FROM enderecos WHERE rowid IN ("
+                    "SELECT rowid FROM enderecos ORDER BY acessado_em ASC LIMIT ?)",
+                    (excesso,),
+                )
+
+    def estatisticas(self):
+        """Retorna os contadores de acertos e faltas deste processo."""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": self.acertos / total if total else 0.0,
+            }
+
+
+_cache_padrao = None
+_cache_padrao_lock = threading.Lock()
+
+
+def obter_cache_enderecos():
+    """Retorna o cache de endereços compartilhado pelo processo."""
+    global _cache_padrao
+    with _cache_padrao_lock:
+        if _cache_padrao is None:
+            _cache_padrao = CacheEnderecos()
+        return _cache_padrao
+
+
+def formatar_endereco(location):
+    """Monta um endereço resumido a partir da resposta do Nominatim."""
+    # Extrai informações do endereço
+    address = location.address
+    
+    # Tenta extrair informações mais específicas
+    raw_data = location.raw.get('address', {})
+    
+    # Constrói um endereço mais limpo
+    endereco_parts = []
+    
+    # Adiciona rua/avenida
+    if 'road' in raw_data:
+        endereco_parts.append(raw_data['road'])
+    elif 'pedestrian' in raw_data:
+        endereco_parts.append(raw_data['pedestrian'])
+    
+    # Adiciona número se disponível
+    if 'house_number' in raw_data and endereco_parts:
+        endereco_parts[-1] += f", {raw_data['house_number']}"
+    
+    # Adiciona bairro
+    if 'suburb' in raw_data:
+        endereco_parts.append(raw_data['suburb'])
+    elif 'neighbourhood' in raw_data:
+        endereco_parts.append(raw_data['neighbourhood'])
+    
+    # Adiciona cidade
+    if 'city' in raw_data:
+        endereco_parts.append(raw_data['city'])
+    elif 'town' in raw_data:
+        endereco_parts.append(raw_data['town'])
+    elif 'village' in raw_data:
+        endereco_parts.append(raw_data['village'])
+    
+    # Adiciona estado
+    if 'state' in raw_data:
+        endereco_parts.append(raw_data['state'])
+    
+    # Adiciona país
+    if 'country' in raw_data:
+        endereco_parts.append(raw_data['country'])
+    
+    if endereco_parts:
+        return " - ".join(endereco_parts)
+    return address
+
+
+def criar_geolocalizador(provedor=PROVEDOR_PADRAO, dominio=None, scheme=None):
+    """
+    Cria um cliente Nominatim para o provedor; a sessão HTTP fica no cliente.
+    Sem as novas tentativas internas do requests/urllib3: elas passariam por
+    fora do limite de taxa e transformariam o timeout em "serviço indisponível",
+    e as tentativas com espera ficam com o `MotorGeocodificacao`.
+    """
+    from geopy.adapters import RequestsAdapter
+    from geopy.geocoders import Nominatim
+
+    config = PROVEDORES[provedor]
+    opcoes = {}
+    if RequestsAdapter.is_available:
+        opcoes["adapter_factory"] = functools.partial(RequestsAdapter, max_retries=0)
+    return Nominatim(
+        user_agent=USER_AGENT,
+        domain=dominio or os.environ.get("ROUTE_GEOCODER_DOMINIO", config["dominio"]),
+        scheme=scheme or config["scheme"],
+        **opcoes,
+    )
+
+
+_geolocalizador_padrao = None
+
+
+def consultar_nominatim(latitude, longitude, timeout=10):
+    """
+    Faz a geocodificação reversa diretamente no Nominatim, sem passar pelo cache.
+    """
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+    global _geolocalizador_padrao
+    try:
+        # Reutiliza o mesmo cliente (e a mesma sessão HTTP) entre chamadas
+        if _geolocalizador_padrao is None:
+            _geolocalizador_padrao = criar_geolocalizador()
+        
+        # Faz a geocodificação reversa
+        location = _geolocalizador_padrao.reverse(f"{latitude}, {longitude}", timeout=timeout, language='pt')
+        
+        if location:
+            return formatar_endereco(location)
+        else:
+            return "Endereço não encontrado"
+            
+    except GeocoderTimedOut:
+        return "Timeout na busca do endereço"
+    except GeocoderServiceError:
+        return "Erro no serviço de geocodificação"
+    except Exception as e:
+        return f"Erro: {str(e)}"
+
+
+class LimitadorTaxa:
+    """Balde de fichas compartilhado entre as threads de um provedor."""
+
+    def __init__(self, requisicoes_por_segundo, capacidade=1):
+        self.taxa = requisicoes_por_segundo
+        self.capacidade = capacidade
+        self.fichas = capacidade
+        self.ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até haver uma ficha disponível e a consome."""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self.fichas = min(self.capacidade, self.fichas + (agora - self.ultima) * self.taxa)
+                self.ultima = agora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) / self.taxa
+            time.sleep(espera)
+
+
+class MotorGeocodificacao:
+    """
+    Geocodificação reversa em lote.
+
+    Agrupa os pontos próximos, consulta o cache persistente e envia só as
+    faltas para um pool de threads que compartilha um único cliente
+    Nominatim e respeita o limite de taxa do provedor. Os resultados voltam
+    na ordem original das coordenadas.
+    """
+
+    def __init__(self, provedor=PROVEDOR_PADRAO, dominio=None, scheme=None,
+                 workers=None, requisicoes_por_segundo=None, raio_metros=RAIO_PADRAO_METROS,
+                 cache=None, timeout=10, tentativas=3, espera_base=0.5):
+        if tentativas < 1:
+            raise ValueError(f"tentativas deve ser pelo menos 1, recebido {tentativas}")
+        config = PROVEDORES[provedor]
+        taxa = requisicoes_por_segundo or float(
+            os.environ.get("ROUTE_GEOCODER_REQ_POR_SEGUNDO", config["requisicoes_por_segundo"])
+        )
+        self.geolocalizador = criar_geolocalizador(provedor, dominio, scheme)
+        self.limitador = LimitadorTaxa(taxa)
+        self.workers = workers or config["workers"]
+        self.raio_metros = raio_metros
+        self.cache = cache if cache is not None else obter_cache_enderecos()
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+
+    def _consultar(self, latitude, longitude):
+        """Consulta um ponto, com novas tentativas e espera exponencial em caso de timeout."""
+        from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+        for tentativa in range(self.tentativas):
+            self.limitador.aguardar()
+            try:
+                location = self.geolocalizador.reverse(
+                    f"{latitude}, {longitude}", timeout=self.timeout, language='pt'
+                )
+                return formatar_endereco(location) if location else "Endereço não encontrado"
+            except GeocoderTimedOut:
+                if tentativa == self.tentativas - 1:
+                    return "Timeout na busca do endereço"
+                time.sleep(self.espera_base * (2 ** tentativa) * (1 + random.random()))
+            except GeocoderServiceError:
+                return "Erro no serviço de geocodificação"
+            except Exception as e:
+                return f"Erro: {str(e)}"
+
+    def geocodificar(self, latitudes, longitudes, progresso=None):
+        """
+        Retorna a lista de endereços na mesma ordem das coordenadas.
+        `progresso(concluidos, total)` é chamado na thread de quem chamou.
+        """
+        total = len(latitudes)
+
+        # Cada ponto aponta para um representativo dentro do raio
+        indice = IndiceEspacial(self.raio_metros)
+        representantes = []
+        representante_do_ponto = []
+        for lat, lon in zip(latitudes, longitudes):
+            rep = indice.buscar(lat, lon)
+            if rep is None:
+                rep = len(representantes)
+                representantes.append((lat, lon))
+                indice.adicionar(lat, lon, rep)
+            representante_do_ponto.append(rep)
+
+        enderecos_rep = [None] * len(representantes)
+        pendentes = []
+        for rep, (lat, lon) in enumerate(representantes):
+            endereco = self.cache.obter(lat, lon, raio_metros=self.raio_metros)
+            if endereco is None:
+                pendentes.append(rep)
+            else:
+                enderecos_rep[rep] = endereco
+
+        # Pontos resolvidos pelo cache já contam como concluídos
+        pontos_por_rep = [0] * len(representantes)
+        for rep in representante_do_ponto:
+            pontos_por_rep[rep] += 1
+        concluidos = total - sum(pontos_por_rep[rep] for rep in pendentes)
+        if progresso:
+            progresso(concluidos, total)
+
+        if pendentes:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futuros = {
+                    executor.submit(self._consultar, *representantes[rep]): rep for rep in pendentes
+                }
+                for futuro in as_completed(futuros):
+                    rep = futuros[futuro]
+                    endereco = futuro.result()
+                    enderecos_rep[rep] = endereco
+                    self.cache.guardar(*representantes[rep], endereco)
+                    concluidos += pontos_por_rep[rep]
+                    if progresso:
+                        progresso(concluidos, total)
+
+        return [enderecos_rep[rep] for rep in representante_do_ponto]
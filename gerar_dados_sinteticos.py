@@ -0,0 +1,172 @@
+"""
+Gerador de arquivos sintéticos do logger, para testes de escala e benchmarks.
+
+Produz o mesmo esquema que `carregar_dados` espera: "Date Time", "Hora",
+latitude/longitude (em graus ou microdegrees), temperatura, umidade, luz e,
+opcionalmente, "endereco" e sondas extras. A rota é um passeio de veículo com
+paradas; as aberturas de porta durante as paradas trazem luz e excursões de
+temperatura e umidade.
+
+    python gerar_dados_sinteticos.py --linhas 100000 --formato csv --saida dados/
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from geocodificacao import METROS_POR_GRAU
+
+ORIGEM_PADRAO = (-23.5505, -46.6333)  # São Paulo
+RAIO_REGIAO_GRAUS = 1.5  # a rota fica num quadrado de ±1,5° em torno da origem
+
+
+def _dobrar(deslocamento, raio):
+    """Reflete o deslocamento nas bordas de [-raio, raio] (onda triangular)."""
+    return raio - np.abs(np.mod(deslocamento + raio, 4 * raio) - 2 * raio)
+
+
+def _rota(n, intervalo_segundos, rng, origem):
+    """
+    Passeio de veículo: rumo com variação suave, velocidade de cruzeiro e
+    paradas. Viagens longas (semanas) ficam rebatidas dentro da região.
+    """
+    rumo = np.cumsum(rng.normal(0, 0.05, n)) + rng.uniform(0, 2 * np.pi)
+    velocidade = np.clip(rng.normal(15, 4, n), 0, 30)  # m/s
+
+    # Paradas: trechos de 10 a 40 minutos a cada ~3 horas, em média
+    parado = np.zeros(n, dtype=bool)
+    pontos_por_hora = max(3600 / intervalo_segundos, 1)
+    inicio = 0
+    while True:
+        inicio += int(rng.exponential(3 * pontos_por_hora)) + 1
+        if inicio >= n:
+            break
+        duracao = int(rng.uniform(10, 40) * 60 / intervalo_segundos) + 1
+        parado[inicio:inicio + duracao] = True
+        inicio += duracao
+    velocidade[parado] = 0.0
+
+    passo = velocidade * intervalo_segundos
+    norte = np.cumsum(passo * np.cos(rumo)) / METROS_POR_GRAU
+    leste = np.cumsum(passo * np.sin(rumo)) / (METROS_POR_GRAU * np.cos(np.radians(origem[0])))
+    lat = origem[0] + _dobrar(norte, RAIO_REGIAO_GRAUS)
+    lon = origem[1] + _dobrar(leste, RAIO_REGIAO_GRAUS)
+    return lat, lon, parado
+
+
+def _portas_abertas(parado, intervalo_segundos, rng):
+    """Aberturas de porta de alguns minutos no começo de metade das paradas."""
+    abertas = np.zeros(len(parado), dtype=bool)
+    inicios = np.flatnonzero(np.diff(parado.astype(np.int8)) == 1) + 1
+    for inicio in inicios[rng.random(len(inicios)) < 0.5]:
+        duracao = int(rng.uniform(2, 10) * 60 / intervalo_segundos) + 1
+        abertas[inicio:inicio + duracao] = True
+    return abertas & parado
+
+
+def _suavizar(valores, pontos):
+    """Média móvel exponencial simples, para a temperatura reagir devagar às portas."""
+    if pontos <= 1:
+        return valores
+    alfa = 1.0 / pontos
+    saida = np.empty_like(valores)
+    acumulado = valores[0]
+    for i, v in enumerate(valores):
+        acumulado += alfa * (v - acumulado)
+        saida[i] = acumulado
+    return saida
+
+
+def gerar_dataframe(linhas, intervalo_segundos=60, microdegrees=False, enderecos=False,
+                    sondas_extras=0, semente=0, inicio="2026-01-05 08:00", origem=ORIGEM_PADRAO):
+    """DataFrame sintético com `linhas` leituras, uma a cada `intervalo_segundos`."""
+    rng = np.random.default_rng(semente)
+    tempos = pd.date_range(inicio, periods=linhas, freq=pd.Timedelta(seconds=intervalo_segundos))
+    horas_do_dia = (tempos.hour + tempos.minute / 60).to_numpy()
+    lat, lon, parado = _rota(linhas, intervalo_segundos, rng, origem)
+    portas = _portas_abertas(parado, intervalo_segundos, rng)
+
+    # Ciclo diário, efeito das portas (suavizado) e ruído do sensor
+    diario = np.sin((horas_do_dia - 9) / 24 * 2 * np.pi)
+    efeito_portas = _suavizar(portas * 10.0, int(600 / intervalo_segundos))
+    temperatura = 22 + 5 * diario + efeito_portas + rng.normal(0, 0.3, linhas)
+    umidade = np.clip(60 - 10 * diario + 2 * efeito_portas + rng.normal(0, 1.0, linhas), 0, 100)
+    luz = np.where(portas, rng.uniform(200, 800, linhas), np.abs(rng.normal(0, 2, linhas)))
+
+    df = pd.DataFrame({
+        "Date Time": tempos,
+        "latitude": lat,
+        "longitude": lon,
+        "Temperatura (°C)": temperatura.round(2),
+        "Umidade (%UR)": umidade.round(2),
+        "Luz (lx)": luz.round(2),
+    })
+    for i in range(sondas_extras):
+        df[f"Temperatura {i + 2} (°C)"] = (temperatura + rng.normal(0.5 * (i + 1), 0.4, linhas)).round(2)
+    df["Hora"] = ((tempos - tempos[0]) // pd.Timedelta(hours=1)).to_numpy() + 1
+
+    if microdegrees:
+        df["latitude"] = (df["latitude"] * 1_000_000).round().astype(np.int64)
+        df["longitude"] = (df["longitude"] * 1_000_000).round().astype(np.int64)
+    else:
+        df["latitude"] = df["latitude"].round(6)
+        df["longitude"] = df["longitude"].round(6)
+
+    if enderecos:
+        # Um endereço por quadra de ~1 km, como viria de uma geocodificação anterior
+        quadra_lat = np.floor(lat * 100).astype(np.int64)
+        quadra_lon = np.floor(lon * 100).astype(np.int64)
+        df["endereco"] = ("Rua " + pd.Series(quadra_lat % 997).astype(str) + ", "
+                          + pd.Series(np.abs(quadra_lon) % 1000 + 1).astype(str)
+                          + " - Bairro " + pd.Series(np.abs(quadra_lon) % 89).astype(str)
+                          + " - Cidade Teste - SP - Brasil")
+    return df
+
+
+def escrever_xlsx(df, caminho, planilha="Sheet1"):
+    """Grava em xlsx com o openpyxl em modo `write_only`, que não monta a planilha na memória."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    aba = workbook.create_sheet(planilha)
+    aba.append(list(df.columns))
+    # tolist() devolve Timestamps (subclasse de datetime), que o openpyxl grava como data
+    colunas = [df[c].tolist() for c in df.columns]
+    for linha in zip(*colunas):
+        aba.append(linha)
+    workbook.save(caminho)
+
+
+def escrever(df, caminho):
+    """Grava em CSV ou xlsx conforme a extensão."""
+    if caminho.lower().endswith(".csv"):
+        df.to_csv(caminho, index=False)
+    else:
+        escrever_xlsx(df, caminho)
+    return caminho
+
+
+def gerar_arquivo(caminho, linhas, **opcoes):
+    """Gera e grava um arquivo sintético; retorna o caminho."""
+    return escrever(gerar_dataframe(linhas, **opcoes), caminho)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera arquivos sintéticos do logger.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000], help="Um arquivo para cada tamanho.")
+    parser.add_argument("--formato", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--saida", default=".", help="Diretório dos arquivos.")
+    parser.add_argument("--intervalo", type=float, default=60, help="Segundos entre leituras.")
+    parser.add_argument("--microdegrees", action="store_true", help="Coordenadas multiplicadas por 1.000.000.")
+    parser.add_argument("--enderecos", action="store_true", help="Inclui a coluna 'endereco'.")
+    parser.add_argument("--sondas-extras", type=int, default=0)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.saida, exist_ok=True)
+    for linhas in args.linhas:
+        caminho = os.path.join(args.saida, f"logger_{linhas}.{args.formato}")
+        gerar_arquivo(caminho, linhas, intervalo_segundos=args.intervalo, microdegrees=args.microdegrees,
+                      enderecos=args.enderecos, sondas_extras=args.sondas_extras, semente=args.semente)
+        print(caminho)
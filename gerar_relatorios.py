@@ -0,0 +1,160 @@
+"""
+Geração de relatórios em lote, sem o Streamlit.
+
+Gera um PDF para cada arquivo .xlsx/.csv de um diretório, em paralelo num
+pool de processos, e ao final mostra a vazão e o tempo gasto em cada etapa:
+
+    python gerar_relatorios.py dados/ --saida relatorios/ --li-temp 2 --ls-temp 8 --processos 4
+
+O mapa do PDF é sempre o estático (sem navegador).
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+# Os processos do pool não têm tela
+matplotlib.use("Agg")
+
+import apendice as apendice_pdf  # noqa: E402
+from relatorio import gerar_relatorio  # noqa: E402
+
+EXTENSOES = (".xlsx", ".csv")
+ETAPAS = ("carga", "enderecos", "resumos", "graficos", "mapa", "pdf")
+
+# Tipo do parâmetro de cada modo de apêndice
+TIPOS_PARAMETRO_APENDICE = {
+    apendice_pdf.COMPLETO: None,
+    apendice_pdf.A_CADA_N_LINHAS: int,
+    apendice_pdf.A_CADA_N_MINUTOS: float,
+    apendice_pdf.EXCURSOES: int,
+    apendice_pdf.ANEXO: str,
+}
+
+
+def listar_arquivos(diretorio):
+    """Arquivos do logger no diretório (sem subdiretórios), em ordem alfabética."""
+    return sorted(
+        os.path.join(diretorio, nome) for nome in os.listdir(diretorio)
+        if nome.lower().endswith(EXTENSOES) and not nome.startswith("~$")
+    )
+
+
+def processar_arquivo(caminho, destino, limites, opcoes):
+    """
+    Gera e grava o PDF de um arquivo. Executado nos processos do pool; erros
+    são devolvidos no resultado para não interromper o lote.
+    """
+    inicio = time.perf_counter()
+    resultado = {"arquivo": caminho, "destino": destino, "linhas": 0, "tempos": {}, "erro": None}
+    try:
+        pdf_bytes, linhas, tempos = gerar_relatorio(caminho, limites, **opcoes)
+        with open(destino, "wb") as f:
+            f.write(pdf_bytes)
+        resultado.update(linhas=linhas, tempos=tempos)
+    except Exception as e:
+        resultado["erro"] = f"{type(e).__name__}: {e}"
+    resultado["total"] = time.perf_counter() - inicio
+    return resultado
+
+
+def imprimir_resumo(resultados, duracao):
+    """Vazão do lote e tempo por etapa (soma entre os processos, média por arquivo)."""
+    concluidos = [r for r in resultados if r["erro"] is None]
+    linhas = sum(r["linhas"] for r in concluidos)
+    print()
+    print(f"{len(concluidos)} de {len(resultados)} relatórios gerados em {duracao:.1f} s")
+    if not concluidos:
+        return
+    print(f"Vazão: {len(concluidos) / duracao:.2f} relatórios/s, {linhas / duracao:,.0f} linhas/s")
+
+    total_etapas = sum(sum(r["tempos"].values()) for r in concluidos)
+    print()
+    print(f"{'Etapa':<10} {'Total (s)':>10} {'Média (s)':>10} {'%':>6}")
+    for etapa in ETAPAS:
+        valores = [r["tempos"][etapa] for r in concluidos if etapa in r["tempos"]]
+        if not valores:
+            continue
+        soma = sum(valores)
+        print(f"{etapa:<10} {soma:>10.2f} {soma / len(valores):>10.2f} {soma / total_etapas * 100:>5.1f}%")
+
+
+def ler_apendice(modo, parametro):
+    """Monta a tupla (modo, parâmetro) do apêndice a partir dos argumentos."""
+    tipo = TIPOS_PARAMETRO_APENDICE[modo]
+    if tipo is None:
+        return (modo, None)
+    if parametro is None:
+        raise SystemExit(f"O modo de apêndice '{modo}' precisa de --parametro-apendice.")
+    return (modo, tipo(parametro))
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Gera os relatórios PDF de um diretório de arquivos do logger.")
+    parser.add_argument("diretorio", help="Diretório com os arquivos .xlsx/.csv.")
+    parser.add_argument("--saida", help="Diretório dos PDFs (padrão: o próprio diretório de entrada).")
+    parser.add_argument("--li-temp", type=float, default=15.0)
+    parser.add_argument("--ls-temp", type=float, default=30.0)
+    parser.add_argument("--li-umid", type=float, default=0.0)
+    parser.add_argument("--ls-umid", type=float, default=100.0)
+    parser.add_argument("--observacoes", default="")
+    parser.add_argument("--enderecos", choices=["nenhum", "todos", "douglas_peucker", "distancia", "tempo", "paradas"],
+                        default="nenhum", help="Pontos geocodificados: nenhum, todos ou só os waypoints do método.")
+    parser.add_argument("--parametro-enderecos", type=float, default=50.0,
+                        help="Tolerância/espaçamento (m) ou intervalo/duração (min) do método de waypoints.")
+    parser.add_argument("--raio", type=float, default=None, help="Raio de reaproveitamento de endereços (m).")
+    parser.add_argument("--apendice", choices=list(TIPOS_PARAMETRO_APENDICE), default=apendice_pdf.COMPLETO,
+                        help="Dados brutos no final do PDF.")
+    parser.add_argument("--parametro-apendice",
+                        help="N linhas, N minutos, linhas de contexto ou formato do anexo (csv/xlsx).")
+    parser.add_argument("--tiles", action="store_true", help="Usar o fundo do OpenStreetMap no mapa.")
+    parser.add_argument("--processos", type=int, default=os.cpu_count())
+    args = parser.parse_args(argumentos)
+
+    saida = args.saida or args.diretorio
+    os.makedirs(saida, exist_ok=True)
+    arquivos = listar_arquivos(args.diretorio)
+    if not arquivos:
+        raise SystemExit(f"Nenhum arquivo {'/'.join(EXTENSOES)} em {args.diretorio}.")
+
+    limites = {"temperatura": (args.li_temp, args.ls_temp), "umidade": (args.li_umid, args.ls_umid)}
+    config_enderecos = None
+    if args.enderecos != "nenhum":
+        from geocodificacao import RAIO_PADRAO_METROS
+
+        metodo = None if args.enderecos == "todos" else args.enderecos
+        raio = RAIO_PADRAO_METROS if args.raio is None else args.raio
+        config_enderecos = (metodo, args.parametro_enderecos if metodo else None, raio)
+    opcoes = {
+        "observacoes": args.observacoes,
+        "config_enderecos": config_enderecos,
+        "apendice": ler_apendice(args.apendice, args.parametro_apendice),
+        "usar_tiles": args.tiles,
+    }
+
+    inicio = time.perf_counter()
+    resultados = []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.processos, len(arquivos)))) as pool:
+        tarefas = []
+        for caminho in arquivos:
+            nome = os.path.splitext(os.path.basename(caminho))[0]
+            destino = os.path.join(saida, f"{nome}.pdf")
+            tarefas.append(pool.submit(processar_arquivo, caminho, destino, limites, opcoes))
+
+        for tarefa in as_completed(tarefas):
+            resultado = tarefa.result()
+            resultados.append(resultado)
+            if resultado["erro"]:
+                print(f"ERRO  {resultado['arquivo']}: {resultado['erro']}")
+            else:
+                print(f"ok    {resultado['arquivo']} -> {resultado['destino']} "
+                      f"({resultado['linhas']} linhas, {resultado['total']:.2f} s)")
+
+    imprimir_resumo(resultados, time.perf_counter() - inicio)
+    return 0 if all(r["erro"] is None for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
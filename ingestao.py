@@ -0,0 +1,239 @@
+"""
+Leitura incremental dos arquivos do logger.
+
+Os arquivos são lidos em blocos de linhas (openpyxl em modo `read_only` para
+xlsx, `chunksize` para CSV). Cada bloco é convertido e validado isoladamente,
+e pode alimentar agregadores incrementais; assim o pico de memória depende
+do tamanho do bloco, não do comprimento do arquivo.
+"""
+import csv
+
+import pandas as pd
+
+from canais import detectar_canais, COLUNA_LUZ
+
+TAMANHO_BLOCO_PADRAO = 50000
+TAMANHO_AMOSTRA_CSV = 1024  # bytes lidos para detectar o separador
+SEPARADORES_CSV = ",;\t|"
+COLUNAS_OBRIGATORIAS = ["Date Time", "latitude", "longitude", "Temperatura (°C)", "Hora"]
+
+
+def _nome_arquivo(arquivo):
+    return str(getattr(arquivo, "name", arquivo)).lower()
+
+
+def _ler_blocos_xlsx(arquivo, tamanho_bloco, planilha):
+    from openpyxl import load_workbook
+
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    workbook = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = workbook[planilha].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        # Colunas sem nome no cabeçalho recebem o mesmo nome que o pandas daria
+        colunas = [c if c is not None else f"Unnamed: {i}" for i, c in enumerate(cabecalho)]
+
+        bloco = []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) >= tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=colunas)
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=colunas)
+    finally:
+        workbook.close()
+
+
+def detectar_separador(arquivo, tamanho_amostra=TAMANHO_AMOSTRA_CSV):
+    """
+    Separador do CSV, detectado pelo `csv.Sniffer` nas linhas completas do
+    início do arquivo; vírgula se não houver como decidir.
+    """
+    if hasattr(arquivo, "read"):
+        arquivo.seek(0)
+        amostra = arquivo.read(tamanho_amostra)
+        arquivo.seek(0)
+    else:
+        with open(arquivo, "rb") as f:
+            amostra = f.read(tamanho_amostra)
+    if isinstance(amostra, bytes):
+        amostra = amostra.decode("utf-8", errors="ignore")
+    if len(amostra) >= tamanho_amostra and "\n" in amostra:
+        amostra = amostra.rsplit("\n", 1)[0]
+    try:
+        return csv.Sniffer().sniff(amostra, delimiters=SEPARADORES_CSV).delimiter
+    except csv.Error:
+        return ","
+
+
+def _ler_blocos_csv(arquivo, tamanho_bloco):
+    # O separador é detectado uma vez; o resto do arquivo vai pelo leitor em C do pandas
+    separador = detectar_separador(arquivo)
+    yield from pd.read_csv(arquivo, chunksize=tamanho_bloco, sep=separador)
+
+
+def ler_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO_PADRAO, planilha="Sheet1"):
+    """Gera DataFrames brutos de até `tamanho_bloco` linhas, de xlsx ou CSV."""
+    if _nome_arquivo(arquivo).endswith(".csv"):
+        return _ler_blocos_csv(arquivo, tamanho_bloco)
+    return _ler_blocos_xlsx(arquivo, tamanho_bloco, planilha)
+
+
+def colunas_numericas(bloco):
+    """
+    Colunas que vão para número em todos os blocos: coordenadas, "Hora", luz
+    e os canais, mais as outras que já são numéricas neste bloco (o primeiro).
+    """
+    conhecidas = ["latitude", "longitude", "Hora", COLUNA_LUZ]
+    conhecidas += [canal.coluna for canal in detectar_canais(bloco.columns, {})]
+    numericas = [c for c in conhecidas if c in bloco.columns]
+    for coluna in bloco.columns:
+        if coluna in numericas or coluna in ("Date Time", "endereco"):
+            continue
+        valores = bloco[coluna]
+        if pd.api.types.is_bool_dtype(valores):
+            continue
+        if pd.api.types.is_numeric_dtype(valores):
+            numericas.append(coluna)
+        elif pd.api.types.is_object_dtype(valores) or pd.api.types.is_string_dtype(valores):
+            convertida = pd.to_numeric(valores, errors='coerce')
+            # Só entram colunas que são de fato numéricas
+            if convertida.notna().any() and convertida.notna().sum() == valores.notna().sum():
+                numericas.append(coluna)
+    return numericas
+
+
+def preparar_bloco(bloco, numericas=None):
+    """
+    Converte os tipos e descarta as linhas incompletas de um bloco. As
+    colunas `numericas` (de `colunas_numericas`; por padrão, as deste bloco)
+    sempre viram número, com valores inválidos como NaN, para que todos os
+    blocos de um arquivo tenham os mesmos tipos.
+    Lança ValueError se faltar alguma coluna obrigatória.
+    """
+    faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in bloco.columns]
+    if faltando:
+        raise ValueError(f"A coluna '{faltando[0]}' não foi encontrada no arquivo.")
+
+    if numericas is None:
+        numericas = colunas_numericas(bloco)
+    bloco = bloco.copy()
+    bloco["Date Time"] = pd.to_datetime(bloco["Date Time"], errors='coerce')
+    for coluna in numericas:
+        if coluna in bloco.columns:
+            bloco[coluna] = pd.to_numeric(bloco[coluna], errors='coerce')
+    return bloco.dropna(subset=COLUNAS_OBRIGATORIAS)
+
+
+def ler_blocos_preparados(arquivo, tamanho_bloco=TAMANHO_BLOCO_PADRAO, planilha="Sheet1"):
+    """
+    Gera os blocos já convertidos e validados por `preparar_bloco`; as
+    colunas numéricas são decididas no primeiro bloco.
+    """
+    numericas = None
+    for bloco in ler_blocos(arquivo, tamanho_bloco, planilha):
+        if numericas is None:
+            numericas = colunas_numericas(bloco)
+        bloco = preparar_bloco(bloco, numericas)
+        if len(bloco):
+            yield bloco
+
+
+class AgregadorResumo:
+    """
+    Acumula, bloco a bloco, as estatísticas por "Hora" e gerais de cada canal
+    (contagem, soma, mínima, máxima e contagens abaixo/dentro/acima da
+    especificação). Ao final produz os mesmos resumos que
+    `calcular_resumos_por_hora` e `calcular_resumos_gerais`.
+    """
+
+    def __init__(self, canais):
+        self.canais = canais
+        self.parciais = None
+        self.linhas = 0
+
+    def atualizar(self, bloco):
+        dados = {"Hora": bloco["Hora"], "linhas": 1}
+        agregacoes = {"linhas": ("linhas", "sum")}
+        for i, canal in enumerate(self.canais):
+            valores = bloco[canal.coluna]
+            dados[f"v{i}"] = valores
+            dados[f"abaixo{i}"] = valores < canal.li
+            dados[f"dentro{i}"] = (valores >= canal.li) & (valores <= canal.ls)
+            dados[f"acima{i}"] = valores > canal.ls
+            agregacoes.update({
+                f"n{i}": (f"v{i}", "count"), f"soma{i}": (f"v{i}", "sum"),
+                f"min{i}": (f"v{i}", "min"), f"max{i}": (f"v{i}", "max"),
+                f"abaixo{i}": (f"abaixo{i}", "sum"), f"dentro{i}": (f"dentro{i}", "sum"),
+                f"acima{i}": (f"acima{i}", "sum"),
+            })
+
+        parcial = pd.DataFrame(dados).groupby("Hora").agg(**agregacoes)
+        self.linhas += len(bloco)
+        if self.parciais is None:
+            self.parciais = parcial
+            return
+
+        # Combina com o acumulado: somas somam, mínimas e máximas se comparam
+        combinado = pd.concat([self.parciais, parcial])
+        regras = {coluna: "sum" for coluna in combinado.columns}
+        for i in range(len(self.canais)):
+            regras[f"min{i}"] = "min"
+            regras[f"max{i}"] = "max"
+        self.parciais = combinado.groupby(level=0).agg(regras)
+
+    def resumos_por_hora(self):
+        """Resumo por hora de cada canal (chave: `canal.nome`)."""
+        parciais = self.parciais.sort_index()
+        intervalos = [f"{i+1}ª Hora" for i in range(len(parciais))]
+        resumos = {}
+        for i, canal in enumerate(self.canais):
+            linhas = parciais["linhas"]
+            resumos[canal.nome] = pd.DataFrame({
+                "Intervalo": intervalos,
+                f"{canal.nome}_Mínima": parciais[f"min{i}"].to_numpy(),
+                f"{canal.nome}_Média": (parciais[f"soma{i}"] / parciais[f"n{i}"]).to_numpy(),
+                f"{canal.nome}_Máxima": parciais[f"max{i}"].to_numpy(),
+                "% Abaixo da especificação": (parciais[f"abaixo{i}"] / linhas * 100).to_numpy(),
+                "% Dentro da especificação": (parciais[f"dentro{i}"] / linhas * 100).to_numpy(),
+                "% Acima da especificação": (parciais[f"acima{i}"] / linhas * 100).to_numpy(),
+            }).fillna(0)
+        return resumos
+
+    def resumos_gerais(self):
+        """Resumo do arquivo inteiro de cada canal (chave: `canal.nome`)."""
+        totais = self.parciais.sum()
+        resumos = {}
+        for i, canal in enumerate(self.canais):
+            n = totais[f"n{i}"]
+            resumos[canal.nome] = pd.DataFrame({
+                f"{canal.simbolo} Mínima": [self.parciais[f"min{i}"].min()],
+                f"{canal.simbolo} Média": [totais[f"soma{i}"] / n if n else float("nan")],
+                f"{canal.simbolo} Máxima": [self.parciais[f"max{i}"].max()],
+                "%Abaixo da especificação": [totais[f"abaixo{i}"] / n * 100 if n else 0.0],
+                "%Dentro da especificação": [totais[f"dentro{i}"] / n * 100 if n else 0.0],
+                "%Acima da especificação": [totais[f"acima{i}"] / n * 100 if n else 0.0],
+            })
+        return resumos
+
+
+def resumir_em_blocos(arquivo, limites, tamanho_bloco=TAMANHO_BLOCO_PADRAO, planilha="Sheet1"):
+    """
+    Modo de memória limitada: calcula os resumos sem manter as linhas do
+    arquivo. Os canais são detectados no primeiro bloco; `limites` mapeia o
+    tipo do canal para (li, ls).
+    Retorna (canais, resumos por hora, resumos gerais, número de linhas).
+    """
+    agregador = None
+    for bloco in ler_blocos_preparados(arquivo, tamanho_bloco, planilha):
+        if agregador is None:
+            agregador = AgregadorResumo(detectar_canais(bloco.columns, limites))
+        agregador.atualizar(bloco)
+
+    if agregador is None:
+        raise ValueError("Nenhuma linha válida foi encontrada no arquivo.")
+    return agregador.canais, agregador.resumos_por_hora(), agregador.resumos_gerais(), agregador.linhas
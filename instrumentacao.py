@@ -0,0 +1,271 @@
+"""
+Instrumentação das etapas do relatório.
+
+O decorador `instrumentar` mede o tempo, as linhas processadas e, se ligado,
+o pico de memória de cada chamada. Os resultados se acumulam no registro do
+processo e saem de três formas: uma linha de log JSON por chamada (logger
+"route.instrumentacao", escrito no stderr com ROUTE_LOG_INSTRUMENTACAO=1),
+o painel de diagnóstico do app e o texto no formato do Prometheus, que
+`ServidorMetricas` serve em /metrics quando ROUTE_METRICAS_PORTA está definida.
+
+O pico de memória vem do tracemalloc, que deixa as alocações bem mais lentas;
+por isso só é medido com ROUTE_INSTRUMENTACAO_MEMORIA=1 ou depois de
+`ativar_memoria()`. É o pico de todo o processo durante a chamada (outras
+threads entram na conta), não só o da função.
+"""
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("route.instrumentacao")
+
+MEDIR_MEMORIA_PADRAO = os.environ.get("ROUTE_INSTRUMENTACAO_MEMORIA", "0") == "1"
+LOG_PADRAO = os.environ.get("ROUTE_LOG_INSTRUMENTACAO", "0") == "1"
+PORTA_METRICAS = os.environ.get("ROUTE_METRICAS_PORTA")
+MAX_CHAMADAS_RECENTES = 200
+
+
+def _contar_linhas(args, kwargs, resultado):
+    """Linhas do primeiro DataFrame recebido ou, se não houver (carga), do devolvido."""
+    candidatos = list(args) + list(kwargs.values())
+    candidatos += list(resultado) if isinstance(resultado, tuple) else [resultado]
+    for valor in candidatos:
+        if hasattr(valor, "columns") and hasattr(valor, "__len__"):
+            return len(valor)
+    return None
+
+
+class Registro:
+    """Acumula as medições por etapa, com as chamadas mais recentes."""
+
+    def __init__(self, medir_memoria=MEDIR_MEMORIA_PADRAO):
+        self.medir_memoria = medir_memoria
+        self.etapas = {}
+        self.recentes = deque(maxlen=MAX_CHAMADAS_RECENTES)
+        self._lock = threading.Lock()
+        self._pilha = threading.local()
+
+    def ativar_memoria(self, ativo=True):
+        """Liga ou desliga a medição do pico de memória (tracemalloc)."""
+        self.medir_memoria = ativo
+        if ativo and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not ativo and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _entrar(self):
+        """Começa a medir a memória; devolve o quadro da chamada na pilha da thread."""
+        if not (self.medir_memoria and tracemalloc.is_tracing()):
+            return None
+        pilha = self._pilha.__dict__.setdefault("quadros", [])
+        atual, pico = tracemalloc.get_traced_memory()
+        if pilha:
+            # O reset abaixo apaga o pico que a chamada externa já viu
+            pilha[-1]["pico"] = max(pilha[-1]["pico"], pico)
+        tracemalloc.reset_peak()
+        quadro = {"inicio": atual, "pico": atual}
+        pilha.append(quadro)
+        return quadro
+
+    def _sair(self, quadro):
+        """Pico de memória da chamada, em bytes acima do uso no início."""
+        if quadro is None:
+            return None
+        pilha = self._pilha.quadros
+        pilha.pop()
+        if not tracemalloc.is_tracing():
+            return None
+        pico = max(quadro["pico"], tracemalloc.get_traced_memory()[1])
+        if pilha:
+            pilha[-1]["pico"] = max(pilha[-1]["pico"], pico)
+        return pico - quadro["inicio"]
+
+    def registrar(self, etapa, segundos, pico_bytes=None, linhas=None, erro=None):
+        """Acumula uma chamada e a emite como linha de log JSON."""
+        chamada = {"etapa": etapa, "segundos": round(segundos, 6), "pico_bytes": pico_bytes,
+                   "linhas": linhas, "erro": erro, "momento": time.time()}
+        with self._lock:
+            total = self.etapas.setdefault(etapa, {
+                "chamadas": 0, "erros": 0, "segundos": 0.0, "ultimo_segundos": 0.0,
+                "max_segundos": 0.0, "pico_bytes": None, "linhas": 0,
+            })
+            total["chamadas"] += 1
+            total["erros"] += erro is not None
+            total["segundos"] += segundos
+            total["ultimo_segundos"] = segundos
+            total["max_segundos"] = max(total["max_segundos"], segundos)
+            if pico_bytes is not None:
+                total["pico_bytes"] = max(total["pico_bytes"] or 0, pico_bytes)
+            total["linhas"] += linhas or 0
+            self.recentes.append(chamada)
+        logger.info(json.dumps({"evento": "etapa", **chamada}, ensure_ascii=False))
+
+    def medir(self, funcao, etapa, args, kwargs):
+        quadro = self._entrar()
+        inicio = time.perf_counter()
+        resultado = erro = None
+        try:
+            resultado = funcao(*args, **kwargs)
+            return resultado
+        except Exception as e:
+            erro = type(e).__name__
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            pico = self._sair(quadro)
+            self.registrar(etapa, segundos, pico, _contar_linhas(args, kwargs, resultado), erro)
+
+    def resumo(self):
+        """Cópia dos totais por etapa, na ordem da primeira chamada."""
+        with self._lock:
+            return {etapa: dict(total) for etapa, total in self.etapas.items()}
+
+    def chamadas_recentes(self):
+        with self._lock:
+            return list(self.recentes)
+
+    def limpar(self):
+        with self._lock:
+            self.etapas.clear()
+            self.recentes.clear()
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def obter_registro():
+    """Retorna o registro de medições compartilhado pelo processo."""
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = Registro()
+            if LOG_PADRAO and not logger.handlers:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+            if _registro.medir_memoria:
+                _registro.ativar_memoria()
+        return _registro
+
+
+def instrumentar(etapa=None):
+    """Decorador: mede cada chamada da função no registro do processo, com o nome `etapa`."""
+    def decorador(funcao):
+        nome = etapa or funcao.__name__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            return obter_registro().medir(funcao, nome, args, kwargs)
+        return envolvida
+    return decorador
+
+
+def estatisticas_caches():
+    """Acertos, faltas e taxa de acerto dos caches em disco de endereços e de arquivos."""
+    from cache_dados import obter_cache_dados
+    from geocodificacao import obter_cache_enderecos
+
+    return {"enderecos": obter_cache_enderecos().estatisticas(),
+            "arquivos": obter_cache_dados().estatisticas()}
+
+
+def _rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def texto_prometheus(registro=None, caches=None):
+    """Métricas no formato de exposição em texto do Prometheus."""
+    registro = registro or obter_registro()
+    caches = estatisticas_caches() if caches is None else caches
+    etapas = registro.resumo()
+    metricas = [
+        ("route_etapa_chamadas_total", "counter", "Chamadas de cada etapa.", "chamadas"),
+        ("route_etapa_erros_total", "counter", "Chamadas que terminaram em exceção.", "erros"),
+        ("route_etapa_segundos_total", "counter", "Tempo total gasto em cada etapa.", "segundos"),
+        ("route_etapa_ultimo_segundos", "gauge", "Duração da última chamada.", "ultimo_segundos"),
+        ("route_etapa_max_segundos", "gauge", "Maior duração observada.", "max_segundos"),
+        ("route_etapa_linhas_total", "counter", "Linhas processadas por etapa.", "linhas"),
+        ("route_etapa_pico_memoria_bytes", "gauge", "Maior pico de memória observado (tracemalloc).",
+         "pico_bytes"),
+    ]
+    linhas = []
+    for nome, tipo, ajuda, campo in metricas:
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+        for etapa, total in etapas.items():
+            if total[campo] is not None:
+                linhas.append(f'{nome}{{etapa="{_rotulo(etapa)}"}} {total[campo]}')
+    for nome, tipo, ajuda, campo in [
+        ("route_cache_acertos_total", "counter", "Acertos dos caches em disco.", "acertos"),
+        ("route_cache_faltas_total", "counter", "Faltas dos caches em disco.", "faltas"),
+        ("route_cache_taxa_acerto", "gauge", "Fração de acertos dos caches em disco.", "taxa_acerto"),
+    ]:
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+        for cache, valores in caches.items():
+            linhas.append(f'{nome}{{cache="{_rotulo(cache)}"}} {valores[campo]}')
+    return "\n".join(linhas) + "\n"
+
+
+class _HandlerMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        dados = texto_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServidorMetricas:
+    """Serve /metrics numa thread própria, no mesmo processo das medições."""
+
+    def __init__(self, porta, endereco="0.0.0.0"):
+        self.servidor = ThreadingHTTPServer((endereco, porta), _HandlerMetricas)
+        self.porta = self.servidor.server_address[1]
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+_servidor_metricas = None
+_servidor_metricas_lock = threading.Lock()
+
+
+def obter_servidor_metricas(porta=PORTA_METRICAS):
+    """
+    Inicia (uma vez por processo) o endpoint de métricas na porta configurada.
+    Retorna None se nenhuma porta foi definida, em processos filhos (pools
+    de gráficos e de relatórios), que não podem ocupar a porta do principal,
+    ou se a porta já estiver em uso.
+    """
+    global _servidor_metricas
+    if porta is None or multiprocessing.parent_process() is not None:
+        return None
+    with _servidor_metricas_lock:
+        if _servidor_metricas is None:
+            try:
+                _servidor_metricas = ServidorMetricas(int(porta)).iniciar()
+            except OSError as e:
+                logger.warning("Endpoint de métricas não iniciado na porta %s: %s", porta, e)
+                return None
+        return _servidor_metricas
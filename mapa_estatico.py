@@ -0,0 +1,142 @@
+"""
+Renderização estática do mapa da rota direto para PNG, sem navegador.
+
+Desenha a linha do trajeto e os marcadores numerados com matplotlib (backend
+Agg) em projeção Web Mercator. Opcionalmente coloca por baixo os tiles do
+OpenStreetMap, guardados num cache em disco para não baixá-los de novo.
+"""
+import io
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib.image as mpimg
+
+from trajetoria import indices_uniformes
+
+TAMANHO_TILE = 256
+URL_TILES = os.environ.get("ROUTE_TILE_URL", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+DIRETORIO_TILES = os.path.join(
+    os.environ.get("ROUTE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "route")), "tiles"
+)
+USER_AGENT = "temperatura_umidade_app"
+
+
+def _mercator(lat, lon, zoom):
+    """Converte graus para pixels Web Mercator no nível de zoom dado."""
+    n = TAMANHO_TILE * 2 ** zoom
+    lat_r = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat_r) + 1.0 / np.cos(lat_r)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def _escolher_zoom(lat, lon, largura_px, altura_px, margem=0.1):
+    """Maior zoom em que toda a rota cabe na imagem, com margem."""
+    for zoom in range(18, -1, -1):
+        x, y = _mercator(lat, lon, zoom)
+        if (np.ptp(x) * (1 + 2 * margem) <= largura_px and
+                np.ptp(y) * (1 + 2 * margem) <= altura_px):
+            return zoom
+    return 0
+
+
+def _obter_tile(z, x, y, diretorio_tiles, timeout):
+    """Lê o tile do cache em disco ou baixa e guarda. Retorna a imagem ou None."""
+    caminho = os.path.join(diretorio_tiles, str(z), str(x), f"{y}.png")
+    if os.path.exists(caminho):
+        with open(caminho, "rb") as f:
+            dados = f.read()
+    else:
+        import requests
+        try:
+            resposta = requests.get(URL_TILES.format(z=z, x=x, y=y), timeout=timeout,
+                                    headers={"User-Agent": USER_AGENT})
+            resposta.raise_for_status()
+        except requests.RequestException:
+            return None
+        dados = resposta.content
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # Grava em arquivo temporário e renomeia, para outros processos nunca lerem pela metade
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, caminho)
+    return mpimg.imread(io.BytesIO(dados), format="png")
+
+
+def renderizar_mapa_estatico(latitudes, longitudes, destino=None, largura_px=1200, altura_px=800,
+                             usar_tiles=False, diretorio_tiles=DIRETORIO_TILES, max_rotulos=60,
+                             timeout_tiles=5):
+    """
+    Desenha a rota e os marcadores numerados e grava o PNG em `destino`
+    (caminho ou arquivo). Sem `destino`, retorna os bytes do PNG.
+    A numeração segue a tabela de localizações (Ponto 1 = primeira linha);
+    pontos sem coordenadas finitas são descartados antes de desenhar.
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    finitos = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[finitos], lon[finitos]
+
+    dpi = 100
+    fig = Figure(figsize=(largura_px / dpi, altura_px / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    fig.patch.set_facecolor("#eef1f4")
+    tiles_desenhados = 0
+
+    if len(lat):
+        zoom = _escolher_zoom(lat, lon, largura_px, altura_px)
+        x, y = _mercator(lat, lon, zoom)
+
+        # Janela centrada na rota com exatamente o tamanho da imagem
+        cx, cy = (x.min() + x.max()) / 2, (y.min() + y.max()) / 2
+        x0, x1 = cx - largura_px / 2, cx + largura_px / 2
+        y0, y1 = cy - altura_px / 2, cy + altura_px / 2
+
+        if usar_tiles:
+            tiles = [
+                (tx, ty)
+                for tx in range(int(x0 // TAMANHO_TILE), int(x1 // TAMANHO_TILE) + 1)
+                for ty in range(int(y0 // TAMANHO_TILE), int(y1 // TAMANHO_TILE) + 1)
+                if 0 <= ty < 2 ** zoom
+            ]
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                imagens = list(executor.map(
+                    lambda t: _obter_tile(zoom, t[0] % 2 ** zoom, t[1], diretorio_tiles, timeout_tiles), tiles
+                ))
+            for (tx, ty), imagem in zip(tiles, imagens):
+                if imagem is not None:
+                    tiles_desenhados += 1
+                    ax.imshow(imagem, extent=(tx * TAMANHO_TILE, (tx + 1) * TAMANHO_TILE,
+                                              (ty + 1) * TAMANHO_TILE, ty * TAMANHO_TILE),
+                              interpolation="bilinear", zorder=0)
+
+        ax.plot(x, y, color="blue", linewidth=2.5, solid_capstyle="round", zorder=2)
+
+        rotulados = indices_uniformes(len(lat), max_rotulos)
+        ax.scatter(x[rotulados], y[rotulados], s=220, color="blue", edgecolors="white",
+                   linewidths=1, zorder=3)
+        for i in rotulados:
+            ax.text(x[i], y[i], str(i + 1), color="white", fontsize=7, ha="center", va="center",
+                    fontweight="bold", zorder=4)
+
+        ax.set_xlim(x0, x1)
+        ax.set_ylim(y1, y0)  # eixo y do Mercator cresce para o sul
+
+    if tiles_desenhados:
+        ax.text(0.995, 0.005, "© OpenStreetMap", transform=ax.transAxes,
+                fontsize=7, ha="right", va="bottom", color="#555555")
+
+    if destino is None:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=dpi)
+        return buffer.getvalue()
+
+    fig.savefig(destino, format="png", dpi=dpi)
+    return destino
@@ -0,0 +1,98 @@
+"""
+Mapa interativo (Folium) da rota, dimensionado para rotas longas.
+
+A linha do trajeto é simplificada (Douglas-Peucker) antes de ir para o HTML,
+só até `max_marcadores` pontos numerados são desenhados, espaçados ao longo
+da rota, e acima de `agrupar_acima` marcadores eles são agrupados em
+clusters. Os marcadores vão numa única camada GeoJSON: número e popup são
+propriedades de cada ponto, e o ícone é montado no navegador. O HTML é
+gerado em memória; o folium só é importado quando o mapa é montado.
+"""
+import json
+import os
+
+import numpy as np
+
+import trajetoria
+
+MAX_MARCADORES_PADRAO = int(os.environ.get("ROUTE_MAX_MARCADORES", "1000"))
+TOLERANCIA_LINHA_PADRAO = float(os.environ.get("ROUTE_TOLERANCIA_LINHA_METROS", "5"))
+AGRUPAR_ACIMA_PADRAO = 200
+
+ESTILO_ROTULO_SIMPLES = '<div style="font-size: 10pt">{}</div>'
+ESTILO_ROTULO_CIRCULO = (
+    '<div style="font-size: 10pt; color: white; background-color: blue; border-radius: 50%; '
+    'width: 20px; height: 20px; text-align: center; line-height: 20px;">{}</div>'
+)
+
+
+# Executado no navegador para cada ponto da camada GeoJSON
+JS_MARCADOR = """
+function(feature, layer) {
+    layer.setIcon(L.divIcon({html: %s.replace('{}', feature.properties.rotulo), className: 'empty'}));
+    if (feature.properties.popup) {
+        layer.bindPopup(feature.properties.popup, {maxWidth: 300});
+    }
+}
+"""
+
+
+def camada_marcadores(latitudes, longitudes, indices, popups=None, estilo_rotulo=ESTILO_ROTULO_SIMPLES):
+    """
+    Camada GeoJSON com um marcador numerado (número = índice + 1) para cada
+    índice em `indices`. `popups`, se dado, tem o HTML do popup de cada
+    marcador, na mesma ordem de `indices`.
+    """
+    import folium
+
+    indices = np.asarray(indices)
+    lat = np.asarray(latitudes, dtype=float)[indices].tolist()
+    lon = np.asarray(longitudes, dtype=float)[indices].tolist()
+    rotulos = (indices + 1).astype(str).tolist()
+    textos = list(popups) if popups is not None else [None] * len(rotulos)
+
+    colecao = {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, y]},
+             "properties": {"rotulo": rotulo, "popup": texto}}
+            for x, y, rotulo, texto in zip(lon, lat, rotulos, textos)
+        ],
+    }
+    return folium.GeoJson(colecao, on_each_feature=folium.JsCode(JS_MARCADOR % json.dumps(estilo_rotulo)))
+
+
+def criar_mapa_rota(latitudes, longitudes, popups=None, estilo_rotulo=ESTILO_ROTULO_SIMPLES,
+                    max_marcadores=MAX_MARCADORES_PADRAO, tolerancia_metros=TOLERANCIA_LINHA_PADRAO,
+                    agrupar_acima=AGRUPAR_ACIMA_PADRAO):
+    """
+    Monta o mapa da rota e retorna o HTML. Os marcadores levam o número da
+    linha (Ponto 1 = primeira linha); `popups`, se dado, recebe o array de
+    índices que terão marcador e retorna o HTML do popup de cada um, para que
+    os textos sejam montados só para eles. Com `tolerancia_metros=0` a linha
+    não é simplificada.
+    """
+    import folium
+    from folium.plugins import MarkerCluster
+
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    n = len(lat)
+
+    m = folium.Map(location=[lat[0], lon[0]] if n else [0, 0], zoom_start=10, tiles="OpenStreetMap")
+    if n:
+        folium.FitBounds([[lat.min(), lon.min()], [lat.max(), lon.max()]]).add_to(m)
+
+        if tolerancia_metros > 0:
+            linha = trajetoria.douglas_peucker(lat, lon, tolerancia_metros)
+        else:
+            linha = np.arange(n)
+        folium.PolyLine(np.column_stack([lat[linha], lon[linha]]).tolist(),
+                        color="blue", weight=2.5, opacity=1).add_to(m)
+
+        marcados = trajetoria.indices_uniformes(n, max_marcadores)
+        camada = MarkerCluster().add_to(m) if len(marcados) > agrupar_acima else m
+        textos = popups(marcados) if popups else None
+        camada_marcadores(lat, lon, marcados, textos, estilo_rotulo).add_to(camada)
+
+    return m.get_root().render()
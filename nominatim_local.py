@@ -0,0 +1,104 @@
+"""
+Servidor local que imita o endpoint /reverse do Nominatim.
+
+Serve para testar e medir a geocodificação em lote sem acessar a rede:
+
+    python nominatim_local.py --porta 8080 --atraso 0.05
+
+e depois usar o provedor "local" (ROUTE_GEOCODER_PROVEDOR=local).
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def resposta_reversa(latitude, longitude):
+    """Monta uma resposta no formato JSON do Nominatim, determinística pelas coordenadas."""
+    return {
+        "place_id": abs(hash((round(latitude, 4), round(longitude, 4)))),
+        "lat": str(latitude),
+        "lon": str(longitude),
+        "display_name": f"Rua {latitude:.4f}, {longitude:.4f}",
+        "address": {
+            "road": f"Rua {latitude:.3f}",
+            "suburb": f"Bairro {longitude:.2f}",
+            "city": "Cidade Teste",
+            "state": "Estado Teste",
+            "country": "Brasil",
+        },
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/reverse":
+            self.send_error(404)
+            return
+
+        params = parse_qs(url.query)
+        with self.server.lock_requisicoes:
+            self.server.requisicoes += 1
+        if self.server.atraso:
+            time.sleep(self.server.atraso)
+
+        try:
+            corpo = resposta_reversa(float(params["lat"][0]), float(params["lon"][0]))
+        except (KeyError, ValueError):
+            self.send_error(400)
+            return
+
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServidorNominatimLocal:
+    """
+    Servidor em thread própria; use como gerenciador de contexto.
+    `dominio` fica disponível para passar ao MotorGeocodificacao.
+    """
+
+    def __init__(self, porta=0, atraso=0.0):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", porta), _Handler)
+        self.servidor.atraso = atraso
+        self.servidor.requisicoes = 0
+        self.servidor.lock_requisicoes = threading.Lock()
+        self.dominio = f"127.0.0.1:{self.servidor.server_address[1]}"
+        self._thread = None
+
+    @property
+    def requisicoes(self):
+        return self.servidor.requisicoes
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor Nominatim local para testes.")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--atraso", type=float, default=0.0, help="Atraso por requisição, em segundos.")
+    args = parser.parse_args()
+
+    servidor = ServidorNominatimLocal(args.porta, args.atraso)
+    print(f"Nominatim local em http://{servidor.dominio}/reverse")
+    try:
+        servidor.servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,56 @@
+"""
+Redução de séries temporais para desenho.
+
+O eixo do tempo é dividido em baldes da largura de um pixel do gráfico e, de
+cada balde, só ficam o ponto de mínimo e o de máximo (além do primeiro e do
+último ponto da série). Picos e excursões continuam visíveis e o número de
+pontos desenhados passa a depender da largura da figura, não do arquivo.
+"""
+import numpy as np
+
+
+def _tempos_numericos(tempos):
+    tempos = np.asarray(tempos)
+    if np.issubdtype(tempos.dtype, np.datetime64):
+        return tempos.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return tempos.astype(float)
+
+
+def indices_min_max(tempos, valores, baldes):
+    """
+    Índices dos pontos de mínimo e máximo de cada um de `baldes` intervalos
+    iguais de tempo, em ordem. Valores NaN são ignorados.
+    """
+    t = _tempos_numericos(tempos)
+    v = np.asarray(valores, dtype=float)
+    validos = np.flatnonzero(~np.isnan(v) & ~np.isnan(t))
+    if len(validos) <= 2 * baldes:
+        return validos
+
+    t, v = t[validos], v[validos]
+    inicio, fim = t.min(), t.max()
+    if fim == inicio:
+        balde = np.zeros(len(t), dtype=np.int64)
+    else:
+        balde = np.minimum(((t - inicio) / (fim - inicio) * baldes).astype(np.int64), baldes - 1)
+
+    # Ordena por balde e, dentro dele, por valor: o primeiro é o mínimo e o último, o máximo
+    ordem = np.lexsort((v, balde))
+    balde_ordenado = balde[ordem]
+    fronteiras = np.flatnonzero(np.diff(balde_ordenado)) + 1
+    primeiros = np.concatenate(([0], fronteiras))
+    ultimos = np.concatenate((fronteiras - 1, [len(ordem) - 1]))
+
+    escolhidos = np.concatenate((ordem[primeiros], ordem[ultimos], [0, len(v) - 1]))
+    return validos[np.unique(escolhidos)]
+
+
+def reduzir_serie(tempos, valores, baldes):
+    """
+    Retorna (tempos, valores, reduzida) com no máximo ~2 pontos por balde;
+    `reduzida` diz se algum ponto foi descartado.
+    """
+    tempos = np.asarray(tempos)
+    valores = np.asarray(valores, dtype=float)
+    indices = indices_min_max(tempos, valores, baldes)
+    return tempos[indices], valores[indices], len(indices) < len(valores)
@@ -0,0 +1,747 @@
+"""
+Núcleo do gerador de relatórios de rota, sem dependência do Streamlit.
+
+Carga dos arquivos, geocodificação, resumos, gráficos e mapa; a montagem do
+PDF fica em `relatorio_pdf`. Erros são lançados como exceções (e não
+exibidos), para que a interface (`app.py`) e o gerador em lote
+(`gerar_relatorios.py`) decidam o que fazer.
+
+matplotlib, o pool de navegadores e o FPDF são importados no primeiro uso,
+para não pesar na partida dos processos que não chegam a usá-los.
+"""
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from geocodificacao import (
+    obter_cache_enderecos, consultar_nominatim, MotorGeocodificacao, RAIO_PADRAO_METROS
+)
+import trajetoria
+from reducao import reduzir_serie
+from mapa_interativo import (
+    criar_mapa_rota, ESTILO_ROTULO_CIRCULO, MAX_MARCADORES_PADRAO, TOLERANCIA_LINHA_PADRAO
+)
+from canais import detectar_canais, COLUNA_LUZ
+from ingestao import ler_blocos_preparados, TAMANHO_BLOCO_PADRAO
+from cache_dados import obter_cache_dados, chave_arquivo
+from coordenadas import normalizar_dataframe, mascara_coordenadas, linhas_com_coordenadas
+from excursoes import analisar_excursoes
+from instrumentacao import instrumentar
+import apendice as apendice_pdf
+
+DPI_TELA = 200  # o mesmo do st.pyplot
+SEM_COORDENADAS = "Coordenadas inválidas"  # endereço das linhas sem coordenadas
+PROCESSOS_GRAFICOS_PADRAO = int(os.environ.get("ROUTE_PROCESSOS_GRAFICOS", str(min(4, os.cpu_count() or 1))))
+
+
+def detectar_e_converter_coordenadas(df):
+    """
+    Converte as coordenadas para graus decimais linha a linha (microdegrees e
+    latitude/longitude trocadas) e deixa sem coordenadas (NaN) as linhas fora
+    da faixa. Não exibe nada: o relatório fica em `df.attrs["relatorio_coordenadas"]`.
+    """
+    return normalizar_dataframe(df)
+
+
+def obter_endereco_por_coordenadas(latitude, longitude, timeout=10, cache=None):
+    """
+    Converte coordenadas de latitude e longitude em endereço usando geocodificação reversa.
+    Consulta primeiro o cache persistente e só acessa a rede em caso de falta.
+    """
+    if cache is None:
+        cache = obter_cache_enderecos()
+
+    endereco = cache.obter(latitude, longitude)
+    if endereco is not None:
+        return endereco
+
+    endereco = consultar_nominatim(latitude, longitude, timeout)
+    cache.guardar(latitude, longitude, endereco)
+    return endereco
+
+
+@instrumentar()
+def adicionar_enderecos_ao_dataframe(df, progress_bar=None, raio_metros=RAIO_PADRAO_METROS, motor=None):
+    """
+    Adiciona uma coluna de endereços ao DataFrame baseada nas coordenadas.
+    Pontos a menos de `raio_metros` de um ponto já resolvido reaproveitam o endereço;
+    linhas sem coordenadas recebem `SEM_COORDENADAS`. `motor` (MotorGeocodificacao)
+    substitui o motor padrão, ex. apontado para outro servidor.
+    """
+    if 'latitude' not in df.columns or 'longitude' not in df.columns:
+        raise KeyError("Colunas de latitude e longitude não encontradas!")
+    
+    def atualizar_progresso(concluidos, total):
+        # Atualiza barra de progresso se fornecida
+        if progress_bar:
+            progress_bar.progress(concluidos / total if total else 1.0)
+    
+    validas = mascara_coordenadas(df)
+    if motor is None:
+        motor = MotorGeocodificacao(raio_metros=raio_metros)
+    enderecos = motor.geocodificar(df['latitude'].to_numpy()[validas].tolist(),
+                                   df['longitude'].to_numpy()[validas].tolist(),
+                                   progresso=atualizar_progresso)
+    
+    # Adiciona a coluna de endereços
+    coluna = np.full(len(df), SEM_COORDENADAS, dtype=object)
+    coluna[validas] = enderecos
+    df['endereco'] = coluna
+    return df
+
+
+def selecionar_waypoints(df, metodo, parametro):
+    """
+    Escolhe os índices (posicionais) dos pontos representativos da rota.
+    `parametro` é a tolerância/espaçamento em metros, o intervalo em minutos
+    ou a duração mínima da parada em minutos, conforme o método.
+    """
+    lat = df['latitude'].to_numpy(dtype=float)
+    lon = df['longitude'].to_numpy(dtype=float)
+
+    if metodo == "douglas_peucker":
+        return trajetoria.douglas_peucker(lat, lon, parametro)
+    if metodo == "distancia":
+        return trajetoria.indices_por_distancia(lat, lon, parametro)
+    if metodo == "tempo":
+        return trajetoria.indices_por_tempo(df['Date Time'].to_numpy(), pd.Timedelta(minutes=parametro))
+    if metodo == "paradas":
+        return trajetoria.detectar_paradas(lat, lon, df['Date Time'].to_numpy(),
+                                          duracao_minima=pd.Timedelta(minutes=parametro))
+    raise ValueError(f"Método de seleção de waypoints desconhecido: {metodo}")
+
+
+@instrumentar()
+def adicionar_enderecos_por_waypoints(df, metodo="douglas_peucker", parametro=50.0,
+                                      progress_bar=None, raio_metros=RAIO_PADRAO_METROS, motor=None):
+    """
+    Geocodifica apenas os waypoints da rota; as demais linhas recebem o
+    endereço do waypoint mais próximo e a distância até ele. Linhas sem
+    coordenadas ficam fora da rota, com `SEM_COORDENADAS` e distância NaN.
+    `motor` é como em `adicionar_enderecos_ao_dataframe`.
+    """
+    if 'latitude' not in df.columns or 'longitude' not in df.columns:
+        raise KeyError("Colunas de latitude e longitude não encontradas!")
+    if len(df) == 0:
+        df['endereco'] = []
+        df['distancia_waypoint_m'] = []
+        return df
+
+    def atualizar_progresso(concluidos, total):
+        if progress_bar:
+            progress_bar.progress(concluidos / total if total else 1.0)
+
+    validas = mascara_coordenadas(df)
+    rota = linhas_com_coordenadas(df)
+    enderecos = np.full(len(df), SEM_COORDENADAS, dtype=object)
+    distancias = np.full(len(df), np.nan)
+    if len(rota):
+        indices = selecionar_waypoints(rota, metodo, parametro)
+        lat = rota['latitude'].to_numpy(dtype=float)
+        lon = rota['longitude'].to_numpy(dtype=float)
+
+        if motor is None:
+            motor = MotorGeocodificacao(raio_metros=raio_metros)
+        enderecos_waypoints = motor.geocodificar(lat[indices].tolist(), lon[indices].tolist(),
+                                                 progresso=atualizar_progresso)
+
+        escolhido, distancia = trajetoria.atribuir_waypoint_mais_proximo(lat, lon, indices)
+        enderecos[validas] = pd.Series(enderecos_waypoints, dtype=object).to_numpy()[escolhido]
+        distancias[validas] = distancia.round(1)
+    df['endereco'] = enderecos
+    df['distancia_waypoint_m'] = distancias
+    return df
+
+
+@instrumentar()
+def carregar_dados(uploaded_file, tamanho_bloco=TAMANHO_BLOCO_PADRAO, planilha="Sheet1", chave=None):
+    """
+    Carrega e processa os dados do arquivo Excel (ou CSV). O arquivo é lido
+    em blocos de `tamanho_bloco` linhas, cada um convertido e validado antes
+    de ser juntado ao resultado. O resultado fica no cache em disco, indexado
+    pelo conteúdo do arquivo, e os reruns e reenvios o leem de lá.
+    Lança ValueError se o arquivo não tiver as colunas ou linhas válidas.
+    """
+    cache = obter_cache_dados()
+    chave = chave or chave_arquivo(uploaded_file, planilha=planilha)
+    df = cache.obter(chave)
+    if df is not None:
+        return df
+
+    blocos = list(ler_blocos_preparados(uploaded_file, tamanho_bloco, planilha))
+    if not blocos:
+        raise ValueError("nenhuma linha válida foi encontrada no arquivo.")
+    df = pd.concat(blocos, ignore_index=True)
+    df = df.dropna(axis=1, how='all')
+    
+    # NOVA FUNCIONALIDADE: Detecta e converte coordenadas automaticamente
+    df = detectar_e_converter_coordenadas(df)
+    
+    df["longitude"] = df["longitude"].astype(float)
+    df["latitude"] = df["latitude"].astype(float)
+    cache.guardar(chave, df)
+    return df
+
+
+def _colunas_lat_lon(df):
+    lat_col = next((col for col in df.columns if 'lat' in col.lower()), None)
+    lon_col = next((col for col in df.columns if 'lon' in col.lower() or 'lng' in col.lower()), None)
+
+    if not lat_col or not lon_col:
+        raise KeyError("Colunas de latitude e longitude não foram encontradas no DataFrame.")
+    return lat_col, lon_col
+
+
+def _textos_popup(df, indices):
+    """HTML do popup das linhas em `indices`, montado coluna a coluna."""
+    linhas = df.iloc[indices]
+    enderecos = (linhas['endereco'].astype(str) if 'endereco' in linhas.columns
+                 else pd.Series('Endereço não disponível', index=linhas.index))
+    popups = ("<b>Ponto " + pd.Series(indices + 1, index=linhas.index).astype(str) + "</b><br>"
+              + "<b>Coordenadas:</b> " + linhas["latitude"].map("{:.6f}".format)
+              + ", " + linhas["longitude"].map("{:.6f}".format) + "<br>"
+              + "<b>Endereço:</b> " + enderecos + "<br>"
+              + "<b>Data/Hora:</b> " + linhas["Date Time"].astype(str))
+    for canal in detectar_canais(df.columns, {}):
+        popups = popups + f"<br><b>{canal.nome}:</b> " + linhas[canal.coluna].astype(str) + canal.unidade
+    return popups.tolist()
+
+
+@instrumentar()
+def criar_mapa_com_enderecos(df, max_marcadores=MAX_MARCADORES_PADRAO, tolerancia_metros=TOLERANCIA_LINHA_PADRAO):
+    """
+    Cria um mapa com marcadores que incluem endereços nos popups.
+    Em rotas longas a linha é simplificada e só `max_marcadores` pontos
+    recebem marcador; a tabela de localizações continua com todos. Linhas
+    sem coordenadas ficam fora do mapa e da tabela.
+    """
+    lat_col, lon_col = _colunas_lat_lon(df)
+    df = linhas_com_coordenadas(df, lat_col, lon_col)
+    map_html = criar_mapa_rota(df[lat_col].to_numpy(), df[lon_col].to_numpy(),
+                               popups=lambda indices: _textos_popup(df, indices),
+                               estilo_rotulo=ESTILO_ROTULO_CIRCULO,
+                               max_marcadores=max_marcadores, tolerancia_metros=tolerancia_metros)
+
+    coordenadas = df[lat_col].map("{:.6f}".format) + ", " + df[lon_col].map("{:.6f}".format)
+    enderecos = (df['endereco'].astype(str) if 'endereco' in df.columns
+                 else pd.Series('Endereço não disponível', index=df.index))
+    pontos = [str(i) for i in range(1, len(df) + 1)]
+    marker_locations = list(map(list, zip(pontos, coordenadas.tolist(), enderecos.tolist())))
+    return map_html, marker_locations
+
+
+@instrumentar()
+def criar_mapa(df, max_marcadores=MAX_MARCADORES_PADRAO, tolerancia_metros=TOLERANCIA_LINHA_PADRAO):
+    """Função original para criar mapa sem endereços (só as linhas com coordenadas)."""
+    lat_col, lon_col = _colunas_lat_lon(df)
+    df = linhas_com_coordenadas(df, lat_col, lon_col)
+    latitudes, longitudes = df[lat_col].to_numpy(), df[lon_col].to_numpy()
+
+    map_html = criar_mapa_rota(latitudes, longitudes, max_marcadores=max_marcadores,
+                               tolerancia_metros=tolerancia_metros)
+    coordenadas = (df[lat_col].astype(str) + ", " + df[lon_col].astype(str)).tolist()
+    marker_locations = list(map(list, zip([str(i) for i in range(1, len(df) + 1)], coordenadas)))
+    return map_html, marker_locations
+
+
+@instrumentar()
+def calcular_resumo_por_hora(df, canais, estatisticas=True, percentuais=True):
+    """
+    Calcula, numa única agregação por "Hora", mínima/média/máxima e os
+    percentuais abaixo/dentro/acima da especificação de cada canal.
+
+    `canais` é uma lista de tuplas (coluna, prefixo, li, ls). As colunas de
+    saída são "<prefixo>_Mínima", "<prefixo>_Média", "<prefixo>_Máxima" e os
+    percentuais; com mais de um canal, os percentuais levam o prefixo entre
+    parênteses. Com `estatisticas=False` ou `percentuais=False` só a outra
+    parte é calculada (as estatísticas não dependem dos limites).
+    Retorna valores numéricos; a formatação fica para a exibição.
+    """
+    dados = {"Hora": df["Hora"]}
+    agregacoes = {}
+    for i, (coluna, prefixo, li, ls) in enumerate(canais):
+        valores = df[coluna]
+        if estatisticas:
+            dados[f"v{i}"] = valores
+            agregacoes[f"{prefixo}_Mínima"] = (f"v{i}", "min")
+            agregacoes[f"{prefixo}_Média"] = (f"v{i}", "mean")
+            agregacoes[f"{prefixo}_Máxima"] = (f"v{i}", "max")
+        if percentuais:
+            sufixo = f" ({prefixo})" if len(canais) > 1 else ""
+            # Máscaras booleanas: a média no grupo é a fração de linhas (NaN conta como fora)
+            dados[f"abaixo{i}"] = valores < li
+            dados[f"dentro{i}"] = (valores >= li) & (valores <= ls)
+            dados[f"acima{i}"] = valores > ls
+            agregacoes[f"% Abaixo da especificação{sufixo}"] = (f"abaixo{i}", "mean")
+            agregacoes[f"% Dentro da especificação{sufixo}"] = (f"dentro{i}", "mean")
+            agregacoes[f"% Acima da especificação{sufixo}"] = (f"acima{i}", "mean")
+
+    resumo = pd.DataFrame(dados).groupby("Hora", sort=True).agg(**agregacoes).reset_index(drop=True)
+    colunas_percentuais = [col for col in resumo.columns if col.startswith("% ")]
+    resumo[colunas_percentuais] = resumo[colunas_percentuais] * 100
+    resumo.insert(0, "Intervalo", [f"{i+1}ª Hora" for i in range(len(resumo))])
+    return resumo.fillna(0)
+
+
+def separar_resumos_por_canal(combinado, canais):
+    """
+    Separa o resumo por hora de vários canais em um DataFrame por canal
+    (chave: `canal.nome`), com as colunas de sempre.
+    """
+    resumos = {}
+    for canal in canais:
+        sufixo = f" ({canal.nome})" if len(canais) > 1 else ""
+        percentuais = [f"% {faixa} da especificação" for faixa in ("Abaixo", "Dentro", "Acima")]
+        colunas = (["Intervalo"] + [f"{canal.nome}_{e}" for e in ("Mínima", "Média", "Máxima")]
+                   + [p + sufixo for p in percentuais])
+        resumo = combinado[colunas].copy()
+        resumo.columns = colunas[:4] + percentuais
+        resumos[canal.nome] = resumo
+    return resumos
+
+
+def calcular_resumos_por_hora(df, canais):
+    """Resumo por hora de todos os canais numa única agregação, um DataFrame por canal."""
+    combinado = calcular_resumo_por_hora(df, [(c.coluna, c.nome, c.li, c.ls) for c in canais])
+    return separar_resumos_por_canal(combinado, canais)
+
+
+@instrumentar()
+def calcular_resumos_gerais(df, canais, estatisticas=True, percentuais=True):
+    """
+    Resumo do arquivo inteiro (mínima, média, máxima e percentuais em relação
+    à especificação) de todos os canais de uma vez. Retorna um DataFrame de
+    uma linha por canal (chave: `canal.nome`). Como em
+    `calcular_resumo_por_hora`, cada parte pode ser calculada separadamente.
+    """
+    valores = df[[c.coluna for c in canais]]
+    partes = {}
+    if estatisticas:
+        partes.update({"Mínima": valores.min(), "Média": valores.mean(), "Máxima": valores.max()})
+    if percentuais:
+        li = pd.Series([c.li for c in canais], index=valores.columns, dtype=float)
+        ls = pd.Series([c.ls for c in canais], index=valores.columns, dtype=float)
+        total = valores.count()
+        partes.update({
+            "%Abaixo da especificação": valores.lt(li, axis=1).sum() / total * 100,
+            "%Dentro da especificação": (valores.ge(li, axis=1) & valores.le(ls, axis=1)).sum() / total * 100,
+            "%Acima da especificação": valores.gt(ls, axis=1).sum() / total * 100,
+        })
+
+    resumos = {}
+    for canal in canais:
+        resumos[canal.nome] = pd.DataFrame({
+            (nome if nome.startswith("%") else f"{canal.simbolo} {nome}"): [serie[canal.coluna]]
+            for nome, serie in partes.items()
+        })
+    return resumos
+
+
+@instrumentar()
+def calcular_excursoes(df, canais):
+    """
+    Excursões fora de LI/LS, percentuais ponderados pelo tempo e TCM de cada
+    canal. Retorna (resumo, excursões); ver `excursoes.analisar_excursoes`.
+    """
+    return analisar_excursoes(df, canais)
+
+
+def formatar_colunas_numericas(df, formato="{:.2f}"):
+    """Retorna uma cópia com as colunas numéricas convertidas em texto formatado."""
+    formatado = df.copy()
+    for coluna in formatado.select_dtypes("number").columns:
+        formatado[coluna] = formatado[coluna].map(formato.format)
+    return formatado
+
+
+def desenhar_grafico_por_hora(resumo, canal):
+    """Desenha mínima/média/máxima por hora de um canal, sem as linhas de especificação."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    ax.plot(resumo["Intervalo"], resumo[f"{canal.nome}_Mínima"], marker="o", label=f"{canal.abreviacao} Mínima", color="blue")
+    ax.plot(resumo["Intervalo"], resumo[f"{canal.nome}_Média"], marker="o", label=f"{canal.abreviacao} Média", color="orange")
+    ax.plot(resumo["Intervalo"], resumo[f"{canal.nome}_Máxima"], marker="o", label=f"{canal.abreviacao} Máxima", color="green")
+    ax.tick_params(axis='x', labelrotation=45, labelsize=7)  
+    if len(resumo) > 20:
+        # A cada 2 intervalos; em viagens longas o passo cresce para caber ~24 rótulos
+        ax.set_xticks(range(0, len(resumo), max(2, int(np.ceil(len(resumo) / 24)))))
+    
+    ax.set_xlabel("Intervalo")
+    ax.set_ylabel(canal.rotulo_eixo)
+    ax.grid(True)
+    return fig
+
+
+def aplicar_limites_grafico_por_hora(fig, resumo, canal):
+    """Acrescenta as linhas LI/LS, a escala do eixo Y e a legenda ao gráfico por hora."""
+    ax = fig.axes[0]
+
+    # Define a escala do eixo Y
+    if canal.escala_fixa:
+        ax.set_yticks(range(*canal.escala_fixa))
+    else:
+        minimo = min(resumo[f"{canal.nome}_Mínima"].min(), canal.li) - 1
+        maximo = max(resumo[f"{canal.nome}_Máxima"].max(), canal.ls) + 1
+        ax.set_yticks(range(int(minimo), int(maximo) + 1, 2))  # Ajuste o intervalo conforme necessário
+
+    ax.axhline(y=canal.li, color="red", linestyle="--", label=f"LI - Especificação ({canal.li:.2f}{canal.unidade})")
+    ax.axhline(y=canal.ls, color="green", linestyle="--", label=f"LS - Especificação ({canal.ls:.2f}{canal.unidade})")
+    ax.legend()
+    return fig
+
+
+def criar_grafico_por_hora(resumo, canal):
+    """Cria o gráfico de mínima/média/máxima por hora de um canal."""
+    fig = aplicar_limites_grafico_por_hora(desenhar_grafico_por_hora(resumo, canal), resumo, canal)
+    fig.tight_layout()
+    return fig
+
+
+def _plotar_serie_reduzida(ax, tempos, valores, baldes, marker, **kwargs):
+    """Plota a série reduzida ao mínimo/máximo de cada balde; os marcadores só ficam se nada foi descartado."""
+    tempos, valores, reduzida = reduzir_serie(tempos, valores, baldes)
+    ax.plot(tempos, valores, marker=None if reduzida else marker, **kwargs)
+
+
+def desenhar_grafico_ao_longo_do_tempo(df, canal):
+    """
+    Desenha um canal (e a luz, se houver) ao longo do tempo, sem as linhas de
+    especificação. Cada série é reduzida a no máximo dois pontos por pixel
+    de largura da figura (mínimo e máximo), mantendo picos e excursões.
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+    baldes = int(fig.get_figwidth() * fig.dpi)
+    tempos = df["Date Time"].to_numpy()
+    _plotar_serie_reduzida(ax1, tempos, df[canal.coluna], baldes, marker="o", label=canal.coluna, color=canal.cor)
+    ax1.set_xlabel("Data e Hora")
+    ax1.set_ylabel(canal.coluna, color=canal.cor)
+    ax1.tick_params(axis="y", labelcolor=canal.cor)
+    if COLUNA_LUZ in df.columns:
+        ax2 = ax1.twinx()
+        _plotar_serie_reduzida(ax2, tempos, df[COLUNA_LUZ], baldes, marker="s", label=COLUNA_LUZ, color="orange")
+        ax2.set_ylabel(COLUNA_LUZ, color="orange")
+        ax2.tick_params(axis="y", labelcolor="orange")
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter("%d-%m %H:%M"))
+    # Rótulos a cada 2 horas; em viagens longas o intervalo cresce para caber ~24 rótulos
+    horas = (tempos.max() - tempos.min()) / np.timedelta64(1, "h") if len(tempos) else 0
+    ax1.xaxis.set_major_locator(mdates.HourLocator(interval=max(2, int(np.ceil(horas / 24)))))
+    ax1.tick_params(axis='x', labelrotation=45, labelsize=8)
+    return fig
+
+
+def aplicar_limites_grafico_ao_longo_do_tempo(fig, canal):
+    """Acrescenta as linhas LI/LS e a legenda (incluindo a luz) ao gráfico ao longo do tempo."""
+    ax1 = fig.axes[0]
+    ax1.axhline(y=canal.li, color="red", linestyle="--", label=f"LI - Especificação ({canal.li:.2f}{canal.unidade})")
+    ax1.axhline(y=canal.ls, color="green", linestyle="--", label=f"LS - Especificação ({canal.ls:.2f}{canal.unidade})")
+    lines, labels = [], []
+    for ax in fig.axes:
+        linhas_eixo, rotulos_eixo = ax.get_legend_handles_labels()
+        lines, labels = lines + linhas_eixo, labels + rotulos_eixo
+    ax1.legend(lines, labels, loc="upper left")
+    return fig
+
+
+def criar_grafico_ao_longo_do_tempo(df, canal):
+    """Cria o gráfico de um canal (e da luz, se houver) ao longo do tempo."""
+    fig = aplicar_limites_grafico_ao_longo_do_tempo(desenhar_grafico_ao_longo_do_tempo(df, canal), canal)
+    fig.tight_layout()
+    return fig
+
+
+@instrumentar()
+def criar_graficos(df, resumos, canais):
+    """
+    Cria os gráficos de todos os canais. Retorna {canal.nome: (figura por
+    hora, figura ao longo do tempo)}.
+    """
+    return {
+        canal.nome: (criar_grafico_por_hora(resumos[canal.nome], canal),
+                     criar_grafico_ao_longo_do_tempo(df, canal))
+        for canal in canais
+    }
+
+
+@instrumentar()
+def capturar_mapa(map_html):
+    """Captura o mapa Folium como imagem PNG (bytes), usando o pool de navegadores do processo."""
+    from captura_mapa import obter_pool_navegadores
+
+    # O navegador precisa de uma URL; o HTML vai para um diretório temporário exclusivo desta captura
+    with tempfile.TemporaryDirectory() as diretorio:
+        map_file = os.path.join(diretorio, "mapa.html")
+        with open(map_file, "w", encoding="utf-8") as f:
+            f.write(map_html)
+        return obter_pool_navegadores().capturar(f"file:///{os.path.abspath(map_file)}")
+
+
+@instrumentar()
+def capturar_mapa_estatico(df, usar_tiles=False):
+    """Gera a imagem do mapa (PNG em bytes) sem navegador, desenhando a rota direto em PNG."""
+    from mapa_estatico import renderizar_mapa_estatico
+
+    df = linhas_com_coordenadas(df)
+    return renderizar_mapa_estatico(df['latitude'], df['longitude'], usar_tiles=usar_tiles)
+
+
+def renderizar_figuras_pdf(figuras):
+    """
+    Renderiza os gráficos no tamanho usado no PDF. Retorna {canal.nome:
+    (PNG por hora, PNG ao longo do tempo)} em bytes.
+    """
+    return {
+        nome: (figura_para_png(fig_hora).getvalue(), png_pdf_ao_longo_do_tempo(fig_tempo))
+        for nome, (fig_hora, fig_tempo) in figuras.items()
+    }
+
+
+def png_pdf_ao_longo_do_tempo(fig):
+    """PNG do gráfico ao longo do tempo no tamanho do PDF (altera o tamanho da figura)."""
+    # Salvar gráfico reduzido
+    fig.set_size_inches(10, 3.5)  # reduzir tamanho físico do gráfico
+    fig.tight_layout()
+    return figura_para_png(fig, bbox_inches='tight').getvalue()
+
+
+def figura_para_png(fig, **kwargs):
+    """Renderiza a figura em PNG num buffer em memória."""
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", **kwargs)
+    buffer.seek(0)
+    return buffer
+
+
+def desenhar_base_grafico(tipo, canal, dados):
+    """
+    Tarefa do pool: desenha o gráfico sem as linhas LI/LS e o devolve
+    serializado (pickle), para `renderizar_grafico` aplicar os limites depois.
+    `tipo` e `dados` são como em `renderizar_grafico`.
+    """
+    import matplotlib.pyplot as plt
+
+    if tipo == "hora":
+        fig = desenhar_grafico_por_hora(dados, canal)
+    else:
+        fig = desenhar_grafico_ao_longo_do_tempo(dados, canal)
+    try:
+        return pickle.dumps(fig)
+    finally:
+        plt.close(fig)
+
+
+def renderizar_grafico(tipo, canal, dados, tela=True, base=None):
+    """
+    Renderiza um gráfico como tarefa independente (pode rodar num processo do
+    pool): desenha a figura com as linhas LI/LS, gera o PNG da tela (como o
+    `st.pyplot`) e o do PDF e fecha a figura. `tipo` é "hora" (`dados` = resumo
+    por hora) ou "tempo" (`dados` = colunas de tempo, do canal e da luz).
+    Com `base` (de `desenhar_base_grafico`) as séries não são redesenhadas:
+    só entram os limites, e no "tempo" `dados` não é usado.
+    Retorna (PNG da tela, PNG do PDF); com `tela=False` o primeiro é None.
+    """
+    import matplotlib.pyplot as plt
+
+    if base is not None:
+        fig = pickle.loads(base)
+    elif tipo == "hora":
+        fig = desenhar_grafico_por_hora(dados, canal)
+    else:
+        fig = desenhar_grafico_ao_longo_do_tempo(dados, canal)
+    try:
+        if tipo == "hora":
+            aplicar_limites_grafico_por_hora(fig, dados, canal)
+        else:
+            aplicar_limites_grafico_ao_longo_do_tempo(fig, canal)
+        fig.tight_layout()
+        png_tela = figura_para_png(fig, dpi=DPI_TELA, bbox_inches="tight").getvalue() if tela else None
+        pdf = figura_para_png(fig).getvalue() if tipo == "hora" else png_pdf_ao_longo_do_tempo(fig)
+    finally:
+        # Sem isso o registro global do pyplot mantém as figuras vivas
+        plt.close(fig)
+    return png_tela, pdf
+
+
+def _executar_tarefas(funcao, tarefas, pool):
+    """Executa `funcao(*argumentos)` de cada tarefa no `pool`, ou aqui se não houver pool ou ele quebrar."""
+    if pool is not None:
+        try:
+            futuros = {chave: pool.submit(funcao, *argumentos) for chave, argumentos in tarefas.items()}
+            return {chave: futuro.result() for chave, futuro in futuros.items()}
+        except BrokenProcessPool:
+            # Um processo do pool morreu e o pool não se recupera: o próximo
+            # obter_pool_graficos cria outro, e desta vez as tarefas rodam aqui
+            _descartar_pool_graficos(pool)
+    return {chave: funcao(*argumentos) for chave, argumentos in tarefas.items()}
+
+
+def _dados_dos_graficos(df, resumos, canal):
+    """Dados de cada tipo de gráfico de um canal; só as colunas usadas vão para as tarefas."""
+    colunas_tempo = ["Date Time"] + ([COLUNA_LUZ] if COLUNA_LUZ in df.columns else [])
+    return {"hora": resumos[canal.nome], "tempo": df[colunas_tempo + [canal.coluna]]}
+
+
+@instrumentar()
+def desenhar_bases_graficos(df, resumos, canais, pool=None):
+    """
+    Desenha os gráficos de todos os canais sem as linhas LI/LS, no `pool` se
+    dado. Não dependem dos limites; retorna {(canal.nome, tipo): figura
+    serializada} para `renderizar_graficos(..., bases=...)`.
+    """
+    tarefas = {}
+    for canal in canais:
+        for tipo, dados in _dados_dos_graficos(df, resumos, canal).items():
+            tarefas[canal.nome, tipo] = (tipo, canal, dados)
+    return _executar_tarefas(desenhar_base_grafico, tarefas, pool)
+
+
+@instrumentar()
+def renderizar_graficos(df, resumos, canais, pool=None, tela=True, bases=None):
+    """
+    Renderiza os gráficos de todos os canais, uma tarefa por figura, no
+    `pool` (ProcessPoolExecutor) se dado ou no próprio processo. Só as colunas
+    usadas vão para cada tarefa. Com `bases` (de `desenhar_bases_graficos`)
+    as tarefas só aplicam LI/LS às figuras prontas e `df` não é usado: mudar
+    um limite não redesenha as séries. Retorna (imagens da tela, imagens do
+    PDF), cada uma {canal.nome: (PNG por hora, PNG ao longo do tempo)}; com
+    `tela=False` só as do PDF são geradas.
+    """
+    tarefas = {}
+    for canal in canais:
+        if bases is None:
+            for tipo, dados in _dados_dos_graficos(df, resumos, canal).items():
+                tarefas[canal.nome, tipo] = (tipo, canal, dados, tela)
+        else:
+            tarefas[canal.nome, "hora"] = ("hora", canal, resumos[canal.nome], tela, bases[canal.nome, "hora"])
+            tarefas[canal.nome, "tempo"] = ("tempo", canal, None, tela, bases[canal.nome, "tempo"])
+    resultados = _executar_tarefas(renderizar_grafico, tarefas, pool)
+
+    tela = {c.nome: (resultados[c.nome, "hora"][0], resultados[c.nome, "tempo"][0]) for c in canais}
+    pdf = {c.nome: (resultados[c.nome, "hora"][1], resultados[c.nome, "tempo"][1]) for c in canais}
+    return tela, pdf
+
+
+def _inicializar_processo_grafico():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+_principal_lock = threading.Lock()
+
+
+class _ProcessoGrafico(multiprocessing.context.SpawnProcess):
+    """
+    Processo do pool de gráficos. O "spawn" reexecuta no filho o `__main__`
+    do pai, que no Streamlit é o próprio app.py (a interface inteira); durante
+    o start o `__main__` vira um módulo vazio e o filho só importa este módulo.
+    """
+
+    def start(self):
+        with _principal_lock:
+            principal = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                super().start()
+            finally:
+                sys.modules["__main__"] = principal
+
+
+class _ContextoGraficos(multiprocessing.context.SpawnContext):
+    Process = _ProcessoGrafico
+
+
+_pool_graficos = None
+_pool_graficos_lock = threading.Lock()
+
+
+def obter_pool_graficos():
+    """
+    Pool de processos dos gráficos, criado no primeiro uso e compartilhado
+    pelo processo. Usa "spawn", que não copia as threads do servidor, sem
+    reexecutar o script principal nos processos.
+    """
+    global _pool_graficos
+    with _pool_graficos_lock:
+        if _pool_graficos is None:
+            _pool_graficos = ProcessPoolExecutor(
+                max_workers=PROCESSOS_GRAFICOS_PADRAO, mp_context=_ContextoGraficos(),
+                initializer=_inicializar_processo_grafico,
+            )
+        return _pool_graficos
+
+
+def _descartar_pool_graficos(pool):
+    """Encerra um pool quebrado; se for o do processo, o próximo uso cria outro."""
+    global _pool_graficos
+    with _pool_graficos_lock:
+        if _pool_graficos is pool:
+            _pool_graficos = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def medir_etapa(tempos, etapa):
+    """Soma em `tempos[etapa]` os segundos gastos dentro do bloco."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos[etapa] = tempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def gerar_relatorio(arquivo, limites, observacoes="", config_enderecos=None,
+                    apendice=(apendice_pdf.COMPLETO, None), usar_tiles=False):
+    """
+    Gera o relatório de um arquivo de ponta a ponta, com o mapa estático.
+    `limites` mapeia o tipo do canal para (li, ls); `config_enderecos` é
+    (método dos waypoints ou None para todos os pontos, parâmetro, raio em
+    metros), ou None para não buscar endereços.
+    Retorna (PDF em bytes, número de linhas, segundos gastos por etapa).
+    """
+    from relatorio_pdf import criar_pdf
+
+    tempos = {}
+    with medir_etapa(tempos, "carga"):
+        df = carregar_dados(arquivo)
+
+    if config_enderecos is not None:
+        metodo, parametro, raio_metros = config_enderecos
+        with medir_etapa(tempos, "enderecos"):
+            if metodo:
+                df = adicionar_enderecos_por_waypoints(df, metodo, parametro, raio_metros=raio_metros)
+            else:
+                df = adicionar_enderecos_ao_dataframe(df, raio_metros=raio_metros)
+
+    with medir_etapa(tempos, "resumos"):
+        canais = detectar_canais(df.columns, limites)
+        resumos = calcular_resumos_por_hora(df, canais)
+        resumos_gerais = calcular_resumos_gerais(df, canais)
+        excursoes = calcular_excursoes(df, canais)
+
+    with medir_etapa(tempos, "graficos"):
+        _, imagens_figuras = renderizar_graficos(df, resumos, canais, tela=False)
+
+    with medir_etapa(tempos, "mapa"):
+        map_image = capturar_mapa_estatico(df, usar_tiles=usar_tiles)
+
+    with medir_etapa(tempos, "pdf"):
+        pdf_bytes = criar_pdf(df, canais, resumos, resumos_gerais, None, None, map_image, observacoes,
+                              imagens_figuras=imagens_figuras, apendice=apendice, excursoes=excursoes)
+    return pdf_bytes, len(df), tempos
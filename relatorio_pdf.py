@@ -0,0 +1,536 @@
+"""
+Montagem do relatório PDF (FPDF): capa, mapa, gráficos, tabelas por hora,
+resumos gerais e o apêndice de dados brutos.
+
+Fica num módulo à parte para que o FPDF só seja carregado quando um PDF
+(ou a estimativa do apêndice) é de fato pedido.
+"""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+import trajetoria
+from canais import canal_por_coluna, COLUNA_LUZ
+import apendice as apendice_pdf
+from excursoes import formatar_duracao, ENERGIA_ATIVACAO_KJ_MOL, MAX_EXCURSOES_PDF
+from instrumentacao import instrumentar
+from relatorio import formatar_colunas_numericas, renderizar_figuras_pdf
+
+
+def adicionar_resumo_geral_pdf(pdf, canal, resumo_df, max_page_width):
+    col_widths = [260 / len(resumo_df.columns)] * len(resumo_df.columns)
+    pdf.set_font("Arial", "B", 10)
+    pdf.ln(5)
+    pdf.cell(0, 10, f"Tabela de resumo de dados de {canal.titulo}", ln=True, align="C")
+
+    pdf.set_font("Arial", "B", 8)
+    for i, col in enumerate(resumo_df.columns):
+        pdf.cell(col_widths[i], 8, col, border=1, align="C")
+    pdf.ln()
+
+    pdf.set_font("Arial", "", 8)
+    for i, val in enumerate(resumo_df.iloc[0]):
+        val_str = f"{val:.2f}" if isinstance(val, (float, int)) else str(val)
+        pdf.cell(col_widths[i], 8, val_str, border=1, align="C")
+    pdf.ln(10)
+
+
+class RelatorioPDF(FPDF):
+    """FPDF com a numeração "i de N" desenhada no rodapé de cada página."""
+
+    def __init__(self, *args, numerar_paginas=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.numerar_paginas = numerar_paginas
+        # "{nb}" é substituído pelo total de páginas quando o PDF é gerado
+        self.alias_nb_pages()
+
+    def footer(self):
+        if not self.numerar_paginas:
+            return
+        self.set_y(-9)
+        self.set_font("Helvetica", "", 10)
+        self.set_text_color(0, 0, 0)
+        self.cell(0, 4, f"{self.page_no()} de {{nb}}", align="C")
+
+
+@instrumentar()
+def criar_pdf(df, canais, resumos, resumos_gerais, figuras, marker_locations, map_image,
+              observacoes, numerar_paginas=True, imagens_figuras=None,
+              apendice=(apendice_pdf.COMPLETO, None), arquivo_anexo=None, excursoes=None):
+    """
+    Monta o relatório e retorna o PDF em bytes. Para cada canal entram o
+    gráfico e a tabela por hora e o gráfico ao longo do tempo com o resumo
+    geral. A numeração de páginas sai no rodapé na mesma passagem; com
+    `numerar_paginas=False` ela pode ser feita depois por `add_page_numbers`.
+    `imagens_figuras` (de `renderizar_figuras_pdf`) evita renderizar as
+    figuras de novo; nesse caso `figuras` não é usado. `apendice` escolhe
+    as linhas de dados brutos do final (ver o módulo `apendice`), e
+    `arquivo_anexo` reaproveita o arquivo já gerado para o modo anexo.
+    `excursoes` (de `calcular_excursoes`) acrescenta a seção de excursões.
+    """
+    if imagens_figuras is None:
+        imagens_figuras = renderizar_figuras_pdf(figuras)
+
+    pdf = RelatorioPDF(orientation='L', unit='mm', format='A4', numerar_paginas=numerar_paginas)
+    pdf.set_margins(left=10, top=10, right=10)  # 1cm = 10mm
+    pdf.set_auto_page_break(auto=True, margin=10)
+    max_page_width = 277  # 297mm (A4 horizontal) - 2x10mm margem
+
+    # Página 1 – Capa
+    pdf.add_page(orientation='L')
+    pdf.set_font("Arial", "B", 28)
+    pdf.set_xy(10, (pdf.h - 20) / 2 - 20)
+    pdf.multi_cell(0, 20, "Dados brutos do teste de Distribuição térmica em Rota", align="C")
+
+    if observacoes:
+        pdf.ln(10)
+        pdf.set_font("Arial", "", 12)
+        pdf.multi_cell(0, 10, "Observações: " + observacoes, align="C")
+
+    # Página 2 – Mapa
+    pdf.add_page(orientation='L')
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Mapa do trajeto da rota", ln=True, align="C")
+    pdf.image(BytesIO(map_image), x=10, y=20, w=260)
+
+    # Gráfico e tabela por hora de cada canal
+    for canal in canais:
+        png_hora, _ = imagens_figuras[canal.nome]
+        resumo = resumos[canal.nome]
+
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 16)
+        pdf.cell(0, 10, f"Gráfico de {canal.titulo_plural} por Hora", ln=True, align="C")
+        pdf.image(BytesIO(png_hora), x=10, y=20, w=260)
+
+        pdf.add_page()
+        resumo_pdf = formatar_colunas_numericas(resumo)
+        draw_table(pdf, resumo_pdf.columns.tolist(), resumo_pdf.values.tolist(),
+                   f"Resumo de {canal.titulo_plural} por Hora", max_page_width,
+                   canais=[canal], row_height=8, allow_header_break=True,
+                   is_summary_table=True, numeric_data=resumo.values.tolist())
+
+    # Gráfico ao longo do tempo com a tabela de resumo geral de cada canal
+    for canal in canais:
+        _, png_tempo = imagens_figuras[canal.nome]
+
+        pdf.add_page(orientation='L')
+        pdf.set_font("Arial", "B", 16)
+        titulo_luz = " e Luz" if COLUNA_LUZ in df.columns else ""
+        pdf.cell(0, 10, f"Gráfico de {canal.titulo}{titulo_luz} ao Longo do Tempo", ln=True, align="C")
+
+        # Inserir imagem e deixar espaço
+        pdf.image(BytesIO(png_tempo), x=10, y=20, w=260, h=90)
+
+        # Espaço depois do gráfico
+        pdf.set_y(120)
+
+        # Inserir tabela na mesma página
+        adicionar_resumo_geral_pdf(pdf, canal, resumos_gerais[canal.nome], max_page_width)
+
+    if excursoes is not None:
+        pdf.add_page()
+        adicionar_excursoes_pdf(pdf, *excursoes, canais, max_page_width)
+
+    pdf.add_page()
+    adicionar_apendice_pdf(pdf, df.drop(columns=["Hora"]), canais, apendice, max_page_width, arquivo_anexo)
+
+    return bytes(pdf.output())
+
+
+def adicionar_excursoes_pdf(pdf, resumo, excursoes, canais, max_page_width):
+    """
+    Seção de excursões: tabela com os percentuais ponderados pelo tempo, o
+    tempo fora e a TCM de cada canal, seguida da lista das excursões (as
+    `MAX_EXCURSOES_PDF` mais longas, em ordem de início).
+    """
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Excursões fora da especificação", ln=True, align="C")
+
+    cabecalho = list(resumo.columns)
+    col_widths = [max_page_width / len(cabecalho)] * len(cabecalho)
+    pdf.set_font("Arial", "B", 8)
+    for largura, coluna in zip(col_widths, cabecalho):
+        pdf.cell(largura, 8, coluna, border=1, align="C")
+    pdf.ln()
+    pdf.set_font("Arial", "", 8)
+    for linha in resumo.itertuples(index=False):
+        for largura, valor in zip(col_widths, linha):
+            if isinstance(valor, pd.Timedelta):
+                texto = formatar_duracao(valor)
+            elif isinstance(valor, (int, np.integer)):
+                texto = str(valor)
+            elif isinstance(valor, (float, np.floating)):
+                texto = "-" if np.isnan(valor) else f"{valor:.2f}"
+            else:
+                texto = str(valor)
+            pdf.cell(largura, 8, texto, border=1, align="C")
+        pdf.ln()
+
+    pdf.set_font("Arial", "", 8)
+    pdf.multi_cell(0, 5, "Percentuais ponderados pelo tempo de cada leitura (até a leitura seguinte). "
+                         "TCM: temperatura cinética média, com energia de ativação de "
+                         f"{ENERGIA_ATIVACAO_KJ_MOL:g} kJ/mol.")
+    pdf.ln(5)
+
+    if len(excursoes) == 0:
+        pdf.set_font("Arial", "", 10)
+        pdf.cell(0, 8, "Nenhuma excursão fora da especificação.", ln=True, align="C")
+        return
+
+    titulo = f"Excursões ({len(excursoes)})"
+    if len(excursoes) > MAX_EXCURSOES_PDF:
+        titulo = f"As {MAX_EXCURSOES_PDF} excursões mais longas (de {len(excursoes)})"
+        excursoes = excursoes.nlargest(MAX_EXCURSOES_PDF, "Duração").sort_index()
+
+    tabela = pd.DataFrame({
+        "Canal": excursoes["Canal"],
+        "Tipo": excursoes["Tipo"],
+        "Início": excursoes["Início"].dt.strftime("%d/%m/%Y %H:%M:%S"),
+        "Fim": excursoes["Fim"].dt.strftime("%d/%m/%Y %H:%M:%S"),
+        "Duração": excursoes["Duração"].map(formatar_duracao),
+        "Pico": excursoes["Pico"],
+        "Momento do pico": excursoes["Momento do pico"].dt.strftime("%d/%m/%Y %H:%M:%S"),
+    })
+    if "latitude" in excursoes.columns and "longitude" in excursoes.columns:
+        tabela["Coordenadas do pico"] = (excursoes["latitude"].map("{:.6f}".format) + ", "
+                                         + excursoes["longitude"].map("{:.6f}".format))
+    if "endereco" in excursoes.columns:
+        tabela["endereco"] = excursoes["endereco"].astype(str)
+    draw_table(pdf, tabela.columns.tolist(), tabela.values.tolist(), titulo, max_page_width,
+               canais=canais, row_height=8)
+
+
+def adicionar_apendice_pdf(pdf, df_pdf, canais, apendice, max_page_width, arquivo_anexo=None):
+    """
+    Apêndice de dados brutos conforme `apendice` (modo, parâmetro). No modo
+    anexo, os dados vão como arquivo anexado ao PDF e a página só indica isso.
+    """
+    modo, parametro = apendice
+    if modo == apendice_pdf.ANEXO:
+        dados, nome_arquivo, tipo = arquivo_anexo or apendice_pdf.arquivo_dados_brutos(df_pdf, parametro)
+        pdf.embed_file(bytes=dados, basename=nome_arquivo, mime_type=tipo, compress=True,
+                       desc=f"Dados brutos ({len(df_pdf)} linhas)")
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, "Dados brutos", ln=True, align="C")
+        pdf.set_font("Arial", "", 10)
+        pdf.multi_cell(0, 6, f"As {len(df_pdf)} linhas do arquivo estão no anexo \"{nome_arquivo}\" "
+                             "deste PDF (painel de anexos do leitor de PDF).", align="C")
+        return
+
+    linhas = apendice_pdf.selecionar_linhas(df_pdf, canais, apendice)
+    titulo = apendice_pdf.descrever_apendice(apendice, len(linhas), len(df_pdf))
+    if len(linhas) == 0:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, titulo, ln=True, align="C")
+        pdf.set_font("Arial", "", 10)
+        pdf.cell(0, 8, "Nenhuma linha fora da especificação.", ln=True, align="C")
+        return
+    draw_table(pdf, linhas.columns.tolist(), linhas.values.tolist(), titulo,
+               max_page_width, canais=canais, row_height=8)
+
+
+# Linhas desenhadas para estimar o tamanho do apêndice
+AMOSTRA_ESTIMATIVA_APENDICE = 400
+
+
+@instrumentar()
+def estimar_apendice(df, canais, apendice):
+    """
+    Prevê o apêndice sem gerá-lo: desenha uma amostra das linhas selecionadas
+    e extrapola páginas e bytes. Retorna {"linhas", "paginas", "bytes"}; no
+    modo anexo, "bytes" é o tamanho do arquivo anexado.
+    """
+    df_pdf = df.drop(columns=["Hora"])
+    modo, parametro = apendice
+    if modo == apendice_pdf.ANEXO:
+        amostra = df_pdf.iloc[trajetoria.indices_uniformes(len(df_pdf), 2000)]
+        dados, _, _ = apendice_pdf.arquivo_dados_brutos(amostra, parametro)
+        return {"linhas": len(df_pdf), "paginas": 1,
+                "bytes": int(len(dados) * len(df_pdf) / max(len(amostra), 1))}
+
+    linhas = apendice_pdf.selecionar_linhas(df_pdf, canais, apendice)
+    if len(linhas) == 0:
+        return {"linhas": 0, "paginas": 1, "bytes": 0}
+    amostra = linhas.iloc[trajetoria.indices_uniformes(len(linhas), AMOSTRA_ESTIMATIVA_APENDICE)]
+    titulo = apendice_pdf.descrever_apendice(apendice, len(linhas), len(df_pdf))
+
+    def gerar(tabela):
+        pdf = RelatorioPDF(orientation='L', unit='mm', format='A4')
+        pdf.set_margins(left=10, top=10, right=10)
+        pdf.set_auto_page_break(auto=True, margin=10)
+        pdf.add_page()
+        if tabela is not None:
+            draw_table(pdf, tabela.columns.tolist(), tabela.values.tolist(), titulo, 277,
+                       canais=canais, row_height=8)
+        # Páginas ocupadas, com a fração usada da última
+        usado = (pdf.get_y() - pdf.t_margin) / (pdf.h - pdf.b_margin - 15 - pdf.t_margin)
+        return pdf.page - 1 + usado, len(pdf.output())
+
+    paginas, tamanho = gerar(amostra)
+    _, tamanho_vazio = gerar(None)
+    escala = len(linhas) / len(amostra)
+    return {"linhas": len(linhas), "paginas": int(np.ceil(paginas * escala)),
+            "bytes": int((tamanho - tamanho_vazio) * escala)}
+
+
+@instrumentar()
+def add_page_numbers(pdf_bytes):
+    """
+    Carimba "i de N" no rodapé de cada página e retorna o novo PDF em bytes.
+    Etapa opcional: criar_pdf já numera as páginas no rodapé.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+    from reportlab.lib.pagesizes import landscape, A4
+    from reportlab.pdfgen import canvas
+
+    existing_pdf = PdfReader(BytesIO(pdf_bytes))
+    output = PdfWriter()
+
+    for i, page in enumerate(existing_pdf.pages):
+        packet = BytesIO()
+        can = canvas.Canvas(packet, pagesize=landscape(A4))
+
+        # Centralizar horizontalmente com base na largura da página
+        page_width = landscape(A4)[0]
+        text = f"{i + 1} de {len(existing_pdf.pages)}"
+        text_width = can.stringWidth(text, "Helvetica", 10)
+        x = (page_width - text_width) / 2  # Centralizado
+        y = 15  # Distância do rodapé
+
+        can.setFont("Helvetica", 10)
+        can.drawString(x, y, text)
+        can.save()
+        packet.seek(0)
+
+        overlay = PdfReader(packet)
+        page.merge_page(overlay.pages[0])
+        output.add_page(page)
+
+    resultado = BytesIO()
+    output.write(resultado)
+    return resultado.getvalue()
+
+
+def formatar_numero_pdf(valor):
+    """
+    Formata números para exibição no PDF com exatamente 2 casas decimais.
+    """
+    try:
+        if isinstance(valor, (int, float)):
+            return f"{float(valor):.2f}"
+        else:
+            # Tenta converter string para float
+            num = float(str(valor).replace(",", "."))
+            return f"{num:.2f}"
+    except (ValueError, TypeError):
+        return str(valor)
+
+
+# Cor do texto por código: 0 dentro da especificação, 1 acima, 2 abaixo
+CORES_TEXTO_PDF = ((0, 0, 0), (255, 0, 0), (0, 0, 255))
+
+
+def texto_latin1(textos):
+    """Codificação segura para latin-1 de uma coluna inteira, numa única chamada."""
+    juntos = "\x00".join(textos)
+    try:
+        juntos.encode('latin-1')
+        return list(textos)
+    except UnicodeEncodeError:
+        return juntos.encode('latin-1', 'replace').decode('latin-1').split("\x00")
+
+
+def preparar_coluna_pdf(valores, canal=None, valores_cor=None):
+    """
+    Formata uma coluna inteira para o PDF de uma vez: números com 2 casas
+    decimais (centralizados), o restante como texto (à esquerda), já em
+    latin-1. Nas colunas de canal, calcula também o código de cor de cada
+    célula a partir de `valores_cor` (ou dos próprios valores).
+    Retorna (textos, alinhamentos, códigos de cor).
+    """
+    texto = pd.Series(valores, dtype=object).astype(str)
+    numeros = pd.to_numeric(texto.str.replace(",", ".", regex=False), errors="coerce")
+    numerico = (numeros.notna() | (texto.str.lower() == "nan")).to_numpy()
+
+    textos = np.where(numerico, numeros.map("{:.2f}".format).to_numpy(dtype=object), texto.to_numpy(dtype=object))
+    alinhamentos = np.where(numerico, "C", "L")
+
+    cores = np.zeros(len(texto), dtype=np.int8)
+    if canal is not None and canal.li is not None and canal.ls is not None:
+        v = numeros.to_numpy(dtype=float) if valores_cor is None else np.asarray(valores_cor, dtype=float)
+        cores = np.select([v > canal.ls, v < canal.li], [1, 2], 0).astype(np.int8)
+
+    return texto_latin1(textos.tolist()), alinhamentos.tolist(), cores.tolist()
+
+
+def larguras_textos(pdf, textos):
+    """
+    Largura (mm) de cada texto na fonte atual, somando a tabela de larguras
+    por caractere da fonte sobre a coluna inteira de uma vez. Os textos já
+    devem estar em latin-1 (ver `texto_latin1`).
+    """
+    if not len(textos):
+        return np.zeros(0)
+    larguras_fonte = getattr(pdf.current_font, "cw", None)
+    if not isinstance(larguras_fonte, dict):
+        # Fonte TrueType: mede cada texto distinto uma vez
+        unicos, posicoes = np.unique(np.asarray(textos, dtype=object).astype(str), return_inverse=True)
+        return np.array([pdf.get_string_width(t) for t in unicos])[posicoes]
+
+    tabela = np.array([larguras_fonte.get(chr(i), 0) for i in range(256)], dtype=float)
+    tabela *= pdf.font_size_pt * 0.001 / pdf.k
+    caracteres = np.frombuffer("".join(textos).encode('latin-1'), dtype=np.uint8)
+    acumulado = np.concatenate(([0.0], np.cumsum(tabela[caracteres])))
+    fins = np.cumsum(np.fromiter((len(t) for t in textos), dtype=np.int64, count=len(textos)))
+    inicios = np.concatenate(([0], fins[:-1]))
+    return acumulado[fins] - acumulado[inicios]
+
+
+def quebrar_texto_pdf(pdf, texto, largura):
+    """Quebra o texto em linhas que cabem na largura (palavra a palavra, como o multi_cell)."""
+    linhas, atual = [], ""
+    for palavra in texto.split():
+        candidata = f"{atual} {palavra}" if atual else palavra
+        if atual and pdf.get_string_width(candidata) > largura:
+            linhas.append(atual)
+            atual = palavra
+        else:
+            atual = candidata
+    linhas.append(atual)
+    return linhas
+
+
+def calcular_larguras_colunas_pdf(pdf, headers, colunas_texto, max_page_width):
+    """
+    Calcula a largura das colunas: o endereço recebe 40% da página e as
+    demais o maior texto mais uma margem.
+    """
+    col_widths = []
+    for header, textos in zip(headers, colunas_texto):
+        if header.strip().lower() == "endereco":
+            # Coluna de endereço recebe 40% da largura da página
+            col_widths.append(max_page_width * 0.40)
+        else:
+            larguras = larguras_textos(pdf, textos)
+            col_widths.append(max(pdf.get_string_width(str(header)), larguras.max(initial=0.0)) + 8)
+    
+    # Ajusta proporcionalmente se necessário
+    total_width = sum(col_widths)
+    if total_width > max_page_width:
+        ratio = max_page_width / total_width
+        col_widths = [w * ratio for w in col_widths]
+    
+    return [round(w, 2) for w in col_widths]
+
+
+def draw_table(pdf, headers, data, title, max_page_width,
+               canais=None, row_height=8, allow_header_break=True,
+               is_summary_table=False, numeric_data=None):
+    """
+    Desenha uma tabela com cabeçalho repetido a cada página. Formatação,
+    cores, larguras, alturas das linhas e a posição de cada texto são
+    calculadas por coluna antes do desenho. O corpo é desenhado com texto
+    posicionado e a grade com linhas, sem passar pelo `cell` do FPDF.
+    """
+    # Colunas coloridas conforme os limites de cada canal
+    canais_por_coluna = canal_por_coluna(canais or [])
+    header_names = [str(h).strip().lower() for h in headers]
+    colunas = list(zip(*data)) if len(data) else [[] for _ in headers]
+    colunas_cor = list(zip(*numeric_data)) if is_summary_table and numeric_data is not None and len(data) else None
+
+    textos, alinhamentos, cores = [], [], []
+    for col_idx, valores in enumerate(colunas):
+        canal = canais_por_coluna.get(header_names[col_idx])
+        valores_cor = colunas_cor[col_idx] if colunas_cor is not None and canal is not None else None
+        coluna_textos, coluna_alinhamentos, coluna_cores = preparar_coluna_pdf(valores, canal, valores_cor)
+        textos.append(coluna_textos)
+        alinhamentos.append(coluna_alinhamentos)
+        cores.append(coluna_cores)
+
+    # Calcula larguras das colunas (pelo texto original das células) e a largura de cada texto
+    pdf.set_font("Arial", "", 8)
+    textos_originais = [texto_latin1([str(valor) for valor in valores]) for valores in colunas]
+    col_widths = calcular_larguras_colunas_pdf(pdf, headers, textos_originais, max_page_width)
+    larguras = [larguras_textos(pdf, coluna) for coluna in textos]
+
+    # Alturas das linhas: mais altas quando algum endereço não cabe na coluna
+    colunas_endereco = [i for i, nome in enumerate(header_names) if nome == "endereco"]
+    quebra = np.zeros((len(data), len(headers)), dtype=bool)
+    for col_idx in colunas_endereco:
+        quebra[:, col_idx] = larguras[col_idx] > col_widths[col_idx]
+    # CORREÇÃO: Define altura baseada na necessidade de quebra - ALTURA REDUZIDA
+    alturas = np.where(quebra.any(axis=1), row_height * 1.8, row_height)
+
+    # Posição x de cada texto: centralizado (números) ou com a margem da célula
+    bordas_x = (pdf.l_margin + np.concatenate(([0.0], np.cumsum(col_widths)))).tolist()
+    posicoes_x = []
+    for col_idx, coluna_larguras in enumerate(larguras):
+        centralizado = np.asarray(alinhamentos[col_idx]) == "C"
+        if col_idx in colunas_endereco:
+            centralizado[:] = False
+        deslocamento = np.where(centralizado, (col_widths[col_idx] - coluna_larguras) / 2, pdf.c_margin)
+        posicoes_x.append((bordas_x[col_idx] + deslocamento).tolist())
+    # Linha de base do texto centralizado na altura da linha, como no `cell`
+    bases = (alturas / 2 + 0.3 * pdf.font_size).tolist()
+
+    def desenhar_cabecalho():
+        pdf.set_font("Arial", "B", 8)
+        pdf.set_fill_color(200, 220, 255)
+        pdf.set_text_color(0, 0, 0)
+        for i, header in enumerate(headers):
+            pdf.cell(col_widths[i], row_height, str(header), border=1, fill=True, align="C")
+        pdf.ln()
+        pdf.set_font("Arial", "", 8)
+
+    def fechar_bloco(inicio, fim):
+        # Linhas verticais da grade no trecho desenhado nesta página
+        for x in bordas_x:
+            pdf.line(x, inicio, x, fim)
+
+    if title:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, title, ln=True, align="C")
+        pdf.ln(1)
+
+    # Cabeçalho
+    desenhar_cabecalho()
+
+    # Dados
+    limite_pagina = pdf.h - pdf.b_margin - 15
+    y = inicio_bloco = pdf.get_y()
+    cor_atual = 0
+    quebras = {}  # endereços repetidos são quebrados uma vez
+    linhas = zip(alturas.tolist(), bases, zip(*textos), zip(*posicoes_x), zip(*cores), quebra.tolist())
+    for current_row_height, base, row_textos, row_x, row_cores, row_quebra in linhas:
+        # Verifica se precisa de nova página
+        if y + current_row_height > limite_pagina:
+            fechar_bloco(inicio_bloco, y)
+            pdf.add_page()
+            if allow_header_break:
+                desenhar_cabecalho()
+            cor_atual = 0
+            y = inicio_bloco = pdf.get_y()
+
+        for col_idx, cell_value in enumerate(row_textos):
+            if row_cores[col_idx] != cor_atual:
+                cor_atual = row_cores[col_idx]
+                pdf.set_text_color(*CORES_TEXTO_PDF[cor_atual])
+            if row_quebra[col_idx]:
+                # Endereço que não cabe: quebra em linhas de 4 mm dentro da célula
+                if cell_value not in quebras:
+                    quebras[cell_value] = quebrar_texto_pdf(pdf, cell_value, col_widths[col_idx] - 2 * pdf.c_margin)
+                for i, linha in enumerate(quebras[cell_value]):
+                    pdf.text(bordas_x[col_idx] + pdf.c_margin, y + 4 * i + 2 + 0.3 * pdf.font_size, linha)
+            else:
+                pdf.text(row_x[col_idx], y + base, cell_value)
+
+        y += current_row_height
+        pdf.line(bordas_x[0], y, bordas_x[-1], y)
+
+    fechar_bloco(inicio_bloco, y)
+    # CORREÇÃO: Continua abaixo da última linha desenhada
+    pdf.set_xy(pdf.l_margin, y)
+    pdf.set_text_color(0, 0, 0)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from coordenadas import linhas_com_coordenadas, normalizar_coordenadas, normalizar_dataframe
+
+# Rota em torno de Tóquio: longitude > 90, então a troca de colunas é detectável
+LAT, LON = 35.6812, 139.7671
+
+
+def test_graus_decimais_ficam_como_estao():
+    lat, lon, validas, relatorio = normalizar_coordenadas([LAT, LAT + 0.01], [LON, LON + 0.01])
+    np.testing.assert_allclose(lat, [LAT, LAT + 0.01])
+    np.testing.assert_allclose(lon, [LON, LON + 0.01])
+    assert validas.all()
+    assert relatorio["graus_decimais"] == 2
+    assert relatorio["microdegrees"] == relatorio["invertidas"] == relatorio["fora_de_faixa"] == 0
+
+
+def test_microdegrees_por_linha():
+    lat, lon, validas, relatorio = normalizar_coordenadas([LAT, LAT * 1e6, LAT], [LON, LON * 1e6, LON * 1e6])
+    np.testing.assert_allclose(lat, [LAT, LAT, LAT])
+    np.testing.assert_allclose(lon, [LON, LON, LON])
+    assert validas.all()
+    assert relatorio["microdegrees"] == 2
+    assert relatorio["graus_decimais"] == 1
+    assert relatorio["exemplos_microdegrees"][0] == [LAT * 1e6, LON * 1e6, LAT, LON]
+
+
+def test_latitude_e_longitude_trocadas():
+    lat, lon, validas, relatorio = normalizar_coordenadas([LAT, LON, LON * 1e6], [LON, LAT, LAT * 1e6])
+    np.testing.assert_allclose(lat, [LAT, LAT, LAT])
+    np.testing.assert_allclose(lon, [LON, LON, LON])
+    assert validas.all()
+    assert relatorio["invertidas"] == 2
+    assert relatorio["microdegrees"] == 1
+
+
+def test_fora_de_faixa_e_longe_da_rota():
+    latitudes = [LAT, LAT + 0.01, 95.0, -23.5505, LAT]
+    longitudes = [LON, LON, 100.0, -46.6333, LON + 0.01]
+    lat, lon, validas, relatorio = normalizar_coordenadas(latitudes, longitudes)
+    assert validas.tolist() == [True, True, False, False, True]
+    assert relatorio["fora_de_faixa"] == 2
+    assert relatorio["distantes_da_rota"] == 1
+    assert relatorio["linhas_fora_de_faixa"] == [2, 3]
+
+
+def test_sem_linhas_validas():
+    _, _, validas, relatorio = normalizar_coordenadas([95.0, -95.0], [100.0, 100.0])
+    assert not validas.any()
+    assert relatorio["fora_de_faixa"] == 2
+    assert relatorio["distantes_da_rota"] == 0
+
+
+def _dados():
+    return pd.DataFrame({
+        "latitude": [LAT, LAT * 1e6, 95.0, LON],
+        "longitude": [LON, LON * 1e6, 100.0, LAT],
+        "Temperatura (°C)": [20.0, 21.0, 22.0, 23.0],
+    })
+
+
+def test_dataframe_mantem_linhas_invalidas_sem_coordenadas():
+    df = normalizar_dataframe(_dados())
+    assert len(df) == 4
+    assert df["Temperatura (°C)"].tolist() == [20.0, 21.0, 22.0, 23.0]
+    assert df["latitude"].isna().tolist() == [False, False, True, False]
+    assert df["longitude"].isna().tolist() == [False, False, True, False]
+    assert df.attrs["relatorio_coordenadas"]["fora_de_faixa"] == 1
+    com_coordenadas = linhas_com_coordenadas(df)
+    assert com_coordenadas["Temperatura (°C)"].tolist() == [20.0, 21.0, 23.0]
+    assert com_coordenadas.index.tolist() == [0, 1, 2]
+
+
+def test_dataframe_descarta_invalidas_se_pedido():
+    df = normalizar_dataframe(_dados(), descartar_invalidas=True)
+    assert df["Temperatura (°C)"].tolist() == [20.0, 21.0, 23.0]
+    np.testing.assert_allclose(df["latitude"], [LAT, LAT, LAT])
+
+
+def test_dataframe_sem_colunas_de_coordenadas():
+    df = pd.DataFrame({"Temperatura (°C)": [20.0]})
+    assert normalizar_dataframe(df) is df
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from canais import detectar_canais
+from excursoes import (
+    ABAIXO, ACIMA, analisar_excursoes, formatar_duracao, intervalos_continuos, pesos_tempo,
+    temperatura_cinetica_media,
+)
+
+
+def test_intervalos_continuos():
+    inicios, fins = intervalos_continuos([False, True, True, False, True])
+    assert inicios.tolist() == [1, 4]
+    assert fins.tolist() == [3, 5]
+    inicios, fins = intervalos_continuos([True, True, True])
+    assert (inicios.tolist(), fins.tolist()) == ([0], [3])
+    inicios, fins = intervalos_continuos([False, False])
+    assert (inicios.tolist(), fins.tolist()) == ([], [])
+
+
+def test_pesos_limitam_lacunas():
+    tempos = pd.to_datetime(["2026-01-01 00:00", "2026-01-01 00:01", "2026-01-01 00:02",
+                             "2026-01-01 02:00", "2026-01-01 02:01"]).to_numpy()
+    # Intervalo mediano de 1 min; a lacuna de quase 2 h vale no máximo 5 min
+    assert pesos_tempo(tempos, fator_lacuna=5).tolist() == [60, 60, 300, 60, 60]
+
+
+def test_tcm_de_temperatura_constante():
+    assert temperatura_cinetica_media([25.0, 25.0, 25.0], [1, 1, 1]) == pytest.approx(25.0)
+
+
+def test_tcm_pesa_mais_as_temperaturas_altas():
+    tcm = temperatura_cinetica_media([20.0, 30.0], [1, 1])
+    assert tcm == pytest.approx(26.2599, abs=1e-3)
+    assert tcm > 25.0
+
+
+def test_tcm_ponderada_pelo_tempo_e_sem_nan():
+    assert temperatura_cinetica_media([20.0, 30.0, np.nan], [3, 1, 5]) < \
+        temperatura_cinetica_media([20.0, 30.0], [1, 1])
+    assert np.isnan(temperatura_cinetica_media([np.nan], [1]))
+
+
+def _serie():
+    return pd.DataFrame({
+        "Date Time": pd.date_range("2026-01-01 08:00", periods=10, freq="10min"),
+        "Temperatura (°C)": [20, 31, 33, 32, 20, 10, 12, 20, np.nan, 40],
+        "latitude": np.linspace(-23.0, -23.9, 10),
+        "longitude": np.linspace(-46.0, -46.9, 10),
+    })
+
+
+def test_analisar_excursoes():
+    df = _serie()
+    canais = detectar_canais(df.columns, {"temperatura": (15.0, 30.0)})
+    resumo, excursoes = analisar_excursoes(df, canais)
+
+    assert excursoes["Tipo"].tolist() == [ACIMA, ABAIXO, ACIMA]
+    assert excursoes["Duração"].dt.total_seconds().tolist() == [1800, 1200, 600]
+    assert excursoes["Pico"].tolist() == [33, 10, 40]
+    assert excursoes["Momento do pico"].tolist() == [df["Date Time"][2], df["Date Time"][5],
+                                                     df["Date Time"][9]]
+    assert excursoes["latitude"].tolist() == [df["latitude"][2], df["latitude"][5], df["latitude"][9]]
+
+    linha = resumo.iloc[0]
+    # 9 leituras válidas de 10 min: 2 abaixo, 3 dentro e 4 acima
+    assert linha["% do tempo abaixo"] == pytest.approx(200 / 9)
+    assert linha["% do tempo dentro"] == pytest.approx(300 / 9)
+    assert linha["% do tempo acima"] == pytest.approx(400 / 9)
+    assert linha["Excursões"] == 3
+    assert linha["Tempo fora"] == pd.Timedelta(minutes=60)
+    assert linha["Maior excursão"] == pd.Timedelta(minutes=30)
+    assert not np.isnan(linha["TCM (°C)"])
+
+
+def test_analisar_excursoes_ordena_por_tempo():
+    df = _serie()
+    canais = detectar_canais(df.columns, {"temperatura": (15.0, 30.0)})
+    _, esperado = analisar_excursoes(df, canais)
+    _, excursoes = analisar_excursoes(df.iloc[::-1], canais)
+    pd.testing.assert_frame_equal(excursoes, esperado)
+
+
+def test_sem_excursoes():
+    df = _serie()
+    canais = detectar_canais(df.columns, {"temperatura": (0.0, 50.0)})
+    resumo, excursoes = analisar_excursoes(df, canais)
+    assert len(excursoes) == 0
+    assert resumo.iloc[0]["% do tempo dentro"] == pytest.approx(100.0)
+
+
+def test_formatar_duracao():
+    assert formatar_duracao(pd.Timedelta(seconds=7500)) == "2 h 05 min"
+    assert formatar_duracao(pd.Timedelta(seconds=95)) == "1 min 35 s"
+    assert formatar_duracao(pd.Timedelta(seconds=45)) == "45 s"
@@ -0,0 +1,203 @@
+import time
+
+import pytest
+
+import geocodificacao
+from geocodificacao import METROS_POR_GRAU, CacheEnderecos, IndiceEspacial, LimitadorTaxa, MotorGeocodificacao
+from nominatim_local import ServidorNominatimLocal
+
+
+class Relogio:
+    """Substitui time.time() no módulo, para controlar TTL e ordem de acesso."""
+
+    def __init__(self, agora=1_000_000.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(geocodificacao.time, "time", relogio)
+    return relogio
+
+
+def test_cache_guarda_e_conta_acertos(tmp_path, relogio):
+    cache = CacheEnderecos(str(tmp_path))
+    assert cache.obter(-23.5505, -46.6333) is None
+    cache.guardar(-23.5505, -46.6333, "Praça da Sé")
+    assert cache.obter(-23.5505, -46.6333) == "Praça da Sé"
+    assert cache.estatisticas() == {"acertos": 1, "faltas": 1, "taxa_acerto": 0.5}
+
+
+def test_cache_quantiza_coordenadas(tmp_path, relogio):
+    cache = CacheEnderecos(str(tmp_path), casas_decimais=5)
+    cache.guardar(-23.550500, -46.633300, "Praça da Sé")
+    assert cache.obter(-23.550501, -46.633299) == "Praça da Sé"
+    assert cache.obter(-23.550600, -46.633300) is None
+
+
+def test_cache_nao_guarda_erros_temporarios(tmp_path, relogio):
+    cache = CacheEnderecos(str(tmp_path))
+    cache.guardar(1.0, 2.0, "Timeout na consulta")
+    cache.guardar(3.0, 4.0, "Erro: serviço indisponível")
+    assert cache.obter(1.0, 2.0) is None
+    assert cache.obter(3.0, 4.0) is None
+
+
+def test_cache_expira_pelo_ttl(tmp_path, relogio):
+    cache = CacheEnderecos(str(tmp_path), ttl_segundos=60)
+    cache.guardar(1.0, 2.0, "Rua A")
+    relogio.agora += 59
+    assert cache.obter(1.0, 2.0) == "Rua A"
+    relogio.agora += 2
+    assert cache.obter(1.0, 2.0) is None
+    assert cache.obter(1.00001, 2.0, raio_metros=25) is None
+
+
+def test_cache_persiste_entre_instancias(tmp_path, relogio):
+    CacheEnderecos(str(tmp_path)).guardar(1.0, 2.0, "Rua A")
+    assert CacheEnderecos(str(tmp_path)).obter(1.0, 2.0) == "Rua A"
+
+
+def test_cache_remove_os_menos_acessados(tmp_path, relogio):
+    cache = CacheEnderecos(str(tmp_path), max_entradas=2)
+    cache.guardar(1.0, 1.0, "A")
+    relogio.agora += 1
+    cache.guardar(2.0, 2.0, "B")
+    relogio.agora += 1
+    assert cache.obter(1.0, 1.0) == "A"  # "A" passa a ser o mais recente
+    relogio.agora += 1
+    cache.guardar(3.0, 3.0, "C")
+    cache.remover_excedentes()
+    assert cache.obter(2.0, 2.0) is None
+    assert cache.obter(1.0, 1.0) == "A"
+    assert cache.obter(3.0, 3.0) == "C"
+
+
+def test_cache_remove_expirados(tmp_path, relogio):
+    cache = CacheEnderecos(str(tmp_path), ttl_segundos=60)
+    cache.guardar(1.0, 1.0, "A")
+    relogio.agora += 120
+    cache.guardar(2.0, 2.0, "B")
+    cache.remover_excedentes()
+    relogio.agora -= 120  # mesmo "de volta no tempo" a entrada não existe mais
+    assert cache.obter(1.0, 1.0) is None
+
+
+def test_cache_busca_dentro_do_raio(tmp_path, relogio):
+    cache = CacheEnderecos(str(tmp_path))
+    cache.guardar(-23.5505, -46.6333, "Praça da Sé")
+    cache.guardar(-23.5510, -46.6333, "Rua ao lado")
+    # ~11 m ao norte do primeiro ponto: o mais próximo dentro de 25 m
+    assert cache.obter(-23.5504, -46.6333, raio_metros=25) == "Praça da Sé"
+    assert cache.obter(-23.5520, -46.6333, raio_metros=25) is None
+
+
+def test_indice_vazio():
+    assert IndiceEspacial(25).buscar(-23.5505, -46.6333) is None
+
+
+def test_indice_respeita_o_raio():
+    indice = IndiceEspacial(25)
+    indice.adicionar(-23.5505, -46.6333, "Praça da Sé")
+    assert indice.buscar(-23.5505 + 20 / METROS_POR_GRAU, -46.6333) == "Praça da Sé"
+    assert indice.buscar(-23.5505 + 30 / METROS_POR_GRAU, -46.6333) is None
+
+
+def test_indice_devolve_o_mais_proximo():
+    indice = IndiceEspacial(25)
+    indice.adicionar(0.0, 0.0, "origem")
+    indice.adicionar(15 / METROS_POR_GRAU, 0.0, "norte")
+    assert indice.buscar(10 / METROS_POR_GRAU, 0.0) == "norte"
+    assert indice.buscar(4 / METROS_POR_GRAU, 0.0) == "origem"
+
+
+def test_indice_cruza_celulas_em_latitude_alta():
+    # A 70° um grau de longitude tem ~38 km; 20 m a leste cruzam mais de uma célula
+    indice = IndiceEspacial(25)
+    indice.adicionar(70.0, 10.0, "ponto")
+    graus_20_metros = 20 / (METROS_POR_GRAU * 0.3420201)
+    assert indice.buscar(70.0, 10.0 + graus_20_metros) == "ponto"
+    assert indice.buscar(70.0, 10.0 + 1.5 * graus_20_metros) is None
+
+
+def test_limitador_segura_a_taxa():
+    limitador = LimitadorTaxa(20)
+    inicio = time.monotonic()
+    for _ in range(21):
+        limitador.aguardar()
+    # A primeira ficha já está no balde; as outras 20 saem a 20 por segundo
+    assert 0.95 <= time.monotonic() - inicio < 2.0
+
+
+@pytest.fixture
+def servidor():
+    pytest.importorskip("geopy")
+    with ServidorNominatimLocal() as servidor:
+        yield servidor
+
+
+def _motor(servidor, diretorio, **opcoes):
+    opcoes.setdefault("requisicoes_por_segundo", 1000)
+    opcoes.setdefault("raio_metros", 0)
+    return MotorGeocodificacao(provedor="local", dominio=servidor.dominio, cache=CacheEnderecos(str(diretorio)),
+                               **opcoes)
+
+
+def test_motor_devolve_na_ordem_da_entrada(tmp_path, servidor):
+    servidor.servidor.atraso = 0.01
+    latitudes = [-23.0 - i * 0.01 for i in range(60)]
+    longitudes = [-46.0] * 60
+    enderecos = _motor(servidor, tmp_path, workers=8).geocodificar(latitudes, longitudes)
+    assert enderecos == [f"Rua {lat:.3f} - Bairro -46.00 - Cidade Teste - Estado Teste - Brasil"
+                         for lat in latitudes]
+    assert servidor.requisicoes == 60
+
+
+def test_motor_reaproveita_pontos_proximos_e_o_cache(tmp_path, servidor):
+    latitudes = [-23.0, -23.0 + 5 / METROS_POR_GRAU, -23.5]
+    longitudes = [-46.0, -46.0, -46.0]
+    motor = _motor(servidor, tmp_path, raio_metros=25)
+    primeira = motor.geocodificar(latitudes, longitudes)
+    assert primeira[0] == primeira[1] != primeira[2]
+    assert servidor.requisicoes == 2
+    assert motor.geocodificar(latitudes, longitudes) == primeira
+    assert servidor.requisicoes == 2
+
+
+def test_motor_progresso_termina_no_total(tmp_path, servidor):
+    chamadas = []
+    latitudes = [-23.0 - i * 0.01 for i in range(25)] * 2
+    _motor(servidor, tmp_path, workers=4).geocodificar(latitudes, [-46.0] * 50,
+                                                        progresso=lambda c, t: chamadas.append((c, t)))
+    assert chamadas[-1] == (50, 50)
+    concluidos = [c for c, _ in chamadas]
+    assert concluidos == sorted(concluidos)
+
+
+def test_motor_respeita_a_taxa(tmp_path, servidor):
+    motor = _motor(servidor, tmp_path, workers=8, requisicoes_por_segundo=20)
+    inicio = time.monotonic()
+    motor.geocodificar([-23.0 - i * 0.01 for i in range(21)], [-46.0] * 21)
+    assert time.monotonic() - inicio >= 0.95
+    assert servidor.requisicoes == 21
+
+
+def test_motor_tenta_de_novo_apos_timeout(tmp_path, servidor):
+    servidor.servidor.atraso = 0.5
+    motor = _motor(servidor, tmp_path, timeout=0.1, tentativas=3, espera_base=0.05)
+    inicio = time.monotonic()
+    assert motor.geocodificar([-23.0], [-46.0]) == ["Timeout na busca do endereço"]
+    # 3 timeouts de 0,1 s e esperas de pelo menos 0,05 s e 0,1 s entre eles
+    assert time.monotonic() - inicio >= 0.45
+    assert servidor.requisicoes == 3
+    # Timeouts não vão para o cache
+    assert motor.cache.obter(-23.0, -46.0) is None
+
+
+def test_motor_exige_uma_tentativa(tmp_path, servidor):
+    with pytest.raises(ValueError):
+        _motor(servidor, tmp_path, tentativas=0)
@@ -0,0 +1,58 @@
+import io
+
+import pandas as pd
+import pytest
+
+from ingestao import detectar_separador, ler_blocos_preparados
+
+CABECALHO = ["Date Time", "latitude", "longitude", "Temperatura (°C)", "Umidade (%UR)", "Hora"]
+
+
+class Upload(io.BytesIO):
+    """Imita o UploadedFile do Streamlit: bytes com nome."""
+    name = "dados.csv"
+
+
+def _csv(linhas, separador=","):
+    texto = [separador.join(CABECALHO)]
+    texto += [separador.join(str(v) for v in linha) for linha in linhas]
+    return "\n".join(texto) + "\n"
+
+
+def _linha(i, umidade=60.0):
+    return [f"2026-01-05 08:{i:02d}:00", -23.5 - i / 1000, -46.6, 20.0 + i / 10, umidade, 1]
+
+
+@pytest.mark.parametrize("separador", [",", ";", "\t", "|"])
+def test_separador_detectado(separador):
+    assert detectar_separador(io.StringIO(_csv([_linha(0), _linha(1)], separador))) == separador
+
+
+def test_separador_ignora_linha_cortada_no_fim_da_amostra():
+    texto = _csv([_linha(i) for i in range(50)], ";")
+    arquivo = io.StringIO(texto)
+    assert detectar_separador(arquivo, tamanho_amostra=300) == ";"
+    assert arquivo.tell() == 0
+
+
+def test_separador_padrao_sem_como_decidir():
+    assert detectar_separador(io.StringIO("")) == ","
+
+
+def test_csv_em_blocos_com_separador_detectado():
+    upload = Upload(_csv([_linha(i) for i in range(25)], ";").encode("utf-8"))
+    blocos = list(ler_blocos_preparados(upload, tamanho_bloco=10))
+    assert [len(b) for b in blocos] == [10, 10, 5]
+    assert blocos[0]["Temperatura (°C)"].dtype == float
+
+
+def test_texto_solto_num_bloco_posterior_vira_nan():
+    linhas = [_linha(i) for i in range(25)]
+    linhas[17][3] = "erro"     # temperatura
+    linhas[22][4] = "--"       # umidade
+    upload = Upload(_csv(linhas).encode("utf-8"))
+    df = pd.concat(ler_blocos_preparados(upload, tamanho_bloco=10), ignore_index=True)
+    assert len(df) == 24  # a temperatura é obrigatória; a umidade não
+    assert df["Temperatura (°C)"].dtype == float
+    assert df["Umidade (%UR)"].dtype == float
+    assert df["Umidade (%UR)"].isna().sum() == 1
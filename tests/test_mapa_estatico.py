@@ -0,0 +1,15 @@
+import numpy as np
+
+from mapa_estatico import renderizar_mapa_estatico
+
+
+def test_renderizar_mapa_estatico_ignora_coordenadas_nao_finitas():
+    lat = [-23.55, np.nan, -23.56, np.inf]
+    lon = [-46.63, -46.64, np.nan, -46.65]
+    png = renderizar_mapa_estatico(lat, lon, largura_px=200, altura_px=100)
+    assert png.startswith(b"\x89PNG")
+
+
+def test_renderizar_mapa_estatico_sem_pontos_finitos():
+    png = renderizar_mapa_estatico([np.nan], [np.nan], largura_px=200, altura_px=100)
+    assert png.startswith(b"\x89PNG")
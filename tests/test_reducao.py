@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from reducao import indices_min_max, reduzir_serie
+
+
+def test_serie_curta_fica_inteira():
+    valores = np.array([1.0, np.nan, 3.0, 2.0])
+    assert indices_min_max(np.arange(4), valores, baldes=10).tolist() == [0, 2, 3]
+
+
+def test_min_e_max_de_cada_balde():
+    tempos = np.arange(12)
+    valores = np.array([5, 1, 9, 4, 4, 8, 2, 4, 7, 3, 6, 5], dtype=float)
+    # 3 baldes de 4 pontos: [5 1 9 4] [4 8 2 4] [7 3 6 5]
+    assert indices_min_max(tempos, valores, baldes=3).tolist() == [0, 1, 2, 5, 6, 8, 9, 11]
+
+
+def test_limite_de_pontos_e_extremos_preservados():
+    rng = np.random.default_rng(0)
+    valores = rng.normal(20, 1, 100_000)
+    valores[12_345] = 45.0  # pico isolado
+    valores[67_890] = -5.0
+    indices = indices_min_max(np.arange(len(valores)), valores, baldes=500)
+    assert len(indices) <= 2 * 500 + 2
+    assert np.all(np.diff(indices) > 0)
+    assert {0, 12_345, 67_890, len(valores) - 1} <= set(indices.tolist())
+
+
+def test_baldes_pelo_tempo_e_nao_pela_posicao():
+    # Metade dos pontos no primeiro segundo: o intervalo curto não ganha mais baldes
+    tempos = np.concatenate((np.linspace(0, 1, 1000), np.linspace(2, 100, 1000)))
+    valores = np.sin(np.arange(2000))
+    indices = indices_min_max(tempos, valores, baldes=100)
+    assert np.count_nonzero(tempos[indices] <= 1) <= 2 + 2
+
+
+def test_tempos_datetime_e_nan_ignorados():
+    tempos = pd.date_range("2026-01-01", periods=1000, freq="min").to_numpy()
+    valores = np.linspace(0, 1, 1000)
+    valores[::7] = np.nan
+    indices = indices_min_max(tempos, valores, baldes=50)
+    assert not np.isnan(valores[indices]).any()
+    assert len(indices) <= 2 * 50 + 2
+
+
+def test_reduzir_serie():
+    tempos = np.arange(1000)
+    valores = np.cos(tempos / 10)
+    t, v, reduzida = reduzir_serie(tempos, valores, baldes=20)
+    assert reduzida
+    assert len(t) == len(v) <= 42
+    np.testing.assert_array_equal(v, valores[t])
+    t, v, reduzida = reduzir_serie(tempos[:30], valores[:30], baldes=20)
+    assert not reduzida
+    assert len(t) == 30
@@ -0,0 +1,38 @@
+import numpy as np
+
+from geocodificacao import METROS_POR_GRAU
+from trajetoria import douglas_peucker
+
+
+def test_douglas_peucker_poucos_pontos():
+    assert douglas_peucker(np.array([]), np.array([]), 10).tolist() == []
+    assert douglas_peucker(np.array([1.0]), np.array([2.0]), 10).tolist() == [0]
+    assert douglas_peucker(np.array([1.0, 1.1]), np.array([2.0, 2.1]), 10).tolist() == [0, 1]
+
+
+def test_douglas_peucker_reta_fica_so_com_as_pontas():
+    lat = np.linspace(-23.0, -23.1, 50)
+    lon = np.full(50, -46.0)
+    assert douglas_peucker(lat, lon, 1.0).tolist() == [0, 49]
+
+
+def test_douglas_peucker_mantem_desvio_acima_da_tolerancia():
+    lat = np.linspace(0.0, 0.01, 11)
+    lon = np.zeros(11)
+    lon[5] = 100 / METROS_POR_GRAU  # ~100 m para o lado
+    assert douglas_peucker(lat, lon, 50).tolist() == [0, 4, 5, 6, 10]
+    assert douglas_peucker(lat, lon, 150).tolist() == [0, 10]
+
+
+def test_douglas_peucker_em_l():
+    # Dois trechos retos em L: só as pontas e o canto
+    lat = np.concatenate((np.linspace(0.0, 0.01, 20), np.full(20, 0.01)))
+    lon = np.concatenate((np.zeros(20), np.linspace(0.0005, 0.01, 20)))
+    assert douglas_peucker(lat, lon, 5).tolist() == [0, 19, 39]
+
+
+def test_douglas_peucker_rota_parada():
+    # Todos os pontos iguais (veículo parado): nada a simplificar além das pontas
+    lat = np.full(10, -23.5)
+    lon = np.full(10, -46.6)
+    assert douglas_peucker(lat, lon, 1).tolist() == [0, 9]
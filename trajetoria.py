@@ -0,0 +1,151 @@
+"""
+Funções vetorizadas sobre a trajetória (latitude/longitude/tempo) da rota.
+"""
+import numpy as np
+
+from geocodificacao import METROS_POR_GRAU, RAIO_TERRA_METROS
+
+
+def distancias_haversine(lat1, lon1, lat2, lon2):
+    """
+    Distância em metros entre arrays de pontos, elemento a elemento: a
+    versão vetorizada de `geocodificacao.distancia_metros`.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_METROS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _projetar(lat, lon):
+    """Projeção equiretangular local em metros, suficiente para distâncias de uma rota."""
+    lat0 = np.radians(np.nanmean(lat)) if len(lat) else 0.0
+    x = np.asarray(lon, dtype=float) * METROS_POR_GRAU * np.cos(lat0)
+    y = np.asarray(lat, dtype=float) * METROS_POR_GRAU
+    return x, y
+
+
+def douglas_peucker(lat, lon, tolerancia_metros):
+    """
+    Simplifica a trajetória pelo algoritmo de Douglas-Peucker.
+    Retorna os índices dos pontos mantidos, em ordem (inclui o primeiro e o último).
+    """
+    n = len(lat)
+    if n <= 2:
+        return np.arange(n)
+
+    x, y = _projetar(lat, lon)
+    manter = np.zeros(n, dtype=bool)
+    manter[0] = manter[-1] = True
+
+    pilha = [(0, n - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim - inicio < 2:
+            continue
+
+        dx, dy = x[fim] - x[inicio], y[fim] - y[inicio]
+        px, py = x[inicio + 1:fim] - x[inicio], y[inicio + 1:fim] - y[inicio]
+        comprimento = np.hypot(dx, dy)
+        if comprimento == 0:
+            dist = np.hypot(px, py)
+        else:
+            dist = np.abs(dx * py - dy * px) / comprimento
+
+        i_max = int(np.argmax(dist))
+        if dist[i_max] > tolerancia_metros:
+            meio = inicio + 1 + i_max
+            manter[meio] = True
+            pilha.append((inicio, meio))
+            pilha.append((meio, fim))
+
+    return np.flatnonzero(manter)
+
+
+def indices_uniformes(n, maximo):
+    """Até `maximo` índices igualmente espaçados em range(n); sempre inclui o primeiro e o último."""
+    if n <= maximo:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max(maximo, 2)).round().astype(int))
+
+
+def indices_por_distancia(lat, lon, espacamento_metros):
+    """Índices de um ponto a cada `espacamento_metros` percorridos (inclui o primeiro e o último)."""
+    n = len(lat)
+    if n == 0:
+        return np.arange(0)
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    passos = distancias_haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    acumulado = np.concatenate(([0.0], np.cumsum(passos)))
+    faixa = np.floor(acumulado / max(espacamento_metros, 1e-9))
+    # Primeiro ponto de cada faixa de distância
+    inicio_faixa = np.flatnonzero(np.diff(faixa, prepend=-1) != 0)
+    return np.union1d(inicio_faixa, [n - 1])
+
+
+def indices_por_tempo(tempos, intervalo):
+    """Índices de um ponto a cada `intervalo` (pd.Timedelta) de tempo (inclui o primeiro e o último)."""
+    tempos = np.asarray(tempos, dtype="datetime64[ns]")
+    n = len(tempos)
+    if n == 0:
+        return np.arange(0)
+
+    decorrido = (tempos - tempos[0]).astype("int64")
+    faixa = np.floor_divide(decorrido, max(int(intervalo.value), 1))
+    inicio_faixa = np.flatnonzero(np.diff(faixa, prepend=-1) != 0)
+    return np.union1d(inicio_faixa, [n - 1])
+
+
+def detectar_paradas(lat, lon, tempos, limiar_metros=20.0, duracao_minima=None):
+    """
+    Detecta trechos em que o veículo ficou parado: amostras consecutivas que se
+    movem menos que `limiar_metros` por pelo menos `duracao_minima` (pd.Timedelta).
+    Retorna o índice central de cada parada, mais o primeiro e o último ponto.
+    """
+    n = len(lat)
+    if n == 0:
+        return np.arange(0)
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    tempos = np.asarray(tempos, dtype="datetime64[ns]")
+
+    passos = distancias_haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    parado = np.concatenate(([False], passos < limiar_metros))
+
+    # Início e fim (exclusivo) de cada sequência de amostras paradas
+    bordas = np.diff(parado.astype(np.int8), prepend=0, append=0)
+    inicios = np.flatnonzero(bordas == 1) - 1
+    fins = np.flatnonzero(bordas == -1)
+
+    if duracao_minima is not None and len(inicios):
+        duracoes = tempos[fins - 1] - tempos[inicios]
+        validos = duracoes >= np.timedelta64(int(duracao_minima.value), "ns")
+        inicios, fins = inicios[validos], fins[validos]
+
+    centros = (inicios + fins - 1) // 2
+    return np.union1d(centros, [0, n - 1])
+
+
+def atribuir_waypoint_mais_proximo(lat, lon, indices_waypoints):
+    """
+    Para cada ponto, escolhe entre o waypoint anterior e o seguinte na rota o
+    mais próximo. Retorna (posição do waypoint em `indices_waypoints`, distância em metros).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    indices_waypoints = np.asarray(indices_waypoints)
+    posicoes = np.arange(len(lat))
+
+    seguinte = np.searchsorted(indices_waypoints, posicoes, side="left")
+    seguinte = np.clip(seguinte, 0, len(indices_waypoints) - 1)
+    anterior = np.clip(seguinte - 1, 0, len(indices_waypoints) - 1)
+
+    dist_seguinte = distancias_haversine(lat, lon, lat[indices_waypoints[seguinte]], lon[indices_waypoints[seguinte]])
+    dist_anterior = distancias_haversine(lat, lon, lat[indices_waypoints[anterior]], lon[indices_waypoints[anterior]])
+
+    usar_anterior = dist_anterior < dist_seguinte
+    escolhido = np.where(usar_anterior, anterior, seguinte)
+    distancia = np.where(usar_anterior, dist_anterior, dist_seguinte)
+    return escolhido, distancia
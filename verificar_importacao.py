@@ -0,0 +1,76 @@
+"""
+Verifica o custo de partida do app: o tempo das importações de `app.py` e se
+alguma biblioteca pesada que deveria ser carregada só no primeiro uso (PDF,
+captura do mapa, geocodificação, gráficos e mapa interativo) entrou nelas.
+
+    python verificar_importacao.py --orcamento 1.5
+
+Cada medição roda num interpretador novo; vale a mediana. Sai com código 1
+se o tempo passar do orçamento ou se algum módulo pesado for importado.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ORCAMENTO_PADRAO = float(os.environ.get("ROUTE_ORCAMENTO_IMPORTACAO", "1.5"))
+
+# Carregados sob demanda; não podem aparecer nas importações de partida
+MODULOS_SOB_DEMANDA = ("fpdf", "reportlab", "PyPDF2", "selenium", "webdriver_manager",
+                       "geopy", "folium", "matplotlib")
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def importacoes_do_app(caminho=os.path.join(DIRETORIO, "app.py")):
+    """Código das importações de nível de módulo do app, sem executar a interface."""
+    with open(caminho, encoding="utf-8") as f:
+        fonte = f.read()
+    nos = ast.parse(fonte).body
+    return "\n".join(ast.get_source_segment(fonte, n) for n in nos if isinstance(n, (ast.Import, ast.ImportFrom)))
+
+
+def medir(codigo):
+    """Importa `codigo` num interpretador novo; retorna (segundos, módulos de topo carregados)."""
+    script = (
+        "import json, sys, time\n"
+        "inicio = time.perf_counter()\n"
+        f"{codigo}\n"
+        "duracao = time.perf_counter() - inicio\n"
+        "print(json.dumps([duracao, sorted({m.split('.')[0] for m in sys.modules})]))\n"
+    )
+    saida = subprocess.run([sys.executable, "-c", script], cwd=DIRETORIO,
+                           capture_output=True, text=True, check=True).stdout
+    duracao, modulos = json.loads(saida.strip().splitlines()[-1])
+    return duracao, set(modulos)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Verifica o tempo de importação do app.")
+    parser.add_argument("--orcamento", type=float, default=ORCAMENTO_PADRAO, help="Limite em segundos.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args(argumentos)
+
+    codigo = importacoes_do_app()
+    medicoes = [medir(codigo) for _ in range(args.repeticoes)]
+    mediana = statistics.median(duracao for duracao, _ in medicoes)
+    carregados = sorted(set(MODULOS_SOB_DEMANDA) & medicoes[-1][1])
+
+    print(f"Importações do app: {mediana:.2f} s (mediana de {args.repeticoes}; orçamento {args.orcamento:.2f} s)")
+    falhou = False
+    if mediana > args.orcamento:
+        print(f"FALHA: {mediana:.2f} s acima do orçamento de {args.orcamento:.2f} s")
+        falhou = True
+    if carregados:
+        print(f"FALHA: módulos que deveriam ser carregados sob demanda: {', '.join(carregados)}")
+        falhou = True
+    if not falhou:
+        print("ok")
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())